@@ -5,12 +5,15 @@ Face Recognition, Object Detection, Threat Detection using YOLOv8 and DeepFace
 
 import cv2
 import numpy as np
+from dataclasses import dataclass
 from typing import List, Tuple, Optional, Dict
 import pickle
 import logging
 from datetime import datetime
 import threading
 
+from AI_ML.frame_clock import FrameStamp
+
 # Try imports - graceful fallback if models not installed
 try:
     from ultralytics import YOLO
@@ -214,6 +217,63 @@ class ObjectDetectionEngine:
         }
 
 
+@dataclass(slots=True)
+class Detection:
+    """One person detection (a view into a DetectionBatch row)"""
+    bbox: Tuple[int, int, int, int]  # x1, y1, x2, y2
+    confidence: float
+    embedding: Optional[np.ndarray] = None
+
+
+class DetectionBatch:
+    """
+    All person detections of one frame, stored as arrays:
+        bboxes       int32 (N, 4)
+        confidences  float32 (N,)
+        embeddings   face embedding per row, or None
+        stamp        capture time of the frame
+    """
+    __slots__ = ("bboxes", "confidences", "embeddings", "stamp")
+
+    def __init__(self,
+                 bboxes: np.ndarray,
+                 confidences: np.ndarray,
+                 embeddings: List[Optional[np.ndarray]] = None,
+                 stamp: Optional[FrameStamp] = None):
+        self.bboxes = bboxes
+        self.confidences = confidences
+        self.embeddings = embeddings if embeddings is not None else [None] * len(bboxes)
+        self.stamp = stamp
+
+    @classmethod
+    def from_detections(cls,
+                        detections: List[Tuple[int, int, int, int, float]],
+                        stamp: Optional[FrameStamp] = None) -> "DetectionBatch":
+        """Build from detector output rows (x1, y1, x2, y2, confidence)"""
+        rows = np.asarray(detections, dtype=np.float32).reshape(-1, 5)
+        return cls(rows[:, :4].astype(np.int32), rows[:, 4].copy(), stamp=stamp)
+
+    def __len__(self):
+        return len(self.bboxes)
+
+    def __getitem__(self, index: int) -> Detection:
+        return Detection(tuple(self.bboxes[index].tolist()), float(self.confidences[index]), self.embeddings[index])
+
+    def __iter__(self):
+        for index in range(len(self.bboxes)):
+            yield self[index]
+
+    def bbox_list(self) -> List[Tuple[int, int, int, int]]:
+        """Bboxes as plain int tuples (tracker input)"""
+        return [tuple(row) for row in self.bboxes.tolist()]
+
+    def centroids(self) -> np.ndarray:
+        return np.stack([
+            (self.bboxes[:, 0] + self.bboxes[:, 2]) / 2.0,
+            (self.bboxes[:, 1] + self.bboxes[:, 3]) / 2.0
+        ], axis=1)
+
+
 class FrameProcessor:
     """Process video frames with AI models"""
     
@@ -226,41 +286,41 @@ class FrameProcessor:
                      frame: np.ndarray,
                      detect_persons: bool = True,
                      detect_weapons: bool = True,
-                     generate_embeddings: bool = True) -> Dict:
+                     generate_embeddings: bool = True,
+                     stamp: Optional[FrameStamp] = None) -> Dict:
         """
         Full frame processing pipeline.
         
+        Args:
+            stamp: Capture time of the frame (defaults to now)
+        
         Returns:
             {
-                "persons": [{"bbox": (x1,y1,x2,y2), "confidence": 0.95, "embedding": [...]}],
+                "persons": DetectionBatch (bboxes, confidences, embeddings; iterates as Detection),
                 "weapons": [{"type": "knife", "bbox": (...), "confidence": 0.87}],
-                "timestamp": datetime
+                "timestamp": datetime of capture,
+                "stamp": FrameStamp
             }
         """
+        stamp = stamp or FrameStamp.now()
         result = {
-            "timestamp": datetime.utcnow(),
-            "persons": [],
+            "timestamp": stamp.wall,
+            "stamp": stamp,
+            "persons": DetectionBatch.from_detections([], stamp),
             "weapons": []
         }
         
         with self.lock:
             if detect_persons:
-                person_detections = self.object_engine.detect_persons(frame)
+                persons = DetectionBatch.from_detections(self.object_engine.detect_persons(frame), stamp)
                 
-                for x1, y1, x2, y2, conf in person_detections:
-                    person_data = {
-                        "bbox": (x1, y1, x2, y2),
-                        "confidence": conf,
-                        "embedding": None
-                    }
-                    
-                    if generate_embeddings:
-                        face_region = self.face_engine.extract_face(frame, (x1, y1, x2, y2))
+                if generate_embeddings:
+                    for index, bbox in enumerate(persons.bbox_list()):
+                        face_region = self.face_engine.extract_face(frame, bbox)
                         if face_region is not None:
-                            embedding = self.face_engine.generate_embedding(face_region)
-                            person_data["embedding"] = embedding
-                    
-                    result["persons"].append(person_data)
+                            persons.embeddings[index] = self.face_engine.generate_embedding(face_region)
+                
+                result["persons"] = persons
             
             if detect_weapons:
                 weapon_detections = self.object_engine.detect_weapons(frame)
@@ -277,59 +337,276 @@ class FrameProcessor:
 
 
 class ResidentDatabase:
-    """In-memory resident face embedding database"""
+    """
+    In-memory resident face embedding database.
+    Each resident holds up to `max_templates` templates (different angles/lighting)
+    plus their normalised centroid. Search is two-stage: a pass over the centroid
+    matrix shortlists identities, then only their templates are re-ranked exactly.
+    Both matrices are cached and rebuilt lazily after any change.
     
-    def __init__(self):
-        self.residents = {}  # {resident_id: {"name": ..., "embedding": np.array, ...}}
+    Residents tagged with access scopes (metadata["scopes"], e.g. "building:B",
+    "zone:parking") are also indexed per scope, so a camera can search only the
+    partitions it serves. Residents without scopes are visible to every camera.
+    """
+    
+    def __init__(self, max_templates: int = 5, shortlist: int = 8, dedup_similarity: float = 0.97):
+        self.residents = {}  # {resident_id: {"name": ..., "embedding": centroid, "templates": (K, D), ...}}
         self.face_engine = FaceRecognitionEngine()
         self.lock = threading.Lock()
+        self.version = 0  # Bumped on every change, used by snapshot writers
+        self.max_templates = max_templates
+        self.shortlist = shortlist
+        self.dedup_similarity = dedup_similarity
+        
+        # Cached search index
+        self._index_ids = []
+        self._centroid_matrix = None   # (N, D) normalised centroids
+        self._template_matrix = None   # (T, D) normalised templates, grouped by identity
+        self._template_offsets = None  # (N + 1,) identity i owns rows offsets[i]:offsets[i+1]
+        self._partitions = {}          # {scope: identity positions}, None = unscoped residents
+        self._scope_cache = {}         # {frozenset(scopes): (positions, centroid submatrix)}
+        self._index_dirty = True
     
     def enroll_resident(self, resident_id: int, name: str, face_image: np.ndarray, metadata: dict = None):
         """Enroll a resident with face embedding"""
         embedding = self.face_engine.generate_embedding(face_image)
         
         if embedding is not None:
-            with self.lock:
-                self.residents[resident_id] = {
-                    "name": name,
-                    "embedding": embedding,
-                    "enrollment_time": datetime.utcnow(),
-                    "metadata": metadata or {}
-                }
+            self.add_embedding(resident_id, name, embedding, metadata)
             return True
         return False
     
-    def recognize_face(self, embedding: np.ndarray, threshold: float = 0.6) -> Optional[Dict]:
+    def add_embedding(self,
+                      resident_id: int,
+                      name: str,
+                      embedding: np.ndarray,
+                      metadata: dict = None,
+                      enrollment_time: datetime = None):
+        """Insert or replace a resident using an embedding (D,) or templates (K, D)"""
+        templates = np.atleast_2d(np.asarray(embedding, dtype=np.float32))
+        with self.lock:
+            self.residents[resident_id] = {
+                "name": name,
+                "embedding": self._centroid(templates),
+                "templates": templates,
+                "enrollment_time": enrollment_time or datetime.utcnow(),
+                "metadata": metadata or {}
+            }
+            self._mark_dirty()
+    
+    def add_template(self, resident_id: int, embedding: np.ndarray) -> bool:
+        """Append a template to an enrolled resident. False if unknown, full or a near-duplicate."""
+        with self.lock:
+            resident = self.residents.get(resident_id)
+            if resident is None:
+                return False
+            templates = self.merge_template(
+                resident["templates"], embedding, self.max_templates, self.dedup_similarity
+            )
+            if templates is None:
+                return False
+            resident["templates"] = templates
+            resident["embedding"] = self._centroid(templates)
+            self._mark_dirty()
+            return True
+    
+    def get_templates(self, resident_id: int) -> Optional[np.ndarray]:
+        """Get resident's (K, D) template matrix"""
+        with self.lock:
+            if resident_id in self.residents:
+                return self.residents[resident_id]["templates"]
+        return None
+    
+    @staticmethod
+    def merge_template(templates: np.ndarray,
+                       embedding: np.ndarray,
+                       max_templates: int,
+                       dedup_similarity: float) -> Optional[np.ndarray]:
+        """
+        Return templates with `embedding` appended, or None if the identity is
+        already at `max_templates` or the new template adds nothing new.
+        """
+        templates = np.atleast_2d(np.asarray(templates, dtype=np.float32))
+        new = np.asarray(embedding, dtype=np.float32).ravel()
+        if templates.shape[0] >= max_templates or templates.shape[1] != new.shape[0]:
+            return None
+        
+        normed = templates / (np.linalg.norm(templates, axis=1, keepdims=True) + 1e-8)
+        similarity = normed @ (new / (np.linalg.norm(new) + 1e-8))
+        if float(similarity.max()) >= dedup_similarity:
+            return None
+        return np.vstack([templates, new])
+    
+    @staticmethod
+    def _centroid(templates: np.ndarray) -> np.ndarray:
+        normed = templates / (np.linalg.norm(templates, axis=1, keepdims=True) + 1e-8)
+        return normed.mean(axis=0)
+    
+    def remove_resident(self, resident_id: int) -> bool:
+        """Drop a resident from the gallery"""
+        with self.lock:
+            if self.residents.pop(resident_id, None) is None:
+                return False
+            self._mark_dirty()
+            return True
+    
+    def bulk_load(self, ids: np.ndarray, matrix: np.ndarray, records: Dict[int, Dict]):
+        """
+        Replace the gallery with a pre-built template matrix (e.g. a memory-mapped snapshot).
+        
+        Args:
+            ids: Array of shape (T,) with the owning resident ID of each row;
+                 rows of one resident must be contiguous
+            matrix: Array of shape (T, D)
+            records: {resident_id: {"name": ..., "metadata": ..., "enrollment_time": ...}}
+        """
+        with self.lock:
+            self.residents = {}
+            if len(ids):
+                starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+                ends = np.r_[starts[1:], len(ids)]
+                for start, end in zip(starts.tolist(), ends.tolist()):
+                    resident_id = int(ids[start])
+                    record = records.get(resident_id, {})
+                    templates = matrix[start:end]
+                    self.residents[resident_id] = {
+                        "name": record.get("name", ""),
+                        "embedding": self._centroid(templates),
+                        "templates": templates,
+                        "enrollment_time": record.get("enrollment_time"),
+                        "metadata": record.get("metadata", {})
+                    }
+            self._mark_dirty()
+    
+    def export_matrix(self) -> Tuple[np.ndarray, np.ndarray, Dict[int, Dict]]:
+        """Return (row owner ids, float32 template matrix, records) for snapshotting"""
+        with self.lock:
+            if self.residents:
+                ids = np.concatenate([
+                    np.full(len(r["templates"]), resident_id, dtype=np.int64)
+                    for resident_id, r in self.residents.items()
+                ])
+                matrix = np.concatenate([r["templates"] for r in self.residents.values()]).astype(np.float32)
+            else:
+                ids = np.zeros(0, dtype=np.int64)
+                matrix = np.zeros((0, 0), dtype=np.float32)
+            records = {
+                resident_id: {
+                    "name": r["name"],
+                    "metadata": r["metadata"],
+                    "enrollment_time": r["enrollment_time"]
+                }
+                for resident_id, r in self.residents.items()
+            }
+        return ids, matrix, records
+    
+    def _mark_dirty(self):
+        """Caller must hold self.lock"""
+        self.version += 1
+        self._index_dirty = True
+    
+    def _rebuild_index(self):
+        """Rebuild the normalised centroid and template matrices. Caller must hold self.lock"""
+        self._index_ids = list(self.residents.keys())
+        if self._index_ids:
+            entries = [self.residents[r] for r in self._index_ids]
+            centroids = np.stack([e["embedding"] for e in entries]).astype(np.float32)
+            centroids /= (np.linalg.norm(centroids, axis=1, keepdims=True) + 1e-8)
+            templates = np.concatenate([e["templates"] for e in entries]).astype(np.float32)
+            templates /= (np.linalg.norm(templates, axis=1, keepdims=True) + 1e-8)
+            counts = np.array([len(e["templates"]) for e in entries])
+            
+            self._centroid_matrix = centroids
+            self._template_matrix = templates
+            self._template_offsets = np.r_[0, np.cumsum(counts)]
+            
+            partitions = {}
+            for position, entry in enumerate(entries):
+                for scope in entry["metadata"].get("scopes") or [None]:
+                    partitions.setdefault(scope, []).append(position)
+            self._partitions = {scope: np.array(positions) for scope, positions in partitions.items()}
+        else:
+            self._centroid_matrix = None
+            self._template_matrix = None
+            self._template_offsets = None
+            self._partitions = {}
+        self._scope_cache = {}
+        self._index_dirty = False
+    
+    def _scope_index(self, scopes) -> Tuple[np.ndarray, np.ndarray]:
+        """Identity positions and centroids searched for a set of scopes. Caller must hold self.lock"""
+        key = frozenset(scopes)
+        cached = self._scope_cache.get(key)
+        if cached is None:
+            parts = [self._partitions[scope] for scope in key | {None} if scope in self._partitions]
+            positions = np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+            cached = (positions, self._centroid_matrix[positions])
+            self._scope_cache[key] = cached
+        return cached
+    
+    def partition_sizes(self) -> Dict[Optional[str], int]:
+        """Number of identities per scope partition (None = unscoped)"""
+        with self.lock:
+            if self._index_dirty:
+                self._rebuild_index()
+            return {scope: len(positions) for scope, positions in self._partitions.items()}
+    
+    def recognize_face(self, embedding: np.ndarray, threshold: float = 0.6, scopes=None) -> Optional[Dict]:
         """
         Recognize a face against resident database.
+        With `scopes`, only residents in those partitions (and unscoped ones) are searched.
         Returns the matched resident info or None.
         """
         if embedding is None:
             return None
         
-        best_match = None
-        best_similarity = -1
+        query = np.asarray(embedding, dtype=np.float32).ravel()
+        query = query / (np.linalg.norm(query) + 1e-8)
         
         with self.lock:
-            for resident_id, resident_data in self.residents.items():
-                stored_embedding = resident_data["embedding"]
-                is_match, similarity = self.face_engine.compare_embeddings(
-                    embedding, stored_embedding, threshold
-                )
-                
-                if is_match and similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = {
-                        "resident_id": resident_id,
-                        "name": resident_data["name"],
-                        "confidence": float(similarity),
-                        "metadata": resident_data["metadata"]
-                    }
-        
-        return best_match
+            if self._index_dirty:
+                self._rebuild_index()
+            if self._centroid_matrix is None or self._centroid_matrix.shape[1] != query.shape[0]:
+                return None
+            
+            # Stage 1: shortlist identities by centroid similarity
+            if scopes is None:
+                positions = None
+                centroid_scores = self._centroid_matrix @ query
+            else:
+                positions, centroids = self._scope_index(scopes)
+                if len(positions) == 0:
+                    return None
+                centroid_scores = centroids @ query
+            if len(centroid_scores) > self.shortlist:
+                candidates = np.argpartition(-centroid_scores, self.shortlist)[:self.shortlist]
+            else:
+                candidates = np.arange(len(centroid_scores))
+            if positions is not None:
+                candidates = positions[candidates]
+            
+            # Stage 2: exact re-rank against the shortlisted identities' templates
+            offsets = self._template_offsets
+            rows = np.concatenate([np.arange(offsets[c], offsets[c + 1]) for c in candidates])
+            owners = np.repeat(candidates, offsets[candidates + 1] - offsets[candidates])
+            template_scores = self._template_matrix[rows] @ query
+            
+            best = int(np.argmax(template_scores))
+            best_similarity = float(template_scores[best])
+            if best_similarity <= threshold:
+                return None
+            
+            resident_id = self._index_ids[int(owners[best])]
+            resident_data = self.residents[resident_id]
+            return {
+                "resident_id": resident_id,
+                "name": resident_data["name"],
+                "confidence": best_similarity,
+                "metadata": resident_data["metadata"]
+            }
     
     def get_resident_embedding(self, resident_id: int) -> Optional[np.ndarray]:
-        """Get resident's stored embedding"""
+        """Get resident's stored embedding (centroid of their templates)"""
         with self.lock:
             if resident_id in self.residents:
                 return self.residents[resident_id]["embedding"]
@@ -346,6 +623,9 @@ class ResidentDatabase:
         with self.lock:
             with open(filepath, 'rb') as f:
                 self.residents = pickle.load(f)
+            for resident in self.residents.values():
+                resident.setdefault("templates", np.atleast_2d(resident["embedding"]).astype(np.float32))
+            self._mark_dirty()
 
 
 # Logging
@@ -0,0 +1,84 @@
+"""
+FRAME CAPTURE TIMESTAMPS
+Every frame is stamped with when it was captured, not when it is processed.
+
+    monotonic  time.monotonic() at capture; drives all time windows (tailgating,
+               authorization lookups, re-ID expiry, notification cooldowns)
+    wall       UTC datetime at capture; used for alert/incident timestamps
+    pts_ms     stream presentation timestamp when the source provides one
+
+cap.read() returns the oldest frame OpenCV / the RTSP client has buffered, so
+"now" after a read can be well after capture when processing lags. A
+CaptureClock per stream maps the stream's PTS onto time.monotonic(): the
+offset (read time - PTS) is smallest for the frame read with the least
+buffering delay, so the clock keeps the smallest offset seen and stamps every
+frame at offset + PTS. A PTS that jumps backwards (reconnect, looping file)
+or lags implausibly re-anchors the clock. Only frames without a PTS are
+stamped at read time.
+
+Authorization events recorded by the API use the same monotonic clock, so a
+frame processed seconds late is still compared against what had happened
+by the moment it was captured.
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+
+@dataclass(slots=True, frozen=True)
+class FrameStamp:
+    monotonic: float
+    wall: datetime
+    pts_ms: Optional[float] = None
+
+    @classmethod
+    def now(cls, pts_ms: Optional[float] = None) -> "FrameStamp":
+        return cls(time.monotonic(), datetime.utcnow(), pts_ms)
+
+    def age(self, now: Optional[float] = None) -> float:
+        """Seconds since capture (processing lag)"""
+        return (now if now is not None else time.monotonic()) - self.monotonic
+
+
+class CaptureClock:
+    """Capture-time stamps for one stream, derived from its PTS"""
+
+    def __init__(self, max_lag_seconds: float = 30.0):
+        self.max_lag_seconds = max_lag_seconds
+        self.offset = None      # time.monotonic() - PTS seconds, smallest seen
+        self.last_pts = None
+        self.anchors = 0        # Times the clock was (re)anchored
+
+    def stamp(self, pts_ms: Optional[float], now: Optional[float] = None, wall: Optional[datetime] = None) -> FrameStamp:
+        """Stamp a frame with PTS `pts_ms`, read at `now` (default: the current time)"""
+        now = now if now is not None else time.monotonic()
+        wall = wall or datetime.utcnow()
+        # Live streams often report 0 (or -1): no usable PTS
+        if pts_ms is None or pts_ms <= 0:
+            return FrameStamp(now, wall)
+
+        pts = pts_ms / 1000.0
+        offset = now - pts
+        if (self.offset is None
+                or pts < self.last_pts
+                or offset - self.offset > self.max_lag_seconds):
+            self.offset = offset
+            self.anchors += 1
+        else:
+            self.offset = min(self.offset, offset)
+        self.last_pts = pts
+
+        captured = self.offset + pts          # Never later than `now`
+        return FrameStamp(captured, wall - timedelta(seconds=now - captured), float(pts_ms))
+
+    def stamp_capture(self, capture) -> FrameStamp:
+        """Stamp the frame just read from a cv2.VideoCapture"""
+        now, wall = time.monotonic(), datetime.utcnow()
+        try:
+            import cv2
+            pts = capture.get(cv2.CAP_PROP_POS_MSEC)
+        except Exception:
+            pts = None
+        return self.stamp(pts, now, wall)
@@ -0,0 +1,251 @@
+"""
+CROSS-CAMERA RE-IDENTIFICATION
+Short-lived global identities shared by all cameras.
+
+Every camera track that carries an embedding is bound to a global identity:
+the track's embedding is matched (cosine similarity) against identities seen
+on any camera within the last `ttl_seconds` (capture-time monotonic seconds), and a new identity is created
+when nothing is close enough. Identities live in a small preallocated
+matrix, so a lookup is one matrix-vector product; the least recently seen
+identity is recycled when the matrix is full.
+
+What one camera learns about an identity (a recognized resident, an alert
+already raised) is visible to the others, so a person walking gate → lobby →
+stairwell is recognized and alerted once.
+"""
+
+import threading
+import time
+from typing import Optional, Dict, List, Iterable
+
+import numpy as np
+
+
+class GlobalIdentity:
+    """A person seen on one or more cameras"""
+
+    def __init__(self, global_id: int, first_seen: float, camera_id: int):
+        self.global_id = global_id
+        self.first_seen = first_seen
+        self.last_seen = first_seen
+        self.first_camera = camera_id
+        self.cameras = [camera_id]          # In order of first appearance
+        self.resident_id = None             # Set once any camera recognizes the person
+        self.alerted = {}                   # {incident_type: time.monotonic() of the last alert}
+
+    def to_dict(self, now: Optional[float] = None) -> Dict:
+        now = now if now is not None else time.monotonic()
+        return {
+            "global_id": self.global_id,
+            "seconds_since_first_seen": round(now - self.first_seen, 1),
+            "seconds_since_last_seen": round(now - self.last_seen, 1),
+            "cameras": list(self.cameras),
+            "resident_id": self.resident_id,
+            "alerted": sorted(self.alerted)
+        }
+
+
+class ReIDService:
+    """Binds (camera, track) pairs to global identities by appearance"""
+
+    def __init__(self,
+                 ttl_seconds: float = 120.0,
+                 similarity_threshold: float = 0.6,
+                 max_identities: int = 1000,
+                 feature_momentum: float = 0.9):
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.max_identities = max_identities
+        self.feature_momentum = feature_momentum
+
+        # Index: one row per slot; slot_ids == -1 marks a free slot
+        self._matrix = None                                   # (max_identities, D) unit vectors
+        self._slot_ids = np.full(max_identities, -1, dtype=np.int64)
+        self._last_seen = np.zeros(max_identities, dtype=np.float64)
+        self._slots = {}                                      # {global_id: slot}
+
+        self.identities = {}                                  # {global_id: GlobalIdentity}
+        self._bindings = {}                                   # {(camera_id, track_id): global_id}
+        self._camera_bound = {}                               # {camera_id: {global_id: track_id}}
+        self._next_id = 1
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _normalise(embedding: np.ndarray) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        return embedding / (np.linalg.norm(embedding) + 1e-8)
+
+    def resolve(self,
+                camera_id: int,
+                track_id: int,
+                embedding: Optional[np.ndarray] = None,
+                resident_id: Optional[int] = None,
+                now: Optional[float] = None) -> Optional[int]:
+        """
+        Global identity of a camera track.
+
+        A track keeps the identity it was first bound to; its embedding refines
+        the identity's appearance. An unbound track needs an embedding to be
+        matched or to start a new identity, otherwise None is returned.
+        """
+        now = now if now is not None else time.monotonic()
+        with self.lock:
+            global_id = self._bindings.get((camera_id, track_id))
+            if global_id is not None and global_id not in self.identities:
+                self._unbind(camera_id, track_id)
+                global_id = None
+
+            feature = None
+            if embedding is not None:
+                feature = self._normalise(embedding)
+                if self._matrix is not None and feature.shape[0] != self._matrix.shape[1]:
+                    feature = None  # Different embedding model; cannot be compared
+
+            if global_id is None:
+                if feature is None:
+                    return None
+                global_id = self._match(camera_id, feature, now)
+                if global_id is None:
+                    global_id = self._create(camera_id, feature, now)
+                self._bind(camera_id, track_id, global_id)
+            elif feature is not None:
+                self._refine(global_id, feature)
+
+            identity = self.identities[global_id]
+            identity.last_seen = now
+            self._last_seen[self._slots[global_id]] = now
+            if camera_id not in identity.cameras:
+                identity.cameras.append(camera_id)
+            if resident_id is not None:
+                identity.resident_id = resident_id
+            return global_id
+
+    def _match(self, camera_id: int, feature: np.ndarray, now: float) -> Optional[int]:
+        if self._matrix is None or not self._slots:
+            return None
+        candidates = (self._slot_ids >= 0) & (self._last_seen >= now - self.ttl_seconds)
+        # Someone tracked on this camera right now is a different person
+        for bound_id in self._camera_bound.get(camera_id, {}):
+            slot = self._slots.get(bound_id)
+            if slot is not None:
+                candidates[slot] = False
+        if not candidates.any():
+            return None
+
+        similarities = self._matrix @ feature
+        similarities[~candidates] = -np.inf
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return int(self._slot_ids[best])
+
+    def _create(self, camera_id: int, feature: np.ndarray, now: float) -> int:
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_identities, feature.shape[0]), dtype=np.float32)
+
+        free = np.flatnonzero(self._slot_ids < 0)
+        if len(free):
+            slot = int(free[0])
+        else:
+            slot = int(np.argmin(self._last_seen))
+            self._drop(int(self._slot_ids[slot]))
+
+        global_id = self._next_id
+        self._next_id += 1
+        self._matrix[slot] = feature
+        self._slot_ids[slot] = global_id
+        self._last_seen[slot] = now
+        self._slots[global_id] = slot
+        self.identities[global_id] = GlobalIdentity(global_id, now, camera_id)
+        return global_id
+
+    def _refine(self, global_id: int, feature: np.ndarray):
+        slot = self._slots[global_id]
+        self._matrix[slot] = self._normalise(
+            self.feature_momentum * self._matrix[slot] + (1.0 - self.feature_momentum) * feature
+        )
+
+    def _bind(self, camera_id: int, track_id: int, global_id: int):
+        self._bindings[(camera_id, track_id)] = global_id
+        self._camera_bound.setdefault(camera_id, {})[global_id] = track_id
+
+    def _unbind(self, camera_id: int, track_id: int):
+        global_id = self._bindings.pop((camera_id, track_id), None)
+        bound = self._camera_bound.get(camera_id, {})
+        if global_id is not None and bound.get(global_id) == track_id:
+            del bound[global_id]
+
+    def _drop(self, global_id: int):
+        slot = self._slots.pop(global_id, None)
+        if slot is not None:
+            self._slot_ids[slot] = -1
+        self.identities.pop(global_id, None)
+        for camera_id, bound in self._camera_bound.items():
+            track_id = bound.pop(global_id, None)
+            if track_id is not None:
+                self._bindings.pop((camera_id, track_id), None)
+
+    def release_track(self, camera_id: int, track_id: int):
+        """A camera lost a track; its identity stays matchable until it expires"""
+        with self.lock:
+            self._unbind(camera_id, track_id)
+
+    def identity_for(self, camera_id: int, track_id: int) -> Optional[GlobalIdentity]:
+        with self.lock:
+            global_id = self._bindings.get((camera_id, track_id))
+            return self.identities.get(global_id) if global_id is not None else None
+
+    def resident_for(self, global_id: int) -> Optional[int]:
+        """Resident recognized for this identity on any camera"""
+        with self.lock:
+            identity = self.identities.get(global_id)
+            return identity.resident_id if identity else None
+
+    def claim_alerts(self, global_ids: Iterable[int], incident_type: str, now: Optional[float] = None) -> List[int]:
+        """
+        Mark identities as alerted for `incident_type`.
+        Returns those that had not been alerted within the TTL (the ones worth a new alert).
+        """
+        now = now if now is not None else time.monotonic()
+        fresh = []
+        with self.lock:
+            for global_id in global_ids:
+                identity = self.identities.get(global_id)
+                if identity is None:
+                    continue
+                last = identity.alerted.get(incident_type)
+                if last is None or now - last > self.ttl_seconds:
+                    fresh.append(global_id)
+                identity.alerted[incident_type] = now
+        return fresh
+
+    def evict_expired(self, now: Optional[float] = None) -> List[int]:
+        """Drop identities not seen on any camera within the TTL and not bound to a live track"""
+        now = now if now is not None else time.monotonic()
+        with self.lock:
+            bound = set()
+            for tracks in self._camera_bound.values():
+                bound.update(tracks)
+            expired = [
+                global_id for global_id, identity in self.identities.items()
+                if now - identity.last_seen > self.ttl_seconds and global_id not in bound
+            ]
+            for global_id in expired:
+                self._drop(global_id)
+        return expired
+
+    def active_identities(self, now: Optional[float] = None) -> List[GlobalIdentity]:
+        """Identities seen within the TTL, most recent first"""
+        now = now if now is not None else time.monotonic()
+        with self.lock:
+            active = [i for i in self.identities.values() if now - i.last_seen <= self.ttl_seconds]
+        return sorted(active, key=lambda i: i.last_seen, reverse=True)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "identities": len(self.identities),
+                "bound_tracks": len(self._bindings),
+                "multi_camera": sum(1 for i in self.identities.values() if len(i.cameras) > 1),
+                "capacity": self.max_identities
+            }
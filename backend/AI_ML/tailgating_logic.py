@@ -1,20 +1,36 @@
 """
 TAILGATING DETECTION LOGIC
-Detects multiple persons crossing a virtual tripwire within a short time window.
-Uses Centroid Tracking for person continuity tracking.
+Detects multiple persons crossing virtual tripwires (directional lines or
+zones, see tripwires.py) within a short time window.
+Uses Centroid Tracking or a SORT/DeepSORT-style tracker (Kalman motion +
+appearance embeddings) for person continuity tracking, selectable per camera.
 """
 
 import numpy as np
-from collections import defaultdict
-from dataclasses import dataclass, field
+from collections import defaultdict, deque
+from dataclasses import dataclass, field, replace
 from datetime import datetime, timedelta
 from typing import List, Dict, Tuple, Optional
 import threading
-import time
 import cv2
+import inspect
+import logging
+from scipy.optimize import linear_sum_assignment
 
+from AI_ML.tripwires import Tripwire, LineTripwire, crossing_mask
+from SECURITY.authorization_index import AuthorizationIndex, AuthorizationMethod, TRACK_BOUND_METHODS
+from AI_ML.reid import ReIDService
+from AI_ML.frame_clock import FrameStamp
 
-@dataclass
+try:
+    from filterpy.kalman import KalmanFilter
+    FILTERPY_AVAILABLE = True
+except ImportError:
+    FILTERPY_AVAILABLE = False
+    logging.warning("filterpy not installed. DeepSORT tracker unavailable, using centroid tracking.")
+
+
+@dataclass(slots=True)
 class Person:
     """Represents a detected person in the frame"""
     id: int
@@ -26,7 +42,7 @@ class Person:
     face_embedding: Optional[np.ndarray] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class TailgatingAlert:
     """Alert structure for tailgating incidents"""
     alert_id: str
@@ -36,249 +52,609 @@ class TailgatingAlert:
     persons_authorized: int
     persons_unauthorized: int
     time_window: float  # seconds
+    incident_type: str = "TAILGATING"
+    severity: str = "LOW"
+    snapshot_jpeg: Optional[bytes] = None  # Annotated JPEG, filled by render_snapshot()
+    snapshot_id: Optional[str] = None      # Where the consumer stored it (e.g. incident file path)
     authorized_person_ids: List[int] = field(default_factory=list)
+    global_ids: List[int] = field(default_factory=list)  # Cross-camera identities of crossers not known by face/manual auth
     unauthorized_embeddings: List[np.ndarray] = field(default_factory=list)
     additional_info: str = ""
+    # Raw frame reference and what to draw on it; annotation is left to the consumer,
+    # which drops the frame once the JPEG is encoded
+    frame: Optional[np.ndarray] = None
+    detections: List[Tuple[int, int, int, int]] = field(default_factory=list)
+    person_ids: List[Optional[int]] = field(default_factory=list)  # Track ID per detection
+    authorized_tracks: List[int] = field(default_factory=list)
+    tripwires: List[Tripwire] = field(default_factory=list)
+    stamp: Optional[FrameStamp] = None  # Capture time of the frame that raised the alert
+
+    def render_snapshot(self, quality: int = 85) -> Optional[bytes]:
+        """
+        Annotated JPEG of the alert frame (tripwires + boxes), rendered once;
+        the raw frame is released afterwards, also when drawing or encoding fails.
+        Meant for the consumer's worker thread, not the detector's update().
+        """
+        if self.snapshot_jpeg is None and self.frame is not None:
+            try:
+                snapshot = self.frame.copy()
+                VirtualTripwireVisualizer.draw_tripwires(snapshot, self.tripwires)
+                VirtualTripwireVisualizer.draw_detections(
+                    snapshot,
+                    self.detections,
+                    authorized_ids=self.authorized_tracks,
+                    person_ids=self.person_ids
+                )
+                ok, encoded = cv2.imencode(".jpg", snapshot, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                if ok:
+                    self.snapshot_jpeg = encoded.tobytes()
+            finally:
+                self.frame = None
+        return self.snapshot_jpeg
 
 from collections import OrderedDict
 
+
+@dataclass(slots=True)
+class TrackerUpdate:
+    """Result of one CentroidTracker.update call"""
+    objects: Dict[int, np.ndarray]           # {track_id: centroid} for every live track
+    assignments: Dict[int, int]              # {detection_index: track_id} for this frame's detections
+    bboxes: Dict[int, Tuple[int, int, int, int]]  # {track_id: last bbox}
+    ages: Dict[int, int]                     # {track_id: frames since the track was registered}
+    timestamp: Optional[float] = None        # Capture time (monotonic) of the frame
+
+    def track_for(self, detection_index: int) -> Optional[int]:
+        return self.assignments.get(detection_index)
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (N, 4) and (M, 4) x1, y1, x2, y2 boxes"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-8)
+
+
 class CentroidTracker:
-    def __init__(self, max_disappeared=50):
+    """
+    Centroid tracker with optimal (Hungarian) assignment.
+    The cost of pairing a track with a detection blends normalised centroid
+    distance with (1 - IoU) of their boxes; pairs further apart than
+    `max_distance` pixels are never matched, so the detection starts a new track.
+    """
+
+    def __init__(self, max_disappeared=50, max_distance: float = 80.0, iou_weight: float = 0.3):
         self.nextObjectID = 0
         self.objects = OrderedDict()
         self.disappeared = OrderedDict()
+        self.bboxes = {}
+        self.first_seen = {}
+        self.frame_index = 0
+        self.last_timestamp = None  # Capture time of the last update
         self.maxDisappeared = max_disappeared
+        self.max_distance = max_distance
+        self.iou_weight = iou_weight
+        self.deregister_hooks = []  # Called with the track ID when a track is dropped
 
-    def register(self, centroid):
-        self.objects[self.nextObjectID] = centroid
-        self.disappeared[self.nextObjectID] = 0
+    def register(self, centroid, bbox) -> int:
+        objectID = self.nextObjectID
+        self.objects[objectID] = centroid
+        self.disappeared[objectID] = 0
+        self.bboxes[objectID] = bbox
+        self.first_seen[objectID] = self.frame_index
         self.nextObjectID += 1
+        return objectID
 
     def deregister(self, objectID):
         del self.objects[objectID]
         del self.disappeared[objectID]
+        self.bboxes.pop(objectID, None)
+        self.first_seen.pop(objectID, None)
+        for hook in self.deregister_hooks:
+            hook(objectID)
+
+    def _mark_missed(self, objectID):
+        self.disappeared[objectID] += 1
+        if self.disappeared[objectID] > self.maxDisappeared:
+            self.deregister(objectID)
+
+    def _result(self, assignments: Dict[int, int]) -> TrackerUpdate:
+        return TrackerUpdate(
+            objects=self.objects,
+            assignments=assignments,
+            bboxes=dict(self.bboxes),
+            ages={oid: self.frame_index - self.first_seen[oid] for oid in self.objects},
+            timestamp=self.last_timestamp
+        )
+
+    def assignment_cost(self, track_boxes: np.ndarray, boxes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (cost matrix, gate mask) for tracks x detections"""
+        track_centroids = np.array(list(self.objects.values()), dtype="float")
+        centroids = (boxes[:, :2] + boxes[:, 2:4]) / 2.0
+        D = self.dist(track_centroids, centroids)
+        gate = D <= self.max_distance
+
+        cost = (1.0 - self.iou_weight) * D / self.max_distance
+        if self.iou_weight > 0:
+            cost += self.iou_weight * (1.0 - iou_matrix(track_boxes, boxes))
+        return cost, gate
+
+    def update(self, rects, embeddings=None, timestamp: float = None) -> TrackerUpdate:
+        """Match this frame's boxes to tracks. `embeddings` is accepted for interface parity and unused."""
+        self.frame_index += 1
+        self.last_timestamp = timestamp
+        assignments = {}
 
-    def update(self, rects):
         if len(rects) == 0:
             for objectID in list(self.disappeared.keys()):
-                self.disappeared[objectID] += 1
-                if self.disappeared[objectID] > self.maxDisappeared:
-                    self.deregister(objectID)
-            return self.objects
+                self._mark_missed(objectID)
+            return self._result(assignments)
 
-        inputCentroids = np.zeros((len(rects), 2), dtype="int")
-        for (i, (startX, startY, endX, endY)) in enumerate(rects):
-            cX = int((startX + endX) / 2.0)
-            cY = int((startY + endY) / 2.0)
-            inputCentroids[i] = (cX, cY)
+        boxes = np.asarray(rects, dtype="float")
+        inputCentroids = ((boxes[:, :2] + boxes[:, 2:4]) / 2.0).astype("int")
 
         if len(self.objects) == 0:
             for i in range(0, len(inputCentroids)):
-                self.register(inputCentroids[i])
+                assignments[i] = self.register(inputCentroids[i], tuple(rects[i]))
+            return self._result(assignments)
+
+        objectIDs = list(self.objects.keys())
+        track_boxes = np.array([self.bboxes[oid] for oid in objectIDs], dtype="float")
+
+        cost, gate = self.assignment_cost(track_boxes, boxes)
+        # Gated pairs get a cost no valid pairing can reach, then are dropped after solving
+        rows, cols = linear_sum_assignment(np.where(gate, cost, cost.max() + 1e6))
+        matched = gate[rows, cols]
+        rows, cols = rows[matched], cols[matched]
+
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            objectID = objectIDs[row]
+            self.objects[objectID] = inputCentroids[col]
+            self.bboxes[objectID] = tuple(rects[col])
+            self.disappeared[objectID] = 0
+            assignments[col] = objectID
+
+        unusedRows = np.setdiff1d(np.arange(len(objectIDs)), rows)
+        unusedCols = np.setdiff1d(np.arange(len(rects)), cols)
+        for row in unusedRows.tolist():
+            self._mark_missed(objectIDs[row])
+        for col in unusedCols.tolist():
+            assignments[col] = self.register(inputCentroids[col], tuple(rects[col]))
+
+        return self._result(assignments)
+        
+    def dist(self, a, b):
+        return np.linalg.norm(a[:, np.newaxis] - b, axis=2)
+
+
+class DeepSortTracker(CentroidTracker):
+    """
+    SORT/DeepSORT-style tracker.
+    Every track has a constant-velocity Kalman filter over (cx, cy, w, h); detections
+    are matched against the *predicted* boxes, so people keep their ID through short
+    occlusions and fast motion. When both the track and the detection have an
+    embedding, cosine distance to the track's running-average feature is blended
+    into the cost and gates implausible appearance changes.
+    Same interface as CentroidTracker: update(rects, embeddings) -> TrackerUpdate.
+    """
+
+    def __init__(self,
+                 max_disappeared=50,
+                 max_distance: float = 80.0,
+                 iou_weight: float = 0.3,
+                 appearance_weight: float = 0.5,
+                 max_appearance_distance: float = 0.4,
+                 feature_momentum: float = 0.9):
+        super().__init__(max_disappeared, max_distance, iou_weight)
+        self.appearance_weight = appearance_weight
+        self.max_appearance_distance = max_appearance_distance
+        self.feature_momentum = feature_momentum
+        self.filters = {}   # {track_id: KalmanFilter}
+        self.features = {}  # {track_id: normalised running-average embedding}
+
+    @staticmethod
+    def _create_filter(bbox) -> "KalmanFilter":
+        kf = KalmanFilter(dim_x=8, dim_z=4)
+        kf.F = np.eye(8)
+        kf.F[:4, 4:] = np.eye(4)   # Position += velocity each frame
+        kf.H = np.eye(4, 8)
+        kf.R *= 4.0                # Detector box noise (pixels^2)
+        kf.P[4:, 4:] *= 1000.0     # Unknown initial velocity
+        kf.P *= 10.0
+        kf.Q[4:, 4:] *= 0.01
+        kf.x[:4, 0] = DeepSortTracker._measurement(bbox)
+        return kf
+
+    @staticmethod
+    def _measurement(bbox) -> np.ndarray:
+        x1, y1, x2, y2 = bbox
+        return np.array([(x1 + x2) / 2.0, (y1 + y2) / 2.0, x2 - x1, y2 - y1], dtype="float")
+
+    @staticmethod
+    def _state_box(kf) -> np.ndarray:
+        cx, cy, w, h = kf.x[:4, 0]
+        return np.array([cx - w / 2.0, cy - h / 2.0, cx + w / 2.0, cy + h / 2.0])
+
+    @staticmethod
+    def _normalise(embedding) -> Optional[np.ndarray]:
+        if embedding is None:
+            return None
+        feature = np.asarray(embedding, dtype=np.float32).ravel()
+        return feature / (np.linalg.norm(feature) + 1e-8)
+
+    def register(self, centroid, bbox, feature=None) -> int:
+        objectID = super().register(centroid, bbox)
+        if FILTERPY_AVAILABLE:
+            self.filters[objectID] = self._create_filter(bbox)
+        if feature is not None:
+            self.features[objectID] = feature
+        return objectID
+
+    def deregister(self, objectID):
+        super().deregister(objectID)
+        self.filters.pop(objectID, None)
+        self.features.pop(objectID, None)
+
+    def _appearance_cost(self, objectIDs, features) -> Tuple[np.ndarray, np.ndarray]:
+        """(cosine distance matrix, mask of pairs where both sides have a feature)"""
+        cost = np.zeros((len(objectIDs), len(features)))
+        known = np.zeros_like(cost, dtype=bool)
+        det_cols = [i for i, f in enumerate(features) if f is not None]
+        track_rows = [r for r, oid in enumerate(objectIDs) if oid in self.features]
+        if det_cols and track_rows:
+            track_features = np.stack([self.features[objectIDs[r]] for r in track_rows])
+            det_features = np.stack([features[c] for c in det_cols])
+            if track_features.shape[1] == det_features.shape[1]:
+                block = 1.0 - track_features @ det_features.T
+                cost[np.ix_(track_rows, det_cols)] = block
+                known[np.ix_(track_rows, det_cols)] = True
+        return cost, known
+
+    def update(self, rects, embeddings=None, timestamp: float = None) -> TrackerUpdate:
+        self.frame_index += 1
+        self.last_timestamp = timestamp
+        assignments = {}
+        features = [
+            self._normalise(embeddings[i]) if embeddings and i < len(embeddings) else None
+            for i in range(len(rects))
+        ]
+
+        # Predict every track forward one frame
+        objectIDs = list(self.objects.keys())
+        for oid in objectIDs:
+            kf = self.filters.get(oid)
+            if kf is not None:
+                if kf.x[2, 0] + kf.x[6, 0] <= 0 or kf.x[3, 0] + kf.x[7, 0] <= 0:
+                    kf.x[6:, 0] = 0.0  # Never predict a negative box size
+                kf.predict()
+                self.objects[oid] = kf.x[:2, 0].astype("int")
+
+        if len(rects) == 0:
+            for objectID in objectIDs:
+                self._mark_missed(objectID)
+            return self._result(assignments)
+
+        boxes = np.asarray(rects, dtype="float")
+        inputCentroids = ((boxes[:, :2] + boxes[:, 2:4]) / 2.0).astype("int")
+
+        if objectIDs:
+            track_boxes = np.array([
+                self._state_box(self.filters[oid]) if oid in self.filters else self.bboxes[oid]
+                for oid in objectIDs
+            ], dtype="float")
+            cost, gate = self.assignment_cost(track_boxes, boxes)
+
+            app_cost, known = self._appearance_cost(objectIDs, features)
+            w = self.appearance_weight
+            cost = np.where(known, (1.0 - w) * cost + w * app_cost, cost)
+            gate &= ~known | (app_cost <= self.max_appearance_distance)
+
+            rows, cols = linear_sum_assignment(np.where(gate, cost, cost.max() + 1e6))
+            matched = gate[rows, cols]
+            rows, cols = rows[matched], cols[matched]
         else:
-            objectIDs = list(self.objects.keys())
-            objectCentroids = list(self.objects.values())
+            rows = cols = np.zeros(0, dtype=int)
 
-            D = self.dist(np.array(objectCentroids), inputCentroids)
-            rows = D.min(axis=1).argsort()
-            cols = D.argmin(axis=1)[rows]
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            objectID = objectIDs[row]
+            kf = self.filters.get(objectID)
+            if kf is not None:
+                kf.update(self._measurement(rects[col]))
+            self.objects[objectID] = inputCentroids[col]
+            self.bboxes[objectID] = tuple(rects[col])
+            self.disappeared[objectID] = 0
+            assignments[col] = objectID
 
-            usedRows = set()
-            usedCols = set()
+            feature = features[col]
+            if feature is not None:
+                previous = self.features.get(objectID)
+                if previous is not None and previous.shape == feature.shape:
+                    feature = self._normalise(self.feature_momentum * previous + (1.0 - self.feature_momentum) * feature)
+                self.features[objectID] = feature
 
-            for (row, col) in zip(rows, cols):
-                if row in usedRows or col in usedCols:
-                    continue
+        for row in np.setdiff1d(np.arange(len(objectIDs)), rows).tolist():
+            self._mark_missed(objectIDs[row])
+        for col in np.setdiff1d(np.arange(len(rects)), cols).tolist():
+            assignments[col] = self.register(inputCentroids[col], tuple(rects[col]), features[col])
 
-                objectID = objectIDs[row]
-                self.objects[objectID] = inputCentroids[col]
-                self.disappeared[objectID] = 0
+        return self._result(assignments)
 
-                usedRows.add(row)
-                usedCols.add(col)
 
-            unusedRows = set(range(0, D.shape[0])).difference(usedRows)
-            unusedCols = set(range(0, D.shape[1])).difference(usedCols)
+TRACKERS = {
+    "centroid": CentroidTracker,
+    "deepsort": DeepSortTracker,
+}
 
-            if D.shape[0] >= D.shape[1]:
-                for row in unusedRows:
-                    objectID = objectIDs[row]
-                    self.disappeared[objectID] += 1
-                    if self.disappeared[objectID] > self.maxDisappeared:
-                        self.deregister(objectID)
-            else:
-                for col in unusedCols:
-                    self.register(inputCentroids[col])
 
-        return self.objects
-        
-    def dist(self, a, b):
-        return np.linalg.norm(a[:, np.newaxis] - b, axis=2)
+def create_tracker(tracker_type: str = "centroid", **options):
+    """
+    Build a tracker by name. Options a tracker does not take (e.g. appearance
+    settings for the centroid tracker) are ignored.
+    """
+    if tracker_type == "deepsort" and not FILTERPY_AVAILABLE:
+        logging.warning("DeepSORT tracker requested but filterpy is missing. Using centroid tracker.")
+        tracker_type = "centroid"
+    tracker_cls = TRACKERS.get(tracker_type)
+    if tracker_cls is None:
+        raise ValueError(f"Unknown tracker type: {tracker_type}")
+
+    accepted = inspect.signature(tracker_cls).parameters
+    return tracker_cls(**{k: v for k, v in options.items() if k in accepted})
 
 class TailgatingDetector:
     # ...
     def __init__(self, 
                  tripwire_y: int = 300, 
                  time_window: float = 3.0, 
-                 alert_callback=None):
+                 alert_callback=None,
+                 tripwires: List[Tripwire] = None,
+                 authorization_index: AuthorizationIndex = None,
+                 door_id: int = None,
+                 reid: ReIDService = None,
+                 tracker_options: Dict = None,
+                 tracker_type: str = "centroid",
+                 alert_history_size: int = 100,
+                 recent_alerts_size: int = 20,
+                 crossing_history_size: int = 10):
         self.tripwire_y = tripwire_y
+        self.tripwires = tripwires or [LineTripwire.horizontal(tripwire_y)]  # Default: walking down past y
         self.time_window = time_window
         self.alert_callback = alert_callback
+        self.tracker_type = tracker_type
+        self.tracker_options = {"max_disappeared": 40, **(tracker_options or {})}
+        self.crossing_history_size = crossing_history_size
         
-        # Tracking
-        self.centroid_tracker = CentroidTracker(max_disappeared=40)
-        self.persons_crossing = {}  # {person_id: crossing_time}
-        self.crossing_history = defaultdict(list)
+        # Tracking. Per-track state is dropped when the tracker deregisters the track.
+        self.tracker = self._create_tracker()
+        self.persons_crossing = {}  # {person_id: last crossing_time}
+        self.previous_centroids = {}  # {person_id: centroid in the previous frame}
+        self.crossing_history = defaultdict(lambda: deque(maxlen=self.crossing_history_size))
         self.track_embeddings = {} # {person_id: latest_embedding}
+        self.track_residents = {}  # {person_id: recognized resident_id}
         
+        # Granted entries at this door (RFID/OTP from the API, face matches from here)
+        self.authorization_index = authorization_index or AuthorizationIndex()
+        self.door_id = door_id if door_id is not None else 0  # Door this camera watches
+        self.manual_tracks = set()  # Track IDs authorized through mark_authorization
+        self.recent_crossings = deque(maxlen=256)  # (capture monotonic time, track_id)
         self.last_authorization_time = None
         self.last_authorized_person_id = None
         
-        # Alert management
-        self.recent_alerts = []
-        self.alert_history = []
+        # Cross-camera identities (shared recognition and alert de-duplication)
+        self.reid = reid
+        self.camera_id = door_id
+        self.track_globals = {}     # {person_id: global_id}
+        self.shared_tracks = set()  # Tracks whose resident was recognized on another camera
+        
+        # Alert management (ring buffers; history entries do not keep snapshot frames)
+        self.recent_alerts = deque(maxlen=recent_alerts_size)
+        self.alert_history = deque(maxlen=alert_history_size)
         self.lock = threading.Lock()
     
+    def _create_tracker(self):
+        tracker = create_tracker(self.tracker_type, **self.tracker_options)
+        tracker.deregister_hooks.append(self._forget_track)
+        return tracker
+    
+    def _forget_track(self, track_id: int):
+        """Tracker hook: release everything held for a track that left the scene"""
+        self.persons_crossing.pop(track_id, None)
+        self.previous_centroids.pop(track_id, None)
+        self.crossing_history.pop(track_id, None)
+        self.track_embeddings.pop(track_id, None)
+        self.track_residents.pop(track_id, None)
+        self.manual_tracks.discard(track_id)
+        self.shared_tracks.discard(track_id)
+        if self.track_globals.pop(track_id, None) is not None and self.reid:
+            self.reid.release_track(self.camera_id, track_id)
+    
+    def mark_authorization(self, person_id: int = None, resident_id: int = None, door_id: int = None):
+        """Manually authorize a tracked person (or just the door) now"""
+        with self.lock:
+            if person_id is not None:
+                self.manual_tracks.add(person_id)
+            self.authorization_index.record(
+                door_id if door_id is not None else self.door_id, AuthorizationMethod.MANUAL,
+                resident_id if resident_id is not None else person_id
+            )
+            self.last_authorization_time = datetime.utcnow()
+            self.last_authorized_person_id = person_id if person_id is not None else resident_id
+    
+    def memory_usage(self) -> Dict:
+        """Sizes of the detector's long-lived state, with an approximate byte count"""
+        with self.lock:
+            embedding_bytes = sum(e.nbytes for e in self.track_embeddings.values() if e is not None)
+            alert_bytes = sum(
+                sum(e.nbytes for e in alert.unauthorized_embeddings if e is not None) +
+                len(alert.snapshot_jpeg or b"")
+                for alert in self.alert_history
+            )
+            features = getattr(self.tracker, "features", {})
+            feature_bytes = sum(f.nbytes for f in features.values())
+            return {
+                "tracks": len(self.tracker.objects),
+                "track_embeddings": len(self.track_embeddings),
+                "crossing_history": sum(len(h) for h in self.crossing_history.values()),
+                "recent_alerts": len(self.recent_alerts),
+                "alert_history": len(self.alert_history),
+                "approx_bytes": int(embedding_bytes + alert_bytes + feature_bytes)
+            }
+    
     # ...
     
     def update(self, 
                detections: List[Tuple[int, int, int, int]],
-               embeddings: List[np.ndarray] = None, # Added argument
+               embeddings: List[np.ndarray] = None,
                authorized_ids: List[int] = None,
                camera_id: int = 0,
-               frame: Optional[np.ndarray] = None) -> Optional[TailgatingAlert]:
-        
+               frame: Optional[np.ndarray] = None,
+               resident_ids: List[Optional[int]] = None,
+               stamp: Optional[FrameStamp] = None) -> Optional[TailgatingAlert]:
+        """
+        Args:
+            detections: Person bboxes of this frame
+            embeddings: Face embedding per detection (or None)
+            authorized_ids: Track IDs known to be authorized
+            resident_ids: Recognized resident ID per detection (or None); the
+                          track a detection is assigned to becomes authorized
+            stamp: Capture time of the frame; all windows use it instead of
+                   the processing time (defaults to now)
+        """
         if authorized_ids is None:
             authorized_ids = []
+        door = self.door_id
+        stamp = stamp or FrameStamp.now()
             
         with self.lock:
-            # Update centroid tracker
-            # We ideally need the mapping from detection_idx -> object_id to assign embeddings
-            # For now, we will use a heuristic: match centroid to detection
+            current_time = stamp.wall
+            now = stamp.monotonic
+            self.camera_id = camera_id
+            tracks = self.tracker.update(detections, embeddings, timestamp=now)
+            tracked_objects = tracks.objects
             
-            tracked_objects = self.centroid_tracker.update(detections)
+            # Per-detection data follows the tracker's own assignment
+            for det_idx, track_id in tracks.assignments.items():
+                embedding = embeddings[det_idx] if embeddings and det_idx < len(embeddings) else None
+                resident_id = resident_ids[det_idx] if resident_ids and det_idx < len(resident_ids) else None
+                if embedding is not None:
+                    self.track_embeddings[track_id] = embedding
+                if resident_id is not None:
+                    if track_id not in self.track_residents or track_id in self.shared_tracks:
+                        # First recognition of this person here: a face authorization at this door
+                        self.authorization_index.record(door, AuthorizationMethod.FACE, resident_id, timestamp=now)
+                        self.last_authorization_time = current_time
+                        self.last_authorized_person_id = resident_id
+                        self.shared_tracks.discard(track_id)
+                    self.track_residents[track_id] = resident_id
+                
+                if self.reid:
+                    global_id = self.reid.resolve(camera_id, track_id, embedding, resident_id, now=now)
+                    if global_id is not None:
+                        self.track_globals[track_id] = global_id
+                        shared_resident = self.reid.resident_for(global_id)
+                        if shared_resident is not None and track_id not in self.track_residents:
+                            # Recognized on another camera: known here without a new face match
+                            self.track_residents[track_id] = shared_resident
+                            self.shared_tracks.add(track_id)
             
-            # Update embeddings for tracked objects
-            if embeddings:
-                # Naive matching: Find closest tracked object for each detection with embedding
-                # This duplicates some work of CentroidTracker but is necessary without refactoring it
-                for i, rect in enumerate(detections):
-                    if i < len(embeddings) and embeddings[i] is not None:
-                        # Find object ID corresponding to this rect
-                        # (Calculate center and find closest in tracked_objects)
-                        cX = (rect[0] + rect[2]) // 2
-                        cY = (rect[1] + rect[3]) // 2
-                        
-                        best_dist = 9999
-                        best_id = -1
-                        
-                        for obj_id, centroid in tracked_objects.items():
-                            dist = np.linalg.norm(np.array([cX, cY]) - np.array(centroid))
-                            if dist < 50 and dist < best_dist: # Same threshold as tracker
-                                best_dist = dist
-                                best_id = obj_id
-                        
-                        if best_id != -1:
-                            self.track_embeddings[best_id] = embeddings[i]
+            authorized_tracks = set(authorized_ids) | set(self.track_residents) | self.manual_tracks
             
-            # Check crossing logic
-            current_time = datetime.utcnow()
+            # Crossings: previous -> current centroid of every track, tested at once
             crossed_persons = []
             
-            for person_id, centroid in tracked_objects.items():
-                cy = centroid[1]
+            if tracked_objects:
+                track_ids = list(tracked_objects.keys())
+                curr = np.array([tracked_objects[pid] for pid in track_ids], dtype=float).reshape(-1, 2)
+                prev = np.array([
+                    self.previous_centroids.get(pid, tracked_objects[pid]) for pid in track_ids
+                ], dtype=float).reshape(-1, 2)
+                crossed = crossing_mask(self.tripwires, prev, curr)
+                self.previous_centroids = dict(zip(track_ids, curr))
                 
-                # Check if person crosses tripwire (coming from above)
-                if cy > self.tripwire_y:
-                    if person_id not in self.persons_crossing:
-                        self.persons_crossing[person_id] = current_time
-                        self.crossing_history[person_id].append(current_time)
-                        crossed_persons.append(person_id)
-                else:
-                    # Remove from crossing dict if person goes back
-                    if person_id in self.persons_crossing:
-                        del self.persons_crossing[person_id]
+                for person_id in np.asarray(track_ids)[crossed].tolist():
+                    self.persons_crossing[person_id] = current_time
+                    self.crossing_history[person_id].append(current_time)
+                    crossed_persons.append(person_id)
             
-            # Analyze crossing pattern
+            # Analyze crossing pattern: every crossing in the window must be covered
+            # by an authorization granted at this door in the same window
             alert = None
-            if len(crossed_persons) > 0 and self.last_authorization_time:
-                time_since_auth = (current_time - self.last_authorization_time).total_seconds()
+            if crossed_persons:
+                window_start = now - self.time_window
+                for pid in crossed_persons:
+                    self.recent_crossings.append((now, pid))
+                while self.recent_crossings and self.recent_crossings[0][0] < window_start:
+                    self.recent_crossings.popleft()
+                window_tracks = list(dict.fromkeys(pid for _, pid in self.recent_crossings))
                 
-                # Check if crossing occurred within time window after authorization
-                if time_since_auth < self.time_window:
-                    # Count authorized vs unauthorized
-                    auth_count = sum(1 for pid in crossed_persons if pid in authorized_ids)
-                    unauth_count = len(crossed_persons) - auth_count
+                granted = self.authorization_index.count_since(door, window_start, now)
+                door_events = self.authorization_index.events_since(door, window_start, now, exclude=TRACK_BOUND_METHODS)
+                door_grants = len(door_events)
+                
+                auth_tracks = [pid for pid in window_tracks if pid in authorized_tracks]
+                # RFID/OTP grants are not tied to a track: each covers one otherwise unknown crosser
+                covered = min(door_grants, len(window_tracks) - len(auth_tracks))
+                auth_count = len(auth_tracks) + covered
+                unauth_count = len(window_tracks) - auth_count
+                
+                # Tailgating: someone was authorized in the window, more than one person
+                # crossed, and at least one of them is not covered by an authorization
+                suspects = [pid for pid in window_tracks if pid not in authorized_tracks]
+                global_ids = [self.track_globals[pid] for pid in suspects if pid in self.track_globals]
+                if granted > 0 and len(window_tracks) > 1 and unauth_count > 0 and self.reid and \
+                        len(global_ids) == len(suspects) and \
+                        not self.reid.claim_alerts(global_ids, "TAILGATING", now=now):
+                    # Every suspect was already alerted on, here or on another camera
+                    unauth_count = 0
+                
+                if granted > 0 and len(window_tracks) > 1 and unauth_count > 0:
+                    crossed_persons = window_tracks
+                    severity = self._calculate_severity(len(crossed_persons), unauth_count)
                     
-                    # Tailgating: More than 1 person within time window OR just an unauthorized person following
-                    # condition: >1 person total, at least 1 unauthorized
-                    if len(crossed_persons) > 1 and unauth_count > 0:
-                        severity = self._calculate_severity(len(crossed_persons), unauth_count)
-                        
-                        # Collect unauthorized embeddings
-                        unauth_embeddings = []
-                        for pid in crossed_persons:
-                            if pid not in authorized_ids and pid in self.track_embeddings:
-                                unauth_embeddings.append(self.track_embeddings[pid])
-                        
-                        # Create visual snapshot
-                        snapshot_frame = None
-                        if frame is not None:
-                            snapshot_frame = frame.copy()
-                            VirtualTripwireVisualizer.draw_tripwire(snapshot_frame, self.tripwire_y)
-                            VirtualTripwireVisualizer.draw_detections(
-                                snapshot_frame, 
-                                detections, 
-                                authorized_ids=authorized_ids, 
-                                person_ids=[obj_id for obj_id in tracked_objects.keys()] # Approximate mapping? No, detections list doesn't match keys directly order-wise
-                                # Better to just label all detections based on location matching or just draw all boxes
-                            )
-                            # Re-matching for visualization is tricky without idx map, let's keep it simple
-                            # Just draw all rectangles, color red/green if in authorized_ids
-                            # Actually VirtualTripwireVisualizer needs specific logic.
-                            # Let's fix VirtualTripwireVisualizer usage later or simplify drawing here.
-
-                            # Simplified Drawing
-                            import cv2
-                            cv2.line(snapshot_frame, (0, self.tripwire_y), (snapshot_frame.shape[1], self.tripwire_y), (0, 255, 255), 2)
-                            for i, (x1, y1, x2, y2) in enumerate(detections):
-                                is_auth = False
-                                # Try to find which object ID this is
-                                cX, cY = (x1+x2)//2, (y1+y2)//2
-                                for oid, cent in tracked_objects.items():
-                                    if np.linalg.norm(np.array([cX, cY]) - np.array(cent)) < 20:
-                                        if oid in authorized_ids:
-                                            is_auth = True
-                                        break
-                                
-                                color = (0, 255, 0) if is_auth else (0, 0, 255)
-                                cv2.rectangle(snapshot_frame, (x1, y1), (x2, y2), color, 2)
-                                status = "AUTH" if is_auth else "UNAUTH"
-                                cv2.putText(snapshot_frame, status, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
-                        alert = TailgatingAlert(
-                            alert_id=f"TAILGATE_{camera_id}_{current_time.timestamp()}",
-                            timestamp=current_time,
-                            camera_id=camera_id,
-                            persons_detected=len(tracked_objects),
-                            persons_authorized=auth_count,
-                            persons_unauthorized=unauth_count,
-                            time_window=self.time_window,
-                            severity=severity,
-                            snapshot=snapshot_frame,
-                            authorized_person_ids=[pid for pid in crossed_persons if pid in authorized_ids],
-                            unauthorized_embeddings=unauth_embeddings,
-                            additional_info=f"Authorized: {self.last_authorized_person_id}, "
-                                          f"Unauthorized crossed: {unauth_count}"
-                        )
-                        
-                        self.recent_alerts.append(alert)
-                        self.alert_history.append(alert)
-                        
-                        if self.alert_callback:
-                            self.alert_callback(alert)
-            
-            return alert
+                    # Collect unauthorized embeddings
+                    unauth_embeddings = []
+                    for pid in crossed_persons:
+                        if pid not in authorized_tracks and pid in self.track_embeddings:
+                            unauth_embeddings.append(self.track_embeddings[pid])
+                    
+                    alert = TailgatingAlert(
+                        alert_id=f"TAILGATE_{camera_id}_{current_time.timestamp()}",
+                        timestamp=current_time,
+                        camera_id=camera_id,
+                        persons_detected=len(tracked_objects),
+                        persons_authorized=auth_count,
+                        persons_unauthorized=unauth_count,
+                        time_window=self.time_window,
+                        severity=severity,
+                        authorized_person_ids=list(dict.fromkeys(
+                            [self.track_residents.get(pid, pid) for pid in auth_tracks] +
+                            [e.subject_id for e in door_events[:covered] if e.subject_id is not None]
+                        )),
+                        global_ids=global_ids,
+                        unauthorized_embeddings=unauth_embeddings,
+                        additional_info=f"Authorized: {self.last_authorized_person_id}, "
+                                      f"Unauthorized crossed: {unauth_count}",
+                        frame=frame,
+                        detections=list(detections),
+                        person_ids=[tracks.track_for(i) for i in range(len(detections))],
+                        authorized_tracks=sorted(authorized_tracks),
+                        tripwires=self.tripwires,
+                        stamp=stamp
+                    )
+                    
+                    # Only the returned alert keeps the frame
+                    stored = replace(alert, frame=None)
+                    self.recent_alerts.append(stored)
+                    self.alert_history.append(stored)
+        
+        if alert and self.alert_callback:
+            self.alert_callback(alert)
+        return alert
     
     def _calculate_severity(self, total_persons: int, unauth_persons: int) -> str:
         """Calculate alert severity based on number of unauthorized persons"""
@@ -297,8 +673,17 @@ class TailgatingDetector:
     def reset(self):
         """Reset tracker state"""
         with self.lock:
-            self.centroid_tracker = CentroidTracker()
+            self.tracker = self._create_tracker()
             self.persons_crossing = {}
+            self.previous_centroids = {}
+            self.crossing_history.clear()
+            self.track_embeddings = {}
+            self.track_residents = {}
+            for track_id in self.track_globals:
+                if self.reid:
+                    self.reid.release_track(self.camera_id, track_id)
+            self.track_globals = {}
+            self.shared_tracks = set()
             self.last_authorization_time = None
             self.last_authorized_person_id = None
 
@@ -316,6 +701,19 @@ class VirtualTripwireVisualizer:
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
         return frame
     
+    @staticmethod
+    def draw_tripwires(frame: np.ndarray, tripwires: List[Tripwire], color: Tuple[int, int, int] = (0, 255, 255)):
+        """Draw line and zone tripwires with their names"""
+        import cv2
+        h, w = frame.shape[:2]
+        for tripwire in tripwires:
+            points = np.clip(tripwire.polyline(), -10 * w, 10 * w).astype(np.int32)
+            cv2.polylines(frame, [points.reshape(-1, 1, 2)], False, color, 2)
+            anchor = np.clip(points.min(axis=0), 0, [w - 1, h - 1])
+            cv2.putText(frame, tripwire.name.upper(), (int(anchor[0]) + 10, int(anchor[1]) - 10),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        return frame
+    
     @staticmethod
     def draw_detections(frame: np.ndarray,
                        detections: List[Tuple[int, int, int, int]],
@@ -329,12 +727,12 @@ class VirtualTripwireVisualizer:
             person_ids = list(range(len(detections)))
         
         for i, (x1, y1, x2, y2) in enumerate(detections):
-            pid = person_ids[i] if i < len(person_ids) else i
-            is_auth = pid in authorized_ids
+            pid = person_ids[i] if i < len(person_ids) else None
+            is_auth = pid is not None and pid in authorized_ids
             color = (0, 255, 0) if is_auth else (0, 0, 255)
             
             cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-            label = f"ID:{pid} {'AUTH' if is_auth else 'UNK'}"
+            label = f"ID:{'?' if pid is None else pid} {'AUTH' if is_auth else 'UNK'}"
             cv2.putText(frame, label, (x1, y1 - 5),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
         
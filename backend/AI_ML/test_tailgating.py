@@ -1,6 +1,10 @@
 #!/usr/bin/env python
-from AI.tailgating_logic import CentroidTracker, TailgatingDetector
-from datetime import datetime
+from AI_ML.tailgating_logic import CentroidTracker, TailgatingDetector, create_tracker
+from AI_ML.tripwires import LineTripwire, ZoneTripwire, tripwire_from_config
+from AI_ML.frame_clock import FrameStamp
+from datetime import datetime, timedelta
+import numpy as np
+import cv2
 
 print("\n" + "="*60)
 print("🧪 TAILGATING DETECTION TEST")
@@ -13,13 +17,134 @@ tracker = CentroidTracker()
 
 # Frame 1
 detections = [(100, 100, 150, 200), (300, 150, 350, 250)]
-objects = tracker.update(detections)
+objects = tracker.update(detections).objects
 print(f"✅ Frame 1: Tracked {len(objects)} persons with IDs {list(objects.keys())}")
 
-# Frame 2
-detections = [(105, 105, 155, 205), (305, 155, 355, 255)]
-objects = tracker.update(detections)
-print(f"✅ Frame 2: Tracked {len(objects)} persons with IDs {list(objects.keys())}\n")
+# Frame 2 (detections listed in reverse order)
+detections = [(305, 155, 355, 255), (105, 105, 155, 205)]
+tracks = tracker.update(detections)
+objects = tracks.objects
+assert tracks.assignments == {0: 1, 1: 0}
+assert tracks.bboxes[0] == (105, 105, 155, 205) and tracks.ages == {0: 1, 1: 1}
+print(f"✅ Frame 2: Tracked {len(objects)} persons, detection→track map {tracks.assignments}")
+
+# Frame 3: one person jumps beyond the gating distance
+detections = [(110, 110, 160, 210), (600, 400, 650, 500)]
+tracks = tracker.update(detections)
+assert tracks.assignments == {0: 0, 1: 2}, "Far detection must start a new track, not steal track 1"
+assert tracker.disappeared[1] == 1
+print(f"✅ Frame 3: Gated jump started track {tracks.assignments[1]}\n")
+
+# Test 1b: DeepSORT-style tracker
+print("Test 1b: DeepSORT Tracker")
+print("-" * 60)
+tracker = create_tracker("deepsort", max_distance=60, appearance_weight=0.5)
+rng = np.random.default_rng(1)
+face_a, face_b = rng.normal(size=128), rng.normal(size=128)
+
+# Two people walk past each other; detector output order flips every frame
+for frame in range(20):
+    ax, bx = 100 + frame * 10, 300 - frame * 10
+    detections = [(ax - 20, 150, ax + 20, 250), (bx - 20, 155, bx + 20, 255)]
+    embeddings = [face_a + rng.normal(scale=0.1, size=128), face_b + rng.normal(scale=0.1, size=128)]
+    if frame % 2:
+        detections, embeddings = detections[::-1], embeddings[::-1]
+    tracks = tracker.update(detections, embeddings)
+    assert tracks.assignments[frame % 2] == 0, f"Person A lost their ID at frame {frame}"
+
+# Person A is occluded for 3 frames, then reappears further along their path
+for frame in range(20, 23):
+    tracker.update([(bx - 20, 155, bx + 20, 255)])
+ax = 100 + 23 * 10
+tracks = tracker.update([(ax - 20, 150, ax + 20, 250)], [face_a])
+assert tracks.assignments == {0: 0} and tracker.nextObjectID == 2
+print("✅ IDs stable through crossing paths and a 3-frame occlusion\n")
+
+# Test 1c: Bounded detector state
+print("Test 1c: Bounded Detector State")
+print("-" * 60)
+detector = TailgatingDetector(tripwire_y=300, tracker_options={"max_disappeared": 2}, alert_history_size=5)
+for frame in range(200):
+    x = (frame * 97) % 600  # A new person every frame, far from the previous one
+    detector.update([(x, 320, x + 40, 420)], embeddings=[np.ones(128, dtype=np.float32)], resident_ids=[None])
+usage = detector.memory_usage()
+assert usage["tracks"] <= 3 and usage["track_embeddings"] <= 3, usage
+assert len(detector.persons_crossing) <= 3 and len(detector.crossing_history) <= 3
+print(f"✅ State after 200 one-off tracks: {usage}\n")
+
+# Test 1d: Directional tripwires
+print("Test 1d: Directional Tripwires")
+print("-" * 60)
+line = LineTripwire((100, 300), (500, 300), direction="positive")
+prev = np.array([[200, 280], [200, 320], [200, 320], [50, 280], [300, 350]])
+curr = np.array([[200, 320], [200, 280], [200, 330], [50, 320], [300, 360]])
+# Down across / up across / below the whole time / beside the segment / below the whole time
+assert line.crossings(prev, curr).tolist() == [True, False, False, False, False]
+assert LineTripwire((100, 300), (500, 300), "both").crossings(prev, curr).tolist() == [True, True, False, False, False]
+
+zone = tripwire_from_config({"type": "zone", "points": [[100, 100], [300, 100], [300, 300], [100, 300]]})
+assert isinstance(zone, ZoneTripwire)
+prev = np.array([[50, 200], [200, 200], [200, 200], [50, 50]])
+curr = np.array([[150, 200], [350, 200], [210, 210], [60, 60]])
+assert zone.crossings(prev, curr).tolist() == [True, False, False, False]
+
+detector = TailgatingDetector(tripwires=[line])
+detector.update([(180, 330, 220, 430)])  # Appears already below the line
+detector.update([(180, 340, 220, 440)])
+assert not detector.persons_crossing, "Standing below the line is not a crossing"
+detector.update([(330, 180, 370, 280)])  # New person above the line (first one left the frame)
+detector.update([(330, 260, 370, 360)])  # ...walks down across it
+assert list(detector.persons_crossing) == [1]
+print("✅ Only directional crossings of the segment/zone are counted\n")
+
+# Test 1e: Alerts carry the raw frame; annotation is rendered by the consumer
+print("Test 1e: Lazy Snapshot Rendering")
+print("-" * 60)
+detector = TailgatingDetector(tripwire_y=300)
+frame = np.zeros((480, 640, 3), dtype=np.uint8)
+detector.mark_authorization()
+detector.update([(100, 200, 150, 290), (300, 200, 350, 290)], camera_id=3, frame=frame)
+alert = detector.update([(100, 250, 150, 350), (300, 250, 350, 350)], camera_id=3, frame=frame)
+assert alert is not None and alert.frame is frame and alert.snapshot_jpeg is None
+assert not frame.any(), "update() must not draw on the frame"
+jpeg = alert.render_snapshot()
+assert jpeg[:2] == b"\xff\xd8" and alert.render_snapshot() is jpeg
+assert alert.frame is None, "The raw frame is released once encoded"
+assert detector.alert_history[-1].frame is None
+assert not hasattr(alert, "__dict__"), "Alerts are slotted records"
+alert.frame = np.zeros((0, 0, 3), dtype=np.uint8)  # Nothing to encode
+alert.snapshot_jpeg = None
+try:
+    alert.render_snapshot()
+except cv2.error:
+    pass
+assert alert.frame is None and alert.snapshot_jpeg is None, "The frame is released when rendering fails"
+print(f"✅ Snapshot rendered on demand ({len(jpeg)} JPEG bytes), history keeps no frames\n")
+
+# Test 1f: Windows follow capture time, not processing time
+print("Test 1f: Capture-Time Windows")
+print("-" * 60)
+t0 = FrameStamp.now().monotonic
+def stamp_at(seconds):
+    return FrameStamp(t0 + seconds, datetime(2024, 1, 1) + timedelta(seconds=seconds))
+
+detector = TailgatingDetector(tripwire_y=300, time_window=3.0)
+detector.authorization_index.record(0, "RFID", timestamp=t0 + 3.5)
+# Frames queued behind a slow model are processed back to back
+detector.update([(100, 200, 150, 290)], stamp=stamp_at(0.0))
+detector.update([(100, 250, 150, 350)], stamp=stamp_at(0.5))
+detector.update([(100, 250, 150, 350), (300, 200, 350, 290)], stamp=stamp_at(4.0))
+alert = detector.update([(100, 250, 150, 350), (300, 250, 350, 350)], stamp=stamp_at(4.5))
+assert alert is None, "Crossings captured 4s apart are outside the 3s window"
+assert detector.persons_crossing[1] == datetime(2024, 1, 1, 0, 0, 4, 500000)
+
+detector = TailgatingDetector(tripwire_y=300, time_window=3.0)
+detector.authorization_index.record(0, "RFID", timestamp=t0)
+detector.update([(100, 200, 150, 290), (300, 200, 350, 290)], stamp=stamp_at(0.0))
+detector.update([(100, 250, 150, 350), (300, 200, 350, 290)], stamp=stamp_at(0.5))
+alert = detector.update([(100, 250, 150, 350), (300, 250, 350, 350)], stamp=stamp_at(1.5))
+assert alert is not None and alert.timestamp == datetime(2024, 1, 1, 0, 0, 1, 500000)
+print("✅ Crossing times, windows and alert timestamps come from the frame stamps\n")
 
 # Test 2: Tailgating Detector
 print("Test 2: Tailgating Detector")
@@ -37,7 +162,8 @@ detector = TailgatingDetector(tripwire_y=300, alert_callback=alert_callback)
 detector.mark_authorization(person_id=0)
 print("✅ Person 0 authorized")
 
-# Simulate crossing
+# Simulate crossing: both persons approach from above, then step over the line
+detector.update([(100, 200, 150, 290), (300, 200, 350, 290)], camera_id=3)
 detections = [
     (100, 250, 150, 350),  # Person 0 crossing
     (300, 250, 350, 350),  # Person 1 crossing (unauthorized)
@@ -48,11 +174,23 @@ if alert:
     print("✅ Alert generated!")
     print(f"   Severity: {alert.severity}")
     print(f"   Detected: {alert.persons_detected}, Authorized: {alert.persons_authorized}\n")
-    assert alert.severity == "MEDIUM" or alert.severity == "HIGH"
+    assert alert.severity == "LOW", "One unauthorized person following is LOW"
 else:
     print("ℹ️  No alert (test conditions)\n")
     # In this specific test setup (simulating crossing), we EXPECT an alert
     assert False, "Expected an alert but none was generated"
 
+# Two unauthorized persons following one authorized entry escalate the severity
+detector = TailgatingDetector(tripwire_y=300, alert_callback=alert_callback)
+detector.mark_authorization(person_id=0)
+detector.update([(100, 200, 150, 290), (300, 200, 350, 290), (500, 200, 550, 290)], camera_id=3)
+alert = detector.update(
+    [(100, 250, 150, 350), (300, 250, 350, 350), (500, 250, 550, 350)],
+    authorized_ids=[0], camera_id=3
+)
+assert alert is not None and alert.persons_detected == 3 and alert.persons_authorized == 1
+assert alert.severity == "MEDIUM", alert.severity
+print(f"✅ Two tailgaters: severity {alert.severity}\n")
+
 print("✅ Test completed successfully!\n")
 print("="*60 + "\n")
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+VIRTUAL TRIPWIRES
+Directional line-segment and polygon-zone tripwires.
+
+A crossing is the movement of a track's centroid from its previous position to
+its current one, tested for all tracks at once with numpy:
+    LineTripwire: the movement segment intersects the line segment, going from
+                  its negative to its positive side (or the reverse / both ways).
+                  The side of a point is the sign of cross(p2 - p1, point - p1);
+                  for a line drawn left to right in image coordinates, positive
+                  is below the line, so "positive" means walking downwards.
+    ZoneTripwire: the centroid moves from outside to inside the polygon
+                  ("enter"), inside to outside ("exit") or either ("both").
+
+Coordinates are in the processing resolution (frames are resized to 800px wide).
+"""
+
+import numpy as np
+from typing import List, Dict, Sequence
+
+
+class Tripwire:
+    """Base class: `crossings(prev, curr)` returns a boolean mask over tracks"""
+
+    def __init__(self, name: str, direction: str):
+        self.name = name
+        self.direction = direction
+
+    def crossings(self, prev: np.ndarray, curr: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def polyline(self) -> np.ndarray:
+        """Points to draw, as an (N, 2) int array"""
+        raise NotImplementedError
+
+    def to_config(self) -> Dict:
+        raise NotImplementedError
+
+
+def _cross(origin: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """z of (a - origin) x (b - origin), broadcast over leading dimensions"""
+    return (a[..., 0] - origin[..., 0]) * (b[..., 1] - origin[..., 1]) - \
+           (a[..., 1] - origin[..., 1]) * (b[..., 0] - origin[..., 0])
+
+
+class LineTripwire(Tripwire):
+    DIRECTIONS = ("positive", "negative", "both")
+
+    def __init__(self, p1: Sequence[float], p2: Sequence[float], direction: str = "positive", name: str = "line"):
+        if direction not in self.DIRECTIONS:
+            raise ValueError(f"Line tripwire direction must be one of {self.DIRECTIONS}, got {direction!r}")
+        super().__init__(name, direction)
+        self.p1 = np.asarray(p1, dtype=float)
+        self.p2 = np.asarray(p2, dtype=float)
+
+    @classmethod
+    def horizontal(cls, y: float, direction: str = "positive", name: str = "tripwire") -> "LineTripwire":
+        """Full-width horizontal line; "positive" = crossing downwards"""
+        return cls((-1e6, y), (1e6, y), direction, name)
+
+    def side(self, points: np.ndarray) -> np.ndarray:
+        return np.sign(_cross(self.p1, self.p2, points))
+
+    def crossings(self, prev: np.ndarray, curr: np.ndarray) -> np.ndarray:
+        prev = np.asarray(prev, dtype=float).reshape(-1, 2)
+        curr = np.asarray(curr, dtype=float).reshape(-1, 2)
+        side_prev = self.side(prev)
+        side_curr = self.side(curr)
+
+        # The movement must touch the line's extent, not just its infinite extension
+        seg_p1 = np.sign(_cross(prev, curr, np.broadcast_to(self.p1, prev.shape)))
+        seg_p2 = np.sign(_cross(prev, curr, np.broadcast_to(self.p2, prev.shape)))
+        within = seg_p1 * seg_p2 <= 0
+
+        if self.direction == "positive":
+            directional = (side_prev < 0) & (side_curr >= 0)
+        elif self.direction == "negative":
+            directional = (side_prev > 0) & (side_curr <= 0)
+        else:
+            directional = side_prev * side_curr < 0
+        return directional & within
+
+    def polyline(self) -> np.ndarray:
+        return np.array([self.p1, self.p2]).astype(int)
+
+    def to_config(self) -> Dict:
+        return {"type": "line", "name": self.name, "points": [self.p1.tolist(), self.p2.tolist()],
+                "direction": self.direction}
+
+
+class ZoneTripwire(Tripwire):
+    DIRECTIONS = ("enter", "exit", "both")
+
+    def __init__(self, polygon: Sequence[Sequence[float]], direction: str = "enter", name: str = "zone"):
+        if direction not in self.DIRECTIONS:
+            raise ValueError(f"Zone tripwire direction must be one of {self.DIRECTIONS}, got {direction!r}")
+        super().__init__(name, direction)
+        self.polygon = np.asarray(polygon, dtype=float)
+        if self.polygon.ndim != 2 or len(self.polygon) < 3:
+            raise ValueError("Zone tripwire needs a polygon of at least 3 points")
+        self._edge_start = self.polygon
+        self._edge_end = np.roll(self.polygon, -1, axis=0)
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        """Vectorized even-odd point-in-polygon test for (N, 2) points"""
+        px = points[:, None, 0]
+        py = points[:, None, 1]
+        x1, y1 = self._edge_start[None, :, 0], self._edge_start[None, :, 1]
+        x2, y2 = self._edge_end[None, :, 0], self._edge_end[None, :, 1]
+        straddles = (y1 > py) != (y2 > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_at_y = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+        hits = straddles & (px < x_at_y)
+        return (hits.sum(axis=1) % 2) == 1
+
+    def crossings(self, prev: np.ndarray, curr: np.ndarray) -> np.ndarray:
+        prev = np.asarray(prev, dtype=float).reshape(-1, 2)
+        curr = np.asarray(curr, dtype=float).reshape(-1, 2)
+        inside_prev = self.contains(prev)
+        inside_curr = self.contains(curr)
+        if self.direction == "enter":
+            return ~inside_prev & inside_curr
+        if self.direction == "exit":
+            return inside_prev & ~inside_curr
+        return inside_prev != inside_curr
+
+    def polyline(self) -> np.ndarray:
+        return np.vstack([self.polygon, self.polygon[:1]]).astype(int)
+
+    def to_config(self) -> Dict:
+        return {"type": "zone", "name": self.name, "points": self.polygon.tolist(), "direction": self.direction}
+
+
+def tripwire_from_config(config: Dict) -> Tripwire:
+    """
+    Build a tripwire from a config entry, e.g.
+        {"type": "line", "points": [[0, 300], [800, 300]], "direction": "positive"}
+        {"type": "zone", "points": [[100, 250], [500, 250], [500, 450], [100, 450]], "direction": "enter"}
+    """
+    kind = config.get("type", "line")
+    name = config.get("name", kind)
+    if kind == "line":
+        points = config["points"]
+        if len(points) != 2:
+            raise ValueError("Line tripwire needs exactly 2 points")
+        return LineTripwire(points[0], points[1], config.get("direction", "positive"), name)
+    if kind == "zone":
+        return ZoneTripwire(config["points"], config.get("direction", "enter"), name)
+    raise ValueError(f"Unknown tripwire type: {kind}")
+
+
+def tripwires_from_config(configs: List[Dict]) -> List[Tripwire]:
+    return [tripwire_from_config(c) for c in configs]
+
+
+def crossing_mask(tripwires: List[Tripwire], prev: np.ndarray, curr: np.ndarray) -> np.ndarray:
+    """True for tracks whose movement crossed any tripwire"""
+    mask = np.zeros(len(prev), dtype=bool)
+    for tripwire in tripwires:
+        mask |= tripwire.crossings(prev, curr)
+    return mask
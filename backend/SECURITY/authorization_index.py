@@ -0,0 +1,148 @@
+"""
+AUTHORIZATION EVENT INDEX
+Time-ordered, per-door record of granted entries (RFID, OTP, face, manual).
+
+Access endpoints write to it and the tailgating detectors ask "how many
+authorizations were granted at this door in the last T seconds" for every
+crossing. Timestamps are time.monotonic(), the clock frames are stamped with
+at capture (AI_ML/frame_clock.py). Each (door, method) pair keeps a bounded, time-sorted ring, so a
+window count is two binary searches.
+"""
+
+import bisect
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Iterable
+
+
+class AuthorizationMethod:
+    RFID = "RFID"
+    OTP = "OTP"
+    FACE = "FACE"
+    MANUAL = "MANUAL"
+
+
+# Methods that authorize a specific tracked person; the others (RFID, OTP)
+# open the door for whoever walks through next.
+TRACK_BOUND_METHODS = (AuthorizationMethod.FACE, AuthorizationMethod.MANUAL)
+
+
+@dataclass
+class AuthorizationEvent:
+    timestamp: float           # time.monotonic()
+    door_id: int
+    method: str
+    subject_id: Optional[int] = None  # Resident ID (host resident for OTP visitors)
+
+
+class _EventRing:
+    """Time-sorted events with a moving start offset; compacted once half is stale"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.times: List[float] = []
+        self.events: List[AuthorizationEvent] = []
+        self.start = 0
+
+    def add(self, event: AuthorizationEvent):
+        if not self.times or event.timestamp >= self.times[-1]:
+            self.times.append(event.timestamp)
+            self.events.append(event)
+        else:  # Late event (e.g. a delayed webhook): keep the ring sorted
+            pos = bisect.bisect_right(self.times, event.timestamp, lo=self.start)
+            self.times.insert(pos, event.timestamp)
+            self.events.insert(pos, event)
+
+        if len(self.times) - self.start > self.capacity:
+            self.start = len(self.times) - self.capacity
+        if self.start > self.capacity:
+            del self.times[:self.start]
+            del self.events[:self.start]
+            self.start = 0
+
+    def count_between(self, since: float, until: float) -> int:
+        lo = bisect.bisect_left(self.times, since, lo=self.start)
+        hi = bisect.bisect_right(self.times, until, lo=lo)
+        return hi - lo
+
+    def between(self, since: float, until: float) -> List[AuthorizationEvent]:
+        lo = bisect.bisect_left(self.times, since, lo=self.start)
+        hi = bisect.bisect_right(self.times, until, lo=lo)
+        return self.events[lo:hi]
+
+    def __len__(self):
+        return len(self.times) - self.start
+
+
+class AuthorizationIndex:
+    """Per-door authorization events, queried by time window in O(log n)"""
+
+    def __init__(self, capacity_per_door: int = 256):
+        self.capacity_per_door = capacity_per_door
+        self._rings: Dict[int, Dict[str, _EventRing]] = {}
+        self.lock = threading.Lock()
+
+    def record(self,
+               door_id: int,
+               method: str,
+               subject_id: Optional[int] = None,
+               timestamp: Optional[float] = None) -> AuthorizationEvent:
+        """Record a granted entry at a door"""
+        event = AuthorizationEvent(
+            timestamp=timestamp if timestamp is not None else time.monotonic(),
+            door_id=door_id,
+            method=method,
+            subject_id=subject_id
+        )
+        with self.lock:
+            methods = self._rings.setdefault(door_id, {})
+            ring = methods.get(method)
+            if ring is None:
+                ring = methods[method] = _EventRing(self.capacity_per_door)
+            ring.add(event)
+        return event
+
+    def _selected(self, door_id: int, methods: Optional[Iterable[str]], exclude: Iterable[str]) -> List[_EventRing]:
+        rings = self._rings.get(door_id, {})
+        names = rings.keys() if methods is None else methods
+        return [rings[name] for name in names if name in rings and name not in exclude]
+
+    def count_since(self,
+                    door_id: int,
+                    since: float,
+                    until: Optional[float] = None,
+                    methods: Optional[Iterable[str]] = None,
+                    exclude: Iterable[str] = ()) -> int:
+        """Authorizations granted at `door_id` in [since, until]"""
+        until = until if until is not None else time.monotonic()
+        with self.lock:
+            return sum(ring.count_between(since, until) for ring in self._selected(door_id, methods, exclude))
+
+    def count_in_window(self, door_id: int, window_seconds: float, now: Optional[float] = None, **filters) -> int:
+        """Authorizations granted at `door_id` in the last `window_seconds`"""
+        now = now if now is not None else time.monotonic()
+        return self.count_since(door_id, now - window_seconds, now, **filters)
+
+    def events_since(self,
+                     door_id: int,
+                     since: float,
+                     until: Optional[float] = None,
+                     methods: Optional[Iterable[str]] = None,
+                     exclude: Iterable[str] = ()) -> List[AuthorizationEvent]:
+        """Events at `door_id` in [since, until], oldest first"""
+        until = until if until is not None else time.monotonic()
+        with self.lock:
+            events = [
+                event
+                for ring in self._selected(door_id, methods, exclude)
+                for event in ring.between(since, until)
+            ]
+        return sorted(events, key=lambda e: e.timestamp)
+
+    def latest(self, door_id: int) -> Optional[AuthorizationEvent]:
+        with self.lock:
+            candidates = [
+                ring.events[-1] for ring in self._rings.get(door_id, {}).values() if len(ring)
+            ]
+        return max(candidates, key=lambda e: e.timestamp) if candidates else None
@@ -7,18 +7,18 @@ import asyncio
 import cv2
 import numpy as np
 import logging
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks, Request
+from sqlalchemy import or_, and_
 from sqlalchemy.orm import Session
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 import socketio
 from datetime import datetime, timedelta
 import threading
+import time
 import json
-import base64
-from typing import List, Optional, Dict
-import pickle
+from typing import List, Optional, Dict, Union
 import uuid
 
 # Import custom modules
@@ -26,12 +26,32 @@ import sys
 sys.path.append('..')
 sys.path.append('..') # Add backend (again)
 sys.path.append('../..') # Add project root for whatsapp_automation
-from database import get_db, engine
+from database import get_db, engine, SessionLocal, upgrade_schema
 from models import Base, Resident, Visitor, IncidentLog, AccessLog, CameraConfig
-from config import CAMERA_CONFIG, SECURITY_GUARDS
+from config import CAMERA_CONFIG, SECURITY_GUARDS, GALLERY_CONFIG, TAILGATING_CONFIG, REID_CONFIG, INCIDENT_CONFIG, CLIP_CONFIG, RECORDING_CONFIG, WEBSOCKET_CONFIG, PREVIEW_CONFIG
 from AI_ML.tailgating_logic import TailgatingDetector, TailgatingAlert
+from AI_ML.tripwires import Tripwire, LineTripwire, tripwires_from_config
 from AI_ML.ai_ml_utils import FrameProcessor, ResidentDatabase
+from AI_ML.reid import ReIDService
+from AI_ML.frame_clock import FrameStamp, CaptureClock
+from gallery.gallery_store import (
+    GallerySnapshot, apply_resident_row, decode_templates, embedding_columns, resident_metadata,
+    parse_scopes, format_scopes, EMBEDDING_FORMAT_VERSION
+)
+from gallery.change_feed import GalleryChangeFeed, record_change, UPSERT, DEACTIVATE, DELETE
+from gallery.guest_tier import GuestGallery, TieredGallery
+from media.snapshot_writer import SnapshotWriter, SnapshotTicket
+from media.clip_recorder import ClipRecorder, ClipTicket
+from media.retention import MediaRetention
+from media.segment_recorder import SegmentRecorder, SegmentIndex, to_epoch, to_naive_utc
+from media.serving import ThumbnailCache, IMAGE_EXTENSIONS, resolve_media_path, media_url, media_response
+from streaming.client_channel import ClientChannel
+from streaming.frame_protocol import FramePacket
+from streaming.preview import PreviewEncoder
+from streaming.mjpeg import MjpegStreams
+from streaming.subscriptions import ALL, FRAME, parse_request
 from SECURITY.visitor_otp_system import otp_system, rfid_auth, VisitorStatus
+from SECURITY.authorization_index import AuthorizationIndex, AuthorizationMethod
 from agent_mode.agent_core import SurakshaSetuAgent
 
 # Logging setup
@@ -65,13 +85,31 @@ class SystemState:
         self.active_cameras = {}  # {camera_id: {"stream_url": str, "processor": ..., "tailgating_detector": ...}}
         self.frame_processors = {}  # {camera_id: FrameProcessor}
         self.tailgating_detectors = {}  # {camera_id: TailgatingDetector}
-        self.resident_db = ResidentDatabase()
+        self.resident_db = ResidentDatabase(
+            max_templates=GALLERY_CONFIG["max_templates_per_identity"],
+            shortlist=GALLERY_CONFIG["centroid_shortlist"],
+            dedup_similarity=GALLERY_CONFIG["template_dedup_similarity"]
+        )
+        self.guest_gallery = GuestGallery(
+            ttl_hours=GALLERY_CONFIG["guest_ttl_hours"],
+            max_entries=GALLERY_CONFIG["guest_max_entries"],
+            max_templates=GALLERY_CONFIG["max_templates_per_identity"],
+            dedup_similarity=GALLERY_CONFIG["template_dedup_similarity"]
+        )
+        self.gallery = TieredGallery(self.resident_db, self.guest_gallery)  # Residents + expiring guests
+        self.authorization_index = AuthorizationIndex(TAILGATING_CONFIG["authorization_ring_size"])  # Door ID = camera ID
+        self.reid = ReIDService(
+            ttl_seconds=REID_CONFIG["ttl_seconds"],
+            similarity_threshold=REID_CONFIG["similarity_threshold"],
+            max_identities=REID_CONFIG["max_identities"],
+            feature_momentum=REID_CONFIG["feature_momentum"]
+        ) if REID_CONFIG["enabled"] else None  # Global identities shared by all cameras
         self.incidents = []
         self.access_logs = []
         self.connected_clients = []
         self.lock = threading.Lock()
         self.siren_enabled = True
-        self.guest_notifications = {} # {guest_id: timestamp}
+        self.guest_notifications = {} # {guest_id: capture monotonic time of the last notification}
     
     def add_client(self, client):
         with self.lock:
@@ -92,6 +130,67 @@ class SystemState:
                     logger.error(f"Failed to broadcast to client: {e}")
 
 system_state = SystemState()
+gallery_snapshot = GallerySnapshot(GALLERY_CONFIG["snapshot_dir"])
+snapshot_writer = SnapshotWriter(
+    INCIDENT_CONFIG["snapshot_dir"],
+    workers=INCIDENT_CONFIG["snapshot_workers"],
+    queue_size=INCIDENT_CONFIG["snapshot_queue_size"],
+    quality=INCIDENT_CONFIG["snapshot_quality"]
+)
+clip_recorder = ClipRecorder(
+    CLIP_CONFIG["clip_dir"],
+    pre_seconds=CLIP_CONFIG["pre_seconds"],
+    post_seconds=CLIP_CONFIG["post_seconds"],
+    fps=CLIP_CONFIG["fps"],
+    quality=CLIP_CONFIG["quality"],
+    max_buffer_bytes=CLIP_CONFIG["max_buffer_bytes"],
+    max_pending=CLIP_CONFIG["max_pending"]
+) if CLIP_CONFIG["enabled"] else None
+media_retention = MediaRetention(
+    INCIDENT_CONFIG["snapshot_dir"],
+    max_bytes=INCIDENT_CONFIG["max_disk_mb"] * 1024 * 1024,
+    max_age_days=INCIDENT_CONFIG["max_age_days"],
+    grace_seconds=INCIDENT_CONFIG["retention_grace_seconds"]
+)
+segment_recorder = None
+recording_retention = None
+if RECORDING_CONFIG["enabled"]:
+    segment_recorder = SegmentRecorder(
+        RECORDING_CONFIG["recording_dir"],
+        SegmentIndex(RECORDING_CONFIG["index_path"]),
+        segment_seconds=RECORDING_CONFIG["segment_seconds"],
+        fps=RECORDING_CONFIG["fps"],
+        fourcc=RECORDING_CONFIG["fourcc"],
+        extension=RECORDING_CONFIG["extension"],
+        max_gap_seconds=RECORDING_CONFIG["max_gap_seconds"],
+        queue_seconds=RECORDING_CONFIG["queue_seconds"]
+    )
+    recording_retention = MediaRetention(
+        RECORDING_CONFIG["recording_dir"],
+        max_bytes=RECORDING_CONFIG["max_disk_mb"] * 1024 * 1024,
+        max_age_days=RECORDING_CONFIG["max_age_days"],
+        grace_seconds=RECORDING_CONFIG["segment_seconds"] * 2,   # Never the segment being written
+        on_delete=segment_recorder.index.remove_path
+    )
+preview_encoder = PreviewEncoder(PREVIEW_CONFIG["tiers"])
+mjpeg_streams = MjpegStreams(
+    max_viewers=PREVIEW_CONFIG["mjpeg_max_viewers"],
+    keepalive_seconds=PREVIEW_CONFIG["mjpeg_keepalive_seconds"]
+)
+thumbnail_cache = ThumbnailCache(
+    INCIDENT_CONFIG["thumbnail_dir"],
+    widths=INCIDENT_CONFIG["thumbnail_widths"],
+    quality=INCIDENT_CONFIG["thumbnail_quality"]
+)
+gallery_feed = GalleryChangeFeed(
+    SessionLocal,
+    system_state.gallery,
+    signal_path=GALLERY_CONFIG["change_signal_path"],
+    poll_interval=GALLERY_CONFIG["change_poll_interval_seconds"],
+    full_poll_interval=GALLERY_CONFIG["change_full_poll_seconds"],
+    allow_legacy_pickle=GALLERY_CONFIG["allow_legacy_pickle"],
+    gap_timeout=GALLERY_CONFIG["change_gap_seconds"]
+)
 agent = SurakshaSetuAgent()
 
 # WhatsApp Handler
@@ -142,12 +241,6 @@ verification_state = SecurityVerificationState()
 
 # ==================== UTILITY FUNCTIONS ====================
 
-def encode_frame_to_base64(frame: np.ndarray) -> str:
-    """Convert numpy frame to base64 string for JSON transmission"""
-    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-    return base64.b64encode(buffer).decode()
-
-
 def play_siren(duration: float = 2.0):
     """Play siren sound when HIGH severity alert triggered"""
     if not system_state.siren_enabled:
@@ -168,31 +261,409 @@ def play_siren(duration: float = 2.0):
         logger.warning(f"Could not play siren: {e}")
 
 
-def save_incident_snapshot(frame: np.ndarray, incident_type: str) -> str:
-    """Save incident snapshot to disk and return filename"""
+def save_incident_snapshot(frame: np.ndarray, incident_type: str, camera_id: Optional[int] = None) -> Optional[SnapshotTicket]:
+    """Queue an incident snapshot; the ticket's path is final, its future completes once written"""
+    return snapshot_writer.submit(incident_type, frame=frame, camera_id=camera_id)
+
+
+def save_alert_snapshot(alert: TailgatingAlert, incident_type: str = "TAILGATING") -> Optional[SnapshotTicket]:
+    """
+    Queue the alert's annotated snapshot; rendering and encoding happen on a writer thread.
+    Afterwards the alert keeps only the snapshot ID (file path), no frame or image bytes.
+    """
+    def render():
+        jpeg = alert.render_snapshot(quality=INCIDENT_CONFIG["snapshot_quality"])
+        alert.snapshot_jpeg = None
+        return jpeg
+    
+    ticket = snapshot_writer.submit(incident_type, render=render, camera_id=alert.camera_id)
+    if ticket:
+        alert.snapshot_id = ticket.path
+    else:
+        alert.frame = None  # Dropped (queue full / writer stopped); don't keep the frame alive via the alert
+        alert.snapshot_jpeg = None
+    return ticket
+
+
+def send_snapshot_when_written(ticket: Optional[SnapshotTicket], msg: str, phone: str):
+    """
+    WhatsApp the snapshot to `phone` once the writer has it on disk, or just the message if it failed.
+    The recipient goes with the send itself: other alerts and replies change the default one meanwhile.
+    """
+    path = ticket.result(timeout=30) if ticket else None
+    if path:
+        whatsapp.send_snapshot(path, msg, number=phone)
+    else:
+        whatsapp.send_message(msg, number=phone)
+
+
+def record_incident_clip(camera_id: int, event_time: float, incident_type: str) -> Optional[ClipTicket]:
+    """Start a pre/post-event clip from the camera's buffer; the ticket's path is final"""
+    if clip_recorder is None:
+        return None
+    return clip_recorder.record(camera_id, event_time, incident_type)
+
+
+def notify_agent_when_written(ticket: Optional[SnapshotTicket], event: Dict, clip: Optional[ClipTicket] = None):
+    """Hand an event to the agent once its snapshot file (and clip, if any) exists"""
+    def notify_with_clip(future=None):
+        video_path = future.result() if future else None
+        if video_path:
+            event["video_path"] = video_path
+        agent.handle_security_event(event)
+
+    def notify(future=None):
+        event["snapshot_path"] = future.result() if future else None
+        if clip:
+            clip.future.add_done_callback(notify_with_clip)
+        else:
+            notify_with_clip()
+
+    if ticket:
+        ticket.future.add_done_callback(notify)
+    else:
+        notify()
+
+
+def camera_scopes(camera_id: int) -> Optional[List[str]]:
+    """Gallery partitions a camera searches; None means the whole gallery"""
+    scopes = CAMERA_CONFIG.get(camera_id, {}).get("scopes")
+    if not scopes:
+        return None
+    return parse_scopes(scopes) + [f"camera:{camera_id}"]
+
+
+def camera_tripwires(camera_id: int) -> List[Tripwire]:
+    """Tripwires of a camera: CameraConfig row, else CAMERA_CONFIG, else the default line"""
+    configs = CAMERA_CONFIG.get(camera_id, {}).get("tripwires")
+    db = SessionLocal()
     try:
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")
-        filename = f"incidents/{incident_type}_{timestamp}.jpg"
+        row = db.query(CameraConfig).filter(CameraConfig.camera_id == camera_id).first()
+        if row and row.tripwires:
+            configs = json.loads(row.tripwires)
+    except Exception as e:
+        logger.error(f"Failed to read tripwires for Camera {camera_id}: {e}")
+    finally:
+        db.close()
+    
+    if not configs:
+        return [LineTripwire.horizontal(TAILGATING_CONFIG["tripwire_y"])]
+    return tripwires_from_config(configs)
+
+
+def create_tailgating_detector(camera_id: int) -> TailgatingDetector:
+    """Tailgating detector configured from TAILGATING_CONFIG and the camera's tracker choice"""
+    return TailgatingDetector(
+        tripwire_y=TAILGATING_CONFIG["tripwire_y"],
+        time_window=TAILGATING_CONFIG["time_window"],
+        tripwires=camera_tripwires(camera_id),
+        authorization_index=system_state.authorization_index,
+        door_id=camera_id,
+        reid=system_state.reid,
+        tracker_options=TAILGATING_CONFIG["tracker"],
+        tracker_type=CAMERA_CONFIG.get(camera_id, {}).get("tracker", TAILGATING_CONFIG["tracker_type"]),
+        alert_history_size=TAILGATING_CONFIG["alert_history_size"],
+        recent_alerts_size=TAILGATING_CONFIG["recent_alerts_size"],
+        crossing_history_size=TAILGATING_CONFIG["crossing_history_size"]
+    )
+
+
+def load_residents_from_db(db, since: Optional[datetime] = None) -> int:
+    """
+    Apply Resident rows to the in-memory gallery.
+    With `since`, only rows updated after that time are read (inactive ones are removed).
+    Guests are never part of the snapshot, so active guests are always read.
+    Legacy pickled embeddings are re-written in the binary format as they are read.
+    """
+    model_name = system_state.resident_db.face_engine.model_name
+    query = db.query(Resident)
+    if since is None:
+        query = query.filter(Resident.is_active == True)
+    else:
+        query = query.filter(or_(
+            Resident.last_updated > since,
+            and_(Resident.flat_number == "GUEST", Resident.is_active == True)
+        ))
+    
+    count = 0
+    migrated = 0
+    for r in query.yield_per(500):
+        try:
+            embedding = apply_resident_row(
+                system_state.gallery, r, GALLERY_CONFIG["allow_legacy_pickle"]
+            )
+            if embedding is None:
+                continue
+            count += 1
+            
+            if r.embedding_version != EMBEDDING_FORMAT_VERSION:
+                for column, value in embedding_columns(embedding, model_name).items():
+                    setattr(r, column, value)
+                migrated += 1
+        except Exception as e:
+            logger.error(f"Failed to load resident {r.id}: {e}")
+    
+    if migrated:
+        db.commit()
+        logger.info(f"Migrated {migrated} legacy embeddings to binary format")
+    return count
+
+
+def gallery_snapshot_worker():
+    """Periodically persist the in-memory gallery for fast startup and prune the change feed"""
+    interval = GALLERY_CONFIG["snapshot_interval_seconds"]
+    model_name = system_state.resident_db.face_engine.model_name
+    while True:
+        time.sleep(interval)
+        try:
+            gallery_snapshot.write(
+                system_state.resident_db, model_name, feed_version=gallery_feed.last_version
+            )
+            gallery_feed.prune(GALLERY_CONFIG["change_retention_hours"])
+        except Exception as e:
+            logger.error(f"Failed to write gallery snapshot: {e}")
+
+
+def publish_gallery_change(db, resident_id: int, operation: str):
+    """Record a gallery change for other workers, commit, and signal them"""
+    record_change(db, resident_id, operation)
+    db.commit()
+    gallery_feed.notify()
+
+
+def delete_guests(db, guest_ids: List[int]) -> int:
+    """Delete guest rows and tell every worker to drop them"""
+    if not guest_ids:
+        return 0
+    deleted = (
+        db.query(Resident)
+        .filter(Resident.id.in_(guest_ids), Resident.flat_number == "GUEST")
+        .delete(synchronize_session=False)
+    )
+    for guest_id in guest_ids:
+        record_change(db, guest_id, DELETE)
+        system_state.gallery.remove_resident(guest_id)
+    db.commit()
+    gallery_feed.notify()
+    return deleted
+
+
+def record_guest_sightings(db, seen: Dict[int, datetime]):
+    """Share this worker's guest recognitions through Resident.last_seen"""
+    for guest_id, seen_at in seen.items():
+        db.query(Resident).filter(
+            Resident.id == guest_id,
+            (Resident.last_seen.is_(None)) | (Resident.last_seen < seen_at)
+        ).update(
+            # Keep last_updated: a sighting is not a gallery change
+            {Resident.last_seen: seen_at, Resident.last_updated: Resident.last_updated},
+            synchronize_session=False
+        )
+    db.commit()
+
+
+def guest_eviction_worker():
+    """Evict expired and over-capacity guests from memory and the database, and expired re-ID identities"""
+    interval = GALLERY_CONFIG["guest_eviction_interval_seconds"]
+    while True:
+        time.sleep(interval)
+        if system_state.reid is not None:
+            try:
+                dropped = system_state.reid.evict_expired()
+                if dropped:
+                    logger.debug(f"Re-ID: dropped {len(dropped)} expired global identities")
+            except Exception as e:
+                logger.error(f"Re-ID eviction failed: {e}")
+        try:
+            expired = system_state.guest_gallery.evict_expired()
+            seen = system_state.guest_gallery.drain_seen()
+            
+            db = SessionLocal()
+            try:
+                record_guest_sightings(db, seen)
+                # Also catches guests that expired while no process had them loaded
+                expired_rows = (
+                    db.query(Resident.id)
+                    .filter(Resident.flat_number == "GUEST", Resident.expires_at <= datetime.utcnow())
+                    .all()
+                )
+                # Capacity from shared recency, so every worker picks the same guests
+                active_guests = (
+                    db.query(Resident.id, Resident.last_seen, Resident.enrollment_date)
+                    .filter(Resident.flat_number == "GUEST", Resident.is_active == True)
+                    .all()
+                )
+                overflow = system_state.guest_gallery.select_overflow(
+                    (row.id, row.last_seen or row.enrollment_date) for row in active_guests
+                )
+                stale_ids = set(expired) | set(overflow) | {row.id for row in expired_rows}
+                deleted = delete_guests(db, sorted(stale_ids))
+            finally:
+                db.close()
+            
+            if stale_ids:
+                logger.info(
+                    f"Guest tier: evicted {len(expired)} expired and {len(overflow)} over-capacity guest(s), "
+                    f"{deleted} row(s) deleted, {len(system_state.guest_gallery)} guest(s) active"
+                )
+        except Exception as e:
+            logger.error(f"Guest eviction failed: {e}")
+
+
+def protected_media_paths(db) -> set:
+    """Snapshot/clip files still referenced by incidents or pending verifications"""
+    paths = set()
+    for snapshot_path, video_path in db.query(IncidentLog.snapshot_path, IncidentLog.video_path).filter(
+        (IncidentLog.snapshot_path.isnot(None)) | (IncidentLog.video_path.isnot(None))
+    ):
+        paths.update(p for p in (snapshot_path, video_path) if p)
+    with verification_state.lock:
+        pending = list(verification_state.pending_by_id.values()) + list(verification_state.pending_verifications.values())
+    for data in pending:
+        paths.update(data.get(key) for key in ("snapshot_path", "video_path") if data.get(key))
+    return paths
+
+
+def media_retention_worker():
+    """Periodically enforce the incident media age limit and disk budget"""
+    interval = INCIDENT_CONFIG["retention_interval_seconds"]
+    while True:
+        time.sleep(interval)
+        try:
+            db = SessionLocal()
+            try:
+                protected = protected_media_paths(db)
+            finally:
+                db.close()
+            report = media_retention.compact(protected)
+            if report["deleted_files"] or report["over_budget"]:
+                logger.info(
+                    f"Incident media: deleted {report['deleted_files']} file(s), "
+                    f"reclaimed {report['reclaimed_bytes'] / 1e6:.1f} MB, "
+                    f"{report['remaining_bytes'] / 1e6:.1f}/{report['budget_bytes'] / 1e6:.0f} MB used, "
+                    f"{report['protected_files']} protected"
+                )
+            if report["over_budget"]:
+                logger.warning("Incident media still over budget: remaining files are protected or too recent")
+        except Exception as e:
+            logger.error(f"Media retention failed: {e}")
+
+
+def recording_retention_worker():
+    """Periodically enforce the continuous recording age limit and disk budget"""
+    interval = RECORDING_CONFIG["retention_interval_seconds"]
+    while True:
+        time.sleep(interval)
+        try:
+            report = recording_retention.compact()
+            if report["deleted_files"]:
+                logger.info(
+                    f"Recordings: deleted {report['deleted_files']} segment(s), "
+                    f"reclaimed {report['reclaimed_bytes'] / 1e6:.1f} MB, "
+                    f"{report['remaining_bytes'] / 1e6:.1f}/{report['budget_bytes'] / 1e6:.0f} MB used"
+                )
+        except Exception as e:
+            logger.error(f"Recording retention failed: {e}")
+
+
+def append_resident_template(db, resident: Resident, embedding: np.ndarray) -> bool:
+    """
+    Add a face template to an existing Resident row and the in-memory gallery.
+    Returns False if the resident already has enough templates or the new one is a near-duplicate.
+    """
+    templates = decode_templates(
+        resident.face_embedding,
+        dim=resident.embedding_dim,
+        version=resident.embedding_version,
+        allow_legacy_pickle=GALLERY_CONFIG["allow_legacy_pickle"]
+    )
+    merged = ResidentDatabase.merge_template(
+        templates, embedding,
+        GALLERY_CONFIG["max_templates_per_identity"],
+        GALLERY_CONFIG["template_dedup_similarity"]
+    )
+    if merged is None:
+        return False
+    
+    for column, value in embedding_columns(merged, system_state.resident_db.face_engine.model_name).items():
+        setattr(resident, column, value)
+    publish_gallery_change(db, resident.id, UPSERT)
+    system_state.gallery.add_embedding(
+        resident.id, resident.name, merged, resident_metadata(resident), enrollment_time=resident.enrollment_date
+    )
+    return True
+
+
+def enroll_guest_embeddings(db, host_name: str, host_phone: str, embeddings: List[np.ndarray]) -> int:
+    """
+    Enroll verified guests of a host into the expiring guest tier.
+    A face that already matches one of this host's guests becomes an extra template
+    of that guest (and renews their expiry) instead of a new gallery identity.
+    Returns the number of faces stored.
+    """
+    enrolled = 0
+    expires_at = datetime.utcnow() + timedelta(hours=GALLERY_CONFIG["guest_ttl_hours"])
+    host = (
+        db.query(Resident)
+        .filter(Resident.phone_number == host_phone, Resident.flat_number != "GUEST")
+        .first()
+    )
+    host_scopes = host.access_scopes if host else None  # Guests are seen where their host is
+    for embedding in embeddings:
+        if embedding is None:
+            continue
         
-        # Create incidents directory if needed
-        import os
-        os.makedirs("incidents", exist_ok=True)
+        match = system_state.guest_gallery.recognize_face(embedding)
+        if match and match["metadata"].get("phone") == host_phone:
+            guest_resident = db.query(Resident).filter(Resident.id == match["resident_id"]).first()
+            if guest_resident:
+                guest_resident.expires_at = expires_at
+                if append_resident_template(db, guest_resident, embedding):
+                    enrolled += 1
+                    logger.info(f"Added template to guest ID {guest_resident.id} for host {host_name}")
+                else:
+                    publish_gallery_change(db, guest_resident.id, UPSERT)
+                    apply_resident_row(system_state.gallery, guest_resident, GALLERY_CONFIG["allow_legacy_pickle"])
+                continue
         
-        cv2.imwrite(filename, frame)
-        logger.info(f"Incident snapshot saved: {filename}")
-        return filename
-    except Exception as e:
-        logger.error(f"Failed to save snapshot: {e}")
-        return None
+        guest_name = f"Guest of {host_name}"
+        guest_resident = Resident(
+            name=guest_name,
+            flat_number="GUEST",
+            height_cm=0.0,
+            phone_number=host_phone, # Host's phone
+            **embedding_columns(embedding, system_state.resident_db.face_engine.model_name),
+            is_active=True,
+            enrollment_date=datetime.utcnow(),
+            last_updated=datetime.utcnow(),
+            expires_at=expires_at,
+            access_scopes=host_scopes
+        )
+        db.add(guest_resident)
+        db.flush()
+        publish_gallery_change(db, guest_resident.id, UPSERT)
+        db.refresh(guest_resident)
+        
+        # Add to in-memory DB
+        system_state.gallery.add_embedding(
+            guest_resident.id, guest_name, embedding, resident_metadata(guest_resident)
+        )
+        enrolled += 1
+        logger.info(f"Enrolled guest ID {guest_resident.id} for host {host_name}")
+    
+    return enrolled
 
 
 async def handle_tailgating_alert(alert: TailgatingAlert, db=None):
     """Handle tailgating alert - Check for authorized host or trigger alarm"""
     
-    # 1. Save snapshot first (needed for both flows)
-    snapshot_path = None
-    if alert.snapshot is not None:
-        snapshot_path = save_incident_snapshot(alert.snapshot, "TAILGATING")
+    # 1. Queue the snapshot first (needed for both flows); its path is known immediately,
+    #    rendering and writing happen on the snapshot writer threads
+    loop = asyncio.get_running_loop()
+    snapshot_ticket = save_alert_snapshot(alert)
+    snapshot_path = snapshot_ticket.path if snapshot_ticket else None
+    clip_ticket = record_incident_clip(alert.camera_id, alert.stamp.monotonic, "TAILGATING") if alert.stamp else None
+    video_path = clip_ticket.path if clip_ticket else None
     
     # 2. Check if we have EXACTLY ONE authorized person ( The Host )
     # alert.authorized_person_ids should be populated now
@@ -221,12 +692,8 @@ async def handle_tailgating_alert(alert: TailgatingAlert, db=None):
                        f"Reply *YES* to authorize.\n"
                        f"Reply *NO* to report unauthorized entry.")
                 
-                # Ensure number specific format if needed, usually handles by bridge
-                whatsapp.set_user_number(host_resident.phone_number)
-                
-                # Send asynchronously to avoid blocking event loop
-                loop = asyncio.get_running_loop()
-                await loop.run_in_executor(None, whatsapp.send_snapshot, snapshot_path, msg)
+                # Send asynchronously to avoid blocking event loop (after the snapshot is on disk)
+                await loop.run_in_executor(None, send_snapshot_when_written, snapshot_ticket, msg, host_resident.phone_number)
                 
                 # Generate unique verification ID
                 import uuid
@@ -239,6 +706,7 @@ async def handle_tailgating_alert(alert: TailgatingAlert, db=None):
                     "camera_id": alert.camera_id,
                     "unauthorized_count": alert.persons_unauthorized,
                     "snapshot_path": snapshot_path,
+                    "video_path": video_path,
                     "resident_id": host_resident.id,
                     "resident_name": host_resident.name,
                     "phone_number": host_resident.phone_number,
@@ -257,7 +725,10 @@ async def handle_tailgating_alert(alert: TailgatingAlert, db=None):
                     "persons_detected": alert.persons_detected,
                     "persons_authorized": alert.persons_authorized,
                     "persons_unauthorized": alert.persons_unauthorized,
+                    "global_ids": alert.global_ids,
                     "snapshot_path": snapshot_path,
+                    "snapshot_url": media_url(INCIDENT_CONFIG["snapshot_dir"], snapshot_path),
+                    "video_path": video_path,
                     "message": f"Verification sent to {host_resident.name} for {alert.persons_unauthorized} guest(s)."
                 }
                 await manager.broadcast(alert_payload)
@@ -304,7 +775,8 @@ async def handle_tailgating_alert(alert: TailgatingAlert, db=None):
             person_ids="UNAUTHORIZED_DETECTED",
             additional_details=alert.additional_info,
             resolved=False,
-            snapshot_path=snapshot_path
+            snapshot_path=snapshot_path,
+            video_path=video_path
         )
         db_session.add(incident)
         db_session.commit()
@@ -326,7 +798,10 @@ async def handle_tailgating_alert(alert: TailgatingAlert, db=None):
         "persons_detected": alert.persons_detected,
         "persons_authorized": alert.persons_authorized,
         "persons_unauthorized": alert.persons_unauthorized,
+        "global_ids": alert.global_ids,
         "snapshot_path": snapshot_path,
+        "snapshot_url": media_url(INCIDENT_CONFIG["snapshot_dir"], snapshot_path),
+        "video_path": video_path,
         "message": f"TAILGATING DETECTED: {alert.persons_unauthorized} unauthorized person(s) detected!"
     }
     
@@ -334,21 +809,15 @@ async def handle_tailgating_alert(alert: TailgatingAlert, db=None):
 
     # Notify Agent
     if agent and agent.is_active:
-        snapshot_abs_path = None
-        if snapshot_path:
-            import os
-            snapshot_abs_path = os.path.abspath(snapshot_path)
-            
-        agent.handle_security_event({
+        notify_agent_when_written(snapshot_ticket, {
             "type": "TAILGATING",
             "timestamp": alert.timestamp.isoformat(),
             "location": f"Camera {alert.camera_id}",
             "total_people": alert.persons_detected,
             "authorized_count": alert.persons_authorized,
             "unauthorized_count": alert.persons_unauthorized,
-            "snapshot_path": snapshot_abs_path,
             "camera_id": alert.camera_id
-        })
+        }, clip_ticket)
     
     return alert_payload
 
@@ -364,10 +833,11 @@ def process_camera_stream(camera_id: int, stream_url: str, db_session=None):
     
     # Initialize processor and detector
     processor = FrameProcessor()
-    tailgating_detector = TailgatingDetector(tripwire_y=300)
+    tailgating_detector = create_tailgating_detector(camera_id)
     
     system_state.frame_processors[camera_id] = processor
     system_state.tailgating_detectors[camera_id] = tailgating_detector
+    scopes = camera_scopes(camera_id)
     
     # Open video stream
     cap = cv2.VideoCapture(stream_url)
@@ -376,6 +846,8 @@ def process_camera_stream(camera_id: int, stream_url: str, db_session=None):
         return
     
     frame_count = 0
+    preview_sequence = 0
+    capture_clock = CaptureClock()  # Stream PTS -> capture time, even for frames buffered while we lagged
     
     try:
         while True:
@@ -385,6 +857,7 @@ def process_camera_stream(camera_id: int, stream_url: str, db_session=None):
                 cap.release()
                 cap = cv2.VideoCapture(stream_url)
                 continue
+            stamp = capture_clock.stamp_capture(cap)  # Capture time drives every time window below
             
             frame_count += 1
             
@@ -393,60 +866,57 @@ def process_camera_stream(camera_id: int, stream_url: str, db_session=None):
             if w > 800:
                 frame = cv2.resize(frame, (800, int(800 * h / w)))
             
+            # Keep the last few seconds for incident clips (sampled, JPEG-encoded once)
+            if clip_recorder is not None:
+                clip_recorder.add_frame(camera_id, frame, stamp.monotonic)
+            # Continuous recording (encoded on the camera's segment writer thread)
+            if segment_recorder is not None:
+                segment_recorder.add_frame(camera_id, frame, stamp)
+            
             # AI Processing
             try:
-                detection_results = processor.process_frame(frame)
+                detection_results = processor.process_frame(frame, stamp=stamp)
+                persons = detection_results["persons"]
                 
-                # Extract person bounding boxes
-                person_bboxes = []
-                authorized_person_ids = []
+                # Face recognition per detection (or None)
+                person_matches = []
                 
-                for person_data in detection_results["persons"]:
-                    bbox = person_data["bbox"]
-                    person_bboxes.append(bbox)
-                    
-                    # Face recognition
-                    if person_data["embedding"] is not None:
-                        match = system_state.resident_db.recognize_face(person_data["embedding"])
-                        if match:
-                            authorized_person_ids.append(match["resident_id"])
-                            logger.info(f"Resident recognized: {match['name']} (confidence: {match['confidence']:.2f})")
+                for embedding in persons.embeddings:
+                    match = None
+                    if embedding is not None:
+                        match = system_state.gallery.recognize_face(embedding, scopes=scopes)
+                    person_matches.append(match)
+                    if match:
+                        logger.info(f"Resident recognized: {match['name']} (confidence: {match['confidence']:.2f})")
+                        
+                        # Check if GUEST -> Notify Host
+                        if match.get("metadata", {}).get("type") == "GUEST":
+                            guest_id = match["resident_id"]
+                            should_notify = False
                             
-                            # Check if GUEST -> Notify Host
-                            if match.get("metadata", {}).get("type") == "GUEST":
-                                guest_id = match["resident_id"]
-                                should_notify = False
-                                
-                                with system_state.lock:
-                                    last_time = system_state.guest_notifications.get(guest_id)
-                                    now = datetime.utcnow()
-                                    if not last_time or (now - last_time).total_seconds() > 600:
-                                        system_state.guest_notifications[guest_id] = now
-                                        should_notify = True
-                                
-                                if should_notify:
-                                    host_phone = match["metadata"].get("phone")
-                                    if host_phone:
-                                        msg = f"🔔 GUEST ENTRY: {match['name']} has arrived at Camera {camera_id}."
-                                        whatsapp.set_user_number(host_phone)
-                                        snapshot_file = save_incident_snapshot(frame, "GUEST_ENTRY")
-                                        if snapshot_file:
-                                            threading.Thread(target=whatsapp.send_snapshot, args=(snapshot_file, msg)).start()
-                                        else:
-                                            threading.Thread(target=whatsapp.send_message, args=(msg,)).start()
-                                            
-                                        logger.info(f"Sent guest arrival notification to {host_phone}")
-                
-                # Extract person embeddings
-                person_embeddings = [p["embedding"] for p in detection_results["persons"]]
-
+                            with system_state.lock:
+                                last_time = system_state.guest_notifications.get(guest_id)
+                                if last_time is None or stamp.monotonic - last_time > 600:
+                                    system_state.guest_notifications[guest_id] = stamp.monotonic
+                                    should_notify = True
+                            
+                            if should_notify:
+                                host_phone = match["metadata"].get("phone")
+                                if host_phone:
+                                    msg = f"🔔 GUEST ENTRY: {match['name']} has arrived at Camera {camera_id}."
+                                    snapshot_ticket = save_incident_snapshot(frame, "GUEST_ENTRY", camera_id)
+                                    threading.Thread(target=send_snapshot_when_written, args=(snapshot_ticket, msg, host_phone)).start()
+                                        
+                                    logger.info(f"Sent guest arrival notification to {host_phone}")
+            
                 # Update tailgating detector
                 alert = tailgating_detector.update(
-                    person_bboxes,
-                    embeddings=person_embeddings,
-                    authorized_ids=authorized_person_ids,
+                    persons.bbox_list(),
+                    embeddings=persons.embeddings,
                     camera_id=camera_id,
-                    frame=frame
+                    frame=frame,
+                    resident_ids=[m["resident_id"] if m else None for m in person_matches],
+                    stamp=stamp
                 )
                 
                 if alert and main_loop:
@@ -456,6 +926,7 @@ def process_camera_stream(camera_id: int, stream_url: str, db_session=None):
                 if detection_results["weapons"]:
                     logger.critical(f"🔫 WEAPON DETECTED in Camera {camera_id}!")
                     play_siren()
+                    clip_ticket = record_incident_clip(camera_id, stamp.monotonic, "WEAPON")
                     
                     weapon_data = {
                         "type": "ALERT",
@@ -463,72 +934,66 @@ def process_camera_stream(camera_id: int, stream_url: str, db_session=None):
                         "incident_type": "WEAPON_DETECTED",
                         "severity": "HIGH",
                         "weapons": detection_results["weapons"],
-                        "timestamp": datetime.utcnow().isoformat()
+                        "timestamp": stamp.wall.isoformat(),
+                        "video_path": clip_ticket.path if clip_ticket else None
                     }
-                    if main_loop:
-                        asyncio.run_coroutine_threadsafe(manager.broadcast(weapon_data), main_loop)
+                    manager.publish_threadsafe(weapon_data)
                     
                     # Notify Agent
                     if agent and agent.is_active:
-                         # Save snapshot for agent
-                        snapshot_file = save_incident_snapshot(frame, "WEAPON")
-                        snapshot_abs = os.path.abspath(snapshot_file) if snapshot_file else None
-                        
-                        agent.handle_security_event({
+                        # Save snapshot for agent; the event is handed over once it is written
+                        notify_agent_when_written(save_incident_snapshot(frame, "WEAPON", camera_id), {
                             "type": "WEAPON_DETECTED",
-                            "timestamp": datetime.utcnow().isoformat(),
+                            "timestamp": stamp.wall.isoformat(),
                             "location": f"Camera {camera_id}",
-                            "weapon_type": detection_results["weapons"][0]["label"] if detection_results["weapons"] else "Unknown",
-                            "confidence": int(detection_results["weapons"][0]["score"] * 100) if detection_results["weapons"] else 0,
-                            "snapshot_path": snapshot_abs
-                        })
+                            "weapon_type": detection_results["weapons"][0]["type"],
+                            "confidence": int(detection_results["weapons"][0]["confidence"] * 100)
+                        }, clip_ticket)
             
             except Exception as e:
                 logger.error(f"Error processing frame for Camera {camera_id}: {e}")
             
-            # Send frame to dashboard every 5 frames (for video feed preview)
-            if frame_count % 5 == 0:
+            # Send a preview every few frames, encoded once per tier that some
+            # client or MJPEG viewer is watching this camera at (nothing at all if nobody is)
+            preview_tiers = None
+            if frame_count % PREVIEW_CONFIG["interval_frames"] == 0:
+                preview_tiers = manager.frame_tiers(camera_id) | mjpeg_streams.tiers(camera_id)
+            if preview_tiers:
                 try:
                     # Draw visualizations for live feed
                     vis_frame = frame.copy()
                     
-                    # Draw detection boxes
-                    for person_data in detection_results["persons"]:
-                        bbox = person_data["bbox"]
-                        x1, y1, x2, y2 = bbox
-                        
-                        # Determine if authorized (simple check if we found a match earlier)
-                        # We need to map this specific detection to the authorized list
-                        # Earlier loop did: if embedding match -> authorized_person_ids.append(...)
-                        # So we can re-check embedding here or store metadata in detection_results
+                    # Draw detection boxes, labelled with this frame's recognition results
+                    preview_detections = []
+                    for person, match in zip(persons, person_matches):
+                        x1, y1, x2, y2 = person.bbox
                         
                         is_known = False
                         name = "Unknown"
                         color = (0, 0, 255) # Red
                         
-                        if person_data["embedding"] is not None:
-                            match = system_state.resident_db.recognize_face(person_data["embedding"])
-                            if match:
-                                is_known = True
-                                name = match["name"]
-                                color = (0, 255, 0) # Green
-                                if match.get("metadata", {}).get("type") == "GUEST":
-                                    color = (255, 255, 0) # Cyan/Yellow for Guest
-                                    name = f"GUEST: {name}"
+                        if match:
+                            is_known = True
+                            name = match["name"]
+                            color = (0, 255, 0) # Green
+                            if match.get("metadata", {}).get("type") == "GUEST":
+                                color = (255, 255, 0) # Cyan/Yellow for Guest
+                                name = f"GUEST: {name}"
                         
                         cv2.rectangle(vis_frame, (x1, y1), (x2, y2), color, 2)
                         cv2.putText(vis_frame, name, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+                        preview_detections.append({"bbox": [int(x1), int(y1), int(x2), int(y2)], "label": name, "known": is_known})
                     
-                    frame_b64 = encode_frame_to_base64(vis_frame)
-                    frame_data = {
-                        "type": "FRAME",
-                        "camera_id": camera_id,
-                        "frame": frame_b64,
-                        "timestamp": datetime.utcnow().isoformat()
-                    }
-                    # Publish frame updates via broadcast
-                    if main_loop:
-                        asyncio.run_coroutine_threadsafe(manager.broadcast(frame_data), main_loop)
+                    # Binary messages: header + detections + JPEG, one per tier, shared by its viewers
+                    preview_sequence += 1
+                    packets = preview_encoder.encode(
+                        camera_id, vis_frame, preview_tiers, preview_sequence,
+                        to_epoch(stamp.wall), preview_detections
+                    )
+                    # Publish frame updates (each client keeps only its newest frame per camera)
+                    for packet in packets.values():
+                        manager.publish_threadsafe(packet)
+                        mjpeg_streams.publish_threadsafe(packet)
                 except Exception as e:
                     logger.error(f"Error broadcasting frame: {e}")
     
@@ -548,37 +1013,49 @@ async def startup_event():
     main_loop = asyncio.get_running_loop()
     logger.info("🚀 SurakshaSetu System Starting...")
     
-    # Create tables
-    Base.metadata.create_all(bind=engine)
+    # Create tables, and add columns introduced since an existing database was created
+    added_columns = upgrade_schema(engine, Base.metadata)
+    if added_columns:
+        logger.info(f"Database schema upgraded, added columns: {', '.join(added_columns)}")
     
-    # Load residents from database
+    # Load residents: memory-map the gallery snapshot, then replay newer DB rows
     logger.info("Loading residents from database...")
     try:
-        from database import SessionLocal
-        import pickle
         db = SessionLocal()
-        residents = db.query(Resident).filter(Resident.is_active == True).all()
-        count = 0
-        for r in residents:
-            if r.face_embedding:
-                try:
-                    embedding = pickle.loads(r.face_embedding)
-                    # Manually populate in-memory DB since enroll_resident expects image
-                    with system_state.resident_db.lock:
-                        system_state.resident_db.residents[r.id] = {
-                            "name": r.name,
-                            "embedding": embedding,
-                            "enrollment_time": r.enrollment_date,
-                            "metadata": {"phone": r.phone_number, "flat": r.flat_number}
-                        }
-                    count += 1
-                except Exception as e:
-                    logger.error(f"Failed to load resident {r.id}: {e}")
+        start_version = gallery_feed.latest_version(db)
+        model_name = system_state.resident_db.face_engine.model_name
+        snapshot_time = gallery_snapshot.load_into(system_state.resident_db, model_name)
+        
+        if snapshot_time and not gallery_feed.covers(db, gallery_snapshot.feed_version):
+            # Feed was pruned past the snapshot, deletions could be missing
+            logger.warning("Gallery snapshot is older than the change feed. Reloading from database.")
+            system_state.resident_db.bulk_load(np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=np.float32), {})
+            snapshot_time = None
+        
+        if snapshot_time:
+            logger.info(f"Loaded {len(system_state.resident_db.residents)} residents from gallery snapshot ({snapshot_time.isoformat()})")
+            gallery_feed.seek(gallery_snapshot.feed_version)
+        else:
+            gallery_feed.seek(start_version)
+        count = load_residents_from_db(db, since=snapshot_time)
         db.close()
         logger.info(f"Loaded {count} residents from database")
+        
+        # Replay anything committed meanwhile, then follow the feed
+        gallery_feed.poll_once(force=True)
     except Exception as e:
         logger.error(f"Error loading residents from DB: {e}")
     
+    gallery_feed.start()
+    threading.Thread(target=gallery_snapshot_worker, daemon=True).start()
+    snapshot_writer.start()
+    if clip_recorder is not None:
+        clip_recorder.start()
+    threading.Thread(target=guest_eviction_worker, daemon=True).start()
+    threading.Thread(target=media_retention_worker, daemon=True).start()
+    if recording_retention is not None:
+        threading.Thread(target=recording_retention_worker, daemon=True).start()
+    
     # Start cameras from config
     # For now, we use the dict config, but we could load from DB
     for camera_id, config in CAMERA_CONFIG.items():
@@ -598,12 +1075,20 @@ async def startup_event():
         thread.start()
         logger.info(f"Camera {camera_id} processing thread started")
 
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Finish open recording segments so they are playable and indexed"""
+    if segment_recorder is not None:
+        await asyncio.get_running_loop().run_in_executor(None, segment_recorder.close_all)
+
 @app.post("/api/residents/register")
 async def register_resident(
     name: str = Form(...),
     phone_number: str = Form(...),
     flat_number: str = Form(...),
     photo: UploadFile = File(...),
+    access_scopes: Optional[str] = Form(None),
     db = Depends(get_db)
 ):
     """Register a new resident with face enrollment"""
@@ -630,26 +1115,22 @@ async def register_resident(
             phone_number=phone_number,
             flat_number=flat_number,
             height_cm=170.0, 
-            face_embedding=pickle.dumps(embedding),
-            embedding_version="1.0",
+            **embedding_columns(embedding, system_state.resident_db.face_engine.model_name),
+            access_scopes=format_scopes(access_scopes),
             is_active=True,
             enrollment_date=datetime.utcnow(),
             last_updated=datetime.utcnow()
         )
         
         db.add(new_resident)
-        db.commit()
+        db.flush()
+        publish_gallery_change(db, new_resident.id, UPSERT)
         db.refresh(new_resident)
         
         # Update in-memory DB for immediate recognition
-        with system_state.resident_db.lock:
-            # system_state.resident_db.residents is a dict
-            system_state.resident_db.residents[new_resident.id] = {
-                "name": name,
-                "embedding": embedding,
-                "enrollment_time": datetime.utcnow(),
-                "metadata": {"phone": phone_number, "flat": flat_number}
-            }
+        system_state.gallery.add_embedding(
+            new_resident.id, name, embedding, resident_metadata(new_resident)
+        )
             
         logger.info(f"Registered resident: {name} (ID: {new_resident.id})")
         return {
@@ -688,7 +1169,32 @@ async def health_check():
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
         "active_cameras": len(system_state.active_cameras),
-        "connected_clients": len(system_state.connected_clients)
+        "connected_clients": len(system_state.connected_clients),
+        "websocket_clients": manager.metrics(),
+        "preview": preview_encoder.metrics(),
+        "mjpeg": mjpeg_streams.metrics(),
+        "detectors": {
+            camera_id: detector.memory_usage()
+            for camera_id, detector in list(system_state.tailgating_detectors.items())
+        },
+        "reid": system_state.reid.stats() if system_state.reid else None,
+        "snapshots": snapshot_writer.metrics(),
+        "clips": clip_recorder.metrics() if clip_recorder else None,
+        "retention": media_retention.metrics(),
+        "thumbnails": thumbnail_cache.metrics(),
+        "recording": segment_recorder.metrics() if segment_recorder else None
+    }
+
+
+@app.get("/api/reid/identities")
+async def get_reid_identities(limit: int = 50):
+    """People currently tracked across cameras, most recently seen first"""
+    if system_state.reid is None:
+        raise HTTPException(status_code=404, detail="Cross-camera re-identification is disabled")
+    identities = system_state.reid.active_identities()
+    return {
+        "total": len(identities),
+        "identities": [identity.to_dict() for identity in identities[:limit]]
     }
 
 
@@ -757,7 +1263,11 @@ async def get_incidents(
                     "persons_authorized": inc.authorized_persons,
                     "details": inc.additional_details or "",
                     "resolved": inc.resolved,
-                    "snapshot_path": inc.snapshot_path
+                    "snapshot_path": inc.snapshot_path,
+                    "video_path": inc.video_path,
+                    "snapshot_url": media_url(INCIDENT_CONFIG["snapshot_dir"], inc.snapshot_path),
+                    "thumbnail_url": media_url(INCIDENT_CONFIG["snapshot_dir"], inc.snapshot_path, width=min(INCIDENT_CONFIG["thumbnail_widths"])),
+                    "video_url": media_url(INCIDENT_CONFIG["snapshot_dir"], inc.video_path)
                 }
                 for inc in incidents
             ],
@@ -768,6 +1278,94 @@ async def get_incidents(
         return {"incidents": [], "total": 0}
 
 
+@app.get("/api/media/{media_path:path}")
+def get_media(media_path: str, request: Request, width: Optional[int] = None):
+    """Serve an incident snapshot or clip (ETag/Last-Modified, Range); ?width= returns a cached thumbnail"""
+    path = resolve_media_path(INCIDENT_CONFIG["snapshot_dir"], media_path)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Media not found")
+
+    if width is not None:
+        if not path.lower().endswith(IMAGE_EXTENSIONS):
+            raise HTTPException(status_code=400, detail="Thumbnails are only available for images")
+        try:
+            path = thumbnail_cache.get(path, width)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if path is None:
+            raise HTTPException(status_code=404, detail="Could not create thumbnail")
+
+    return media_response(request, path, max_age=INCIDENT_CONFIG["media_cache_seconds"])
+
+
+def recording_segment_payload(segment: Dict) -> Dict:
+    return {
+        "segment_id": segment["segment_id"],
+        "camera_id": segment["camera_id"],
+        "start": segment["start"].isoformat(),
+        "end": segment["end"].isoformat(),
+        "frames": segment["frames"],
+        "fps": segment["fps"],
+        "url": media_url(segment_recorder.root, segment["path"], prefix="/api/recordings/files/")
+    }
+
+
+@app.get("/api/recordings/{camera_id}/seek")
+async def seek_recording(camera_id: int, timestamp: datetime):
+    """Segment covering `timestamp` (UTC) and the offset to jump to"""
+    if segment_recorder is None:
+        raise HTTPException(status_code=404, detail="Continuous recording is disabled")
+    timestamp = to_naive_utc(timestamp)  # "...Z" / "+05:30" from clients; the index is naive UTC
+    found = segment_recorder.seek(camera_id, timestamp)
+    if found is None:
+        since = segment_recorder.recording_since(camera_id)
+        if since is not None and timestamp >= since:
+            raise HTTPException(status_code=409, detail=f"Segment started {since.isoformat()} is still being recorded")
+        raise HTTPException(status_code=404, detail="No recording for this time")
+    return {
+        "timestamp": timestamp.isoformat(),
+        "segment": recording_segment_payload(found),
+        "offset_seconds": found["offset_seconds"],
+        "frame_index": found["frame_index"]
+    }
+
+
+@app.get("/api/recordings/{camera_id}")
+async def list_recordings(camera_id: int, start: datetime, end: datetime, limit: int = 1000):
+    """Recorded segments overlapping [start, end)"""
+    if segment_recorder is None:
+        raise HTTPException(status_code=404, detail="Continuous recording is disabled")
+    segments = segment_recorder.index.segments(camera_id, start, end, limit=limit)
+    return {"camera_id": camera_id, "segments": [recording_segment_payload(s) for s in segments]}
+
+
+@app.get("/api/recordings/files/{media_path:path}")
+def get_recording_file(media_path: str, request: Request):
+    """Serve a recorded segment (Range requests for seeking)"""
+    path = resolve_media_path(RECORDING_CONFIG["recording_dir"], media_path) if segment_recorder else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    return media_response(request, path)
+
+
+@app.get("/api/cameras/{camera_id}/stream.mjpeg")
+async def stream_camera_mjpeg(camera_id: int, tier: Optional[str] = None, fps: Optional[float] = None):
+    """Live preview as multipart/x-mixed-replace, for viewers without the WebSocket"""
+    if camera_id not in CAMERA_CONFIG:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    tier = tier or PREVIEW_CONFIG["default_tier"]
+    if tier not in PREVIEW_CONFIG["tiers"]:
+        raise HTTPException(status_code=400, detail=f"Unknown tier {tier!r}; choose from {sorted(PREVIEW_CONFIG['tiers'])}")
+    max_fps = PREVIEW_CONFIG["mjpeg_max_fps"]
+    fps = min(fps or max_fps, max_fps)
+    if fps <= 0:
+        raise HTTPException(status_code=400, detail="fps must be positive")
+    response = mjpeg_streams.open(camera_id, tier, fps, headers={"cache-control": "no-store", "x-accel-buffering": "no"})
+    if response is None:
+        raise HTTPException(status_code=503, detail="Too many MJPEG viewers")
+    return response
+
+
 @app.post("/api/residents/enroll")
 async def enroll_resident(
     name: str = Form(...),
@@ -775,6 +1373,7 @@ async def enroll_resident(
     height_cm: float = Form(...),
     phone_number: str = Form(...),
     face_image: UploadFile = File(...),
+    access_scopes: Optional[str] = Form(None),
     db = Depends(get_db)
 ):
     """Enroll a new resident with face recognition"""
@@ -798,26 +1397,25 @@ async def enroll_resident(
             raise HTTPException(status_code=400, detail="Could not extract face from image")
         
         # Save to database
-        import pickle
-        
         resident = Resident(
             name=name,
             flat_number=flat_number,
             height_cm=height_cm,
             phone_number=phone_number,
-            face_embedding=pickle.dumps(embedding),
-            embedding_version="1.0",
+            **embedding_columns(embedding, processor.face_engine.model_name),
+            access_scopes=format_scopes(access_scopes),
             is_active=True,
             enrollment_date=datetime.utcnow(),
             last_updated=datetime.utcnow()
         )
         
         db.add(resident)
-        db.commit()
+        db.flush()
+        publish_gallery_change(db, resident.id, UPSERT)
         db.refresh(resident)
         
         # Also add to in-memory database for real-time matching
-        system_state.resident_db.enroll_resident(resident.id, name, img)
+        system_state.gallery.add_embedding(resident.id, name, embedding, resident_metadata(resident))
         
         logger.info(f"Resident enrolled: {name} (ID: {resident.id})")
         
@@ -833,6 +1431,130 @@ async def enroll_resident(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/residents/{resident_id}/templates")
+async def add_resident_template(
+    resident_id: int,
+    photo: UploadFile = File(...),
+    db = Depends(get_db)
+):
+    """Add another face template (different angle/lighting) to an enrolled resident"""
+    resident = db.query(Resident).filter(Resident.id == resident_id, Resident.is_active == True).first()
+    if not resident or not resident.face_embedding:
+        raise HTTPException(status_code=404, detail="Resident not found")
+    
+    contents = await photo.read()
+    frame = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise HTTPException(status_code=400, detail="Invalid image file")
+    
+    embedding = system_state.resident_db.face_engine.generate_embedding(frame)
+    if embedding is None:
+        raise HTTPException(status_code=400, detail="No face detected in photo. Please retake.")
+    
+    if not append_resident_template(db, resident, embedding):
+        raise HTTPException(
+            status_code=409,
+            detail="Template not added: too similar to an existing one or template limit reached"
+        )
+    
+    logger.info(f"Added face template for {resident.name} (ID: {resident_id}, templates: {resident.template_count})")
+    return {"success": True, "resident_id": resident_id, "template_count": resident.template_count}
+
+
+@app.get("/api/cameras/{camera_id}/tripwires")
+async def get_camera_tripwires(camera_id: int):
+    """Tripwires currently used for a camera"""
+    detector = system_state.tailgating_detectors.get(camera_id)
+    tripwires = detector.tripwires if detector else camera_tripwires(camera_id)
+    return {"camera_id": camera_id, "tripwires": [t.to_config() for t in tripwires]}
+
+
+@app.put("/api/cameras/{camera_id}/tripwires")
+async def set_camera_tripwires(camera_id: int, tripwires: List[Dict], db = Depends(get_db)):
+    """Store a camera's tripwires and apply them to its running detector"""
+    try:
+        parsed = tripwires_from_config(tripwires)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid tripwire config: {e}")
+    
+    row = db.query(CameraConfig).filter(CameraConfig.camera_id == camera_id).first()
+    if not row:
+        row = CameraConfig(camera_id=camera_id, name=CAMERA_CONFIG.get(camera_id, {}).get("name", f"Camera {camera_id}"))
+        db.add(row)
+    row.tripwires = json.dumps([t.to_config() for t in parsed]) if parsed else None
+    db.commit()
+    
+    detector = system_state.tailgating_detectors.get(camera_id)
+    if detector:
+        with detector.lock:
+            detector.tripwires = parsed or [LineTripwire.horizontal(TAILGATING_CONFIG["tripwire_y"])]
+    
+    logger.info(f"Camera {camera_id}: {len(parsed)} tripwire(s) configured")
+    return {"success": True, "camera_id": camera_id, "tripwires": [t.to_config() for t in parsed]}
+
+
+@app.post("/api/residents/{resident_id}/scopes")
+async def set_resident_scopes(
+    resident_id: int,
+    access_scopes: str = Form(""),
+    db = Depends(get_db)
+):
+    """Replace a resident's access scopes (comma-separated; empty = visible to every camera)"""
+    resident = db.query(Resident).filter(Resident.id == resident_id).first()
+    if not resident:
+        raise HTTPException(status_code=404, detail="Resident not found")
+    
+    resident.access_scopes = format_scopes(access_scopes)
+    publish_gallery_change(db, resident.id, UPSERT)
+    apply_resident_row(system_state.gallery, resident, GALLERY_CONFIG["allow_legacy_pickle"])
+    
+    logger.info(f"Access scopes for {resident.name} (ID: {resident_id}): {resident.access_scopes or 'all cameras'}")
+    return {"success": True, "resident_id": resident_id, "access_scopes": parse_scopes(resident.access_scopes)}
+
+
+@app.post("/api/residents/{resident_id}/deactivate")
+async def deactivate_resident(resident_id: int, db = Depends(get_db)):
+    """Deactivate a resident and drop them from every worker's gallery"""
+    resident = db.query(Resident).filter(Resident.id == resident_id).first()
+    if not resident:
+        raise HTTPException(status_code=404, detail="Resident not found")
+    
+    resident.is_active = False
+    publish_gallery_change(db, resident_id, DEACTIVATE)
+    system_state.gallery.remove_resident(resident_id)
+    
+    logger.info(f"Resident deactivated: {resident.name} (ID: {resident_id})")
+    return {"success": True, "resident_id": resident_id, "message": f"Resident {resident.name} deactivated"}
+
+
+@app.delete("/api/residents/{resident_id}")
+async def delete_resident(resident_id: int, db = Depends(get_db)):
+    """Delete a resident and drop them from every worker's gallery"""
+    resident = db.query(Resident).filter(Resident.id == resident_id).first()
+    if not resident:
+        raise HTTPException(status_code=404, detail="Resident not found")
+    
+    db.delete(resident)
+    publish_gallery_change(db, resident_id, DELETE)
+    system_state.gallery.remove_resident(resident_id)
+    
+    logger.info(f"Resident deleted: ID {resident_id}")
+    return {"success": True, "resident_id": resident_id, "message": "Resident deleted"}
+
+
+@app.post("/api/guests/{guest_id}/checkout")
+async def checkout_guest(guest_id: int, db = Depends(get_db)):
+    """End a guest's visit now instead of waiting for their expiry"""
+    guest = db.query(Resident).filter(Resident.id == guest_id, Resident.flat_number == "GUEST").first()
+    if not guest:
+        raise HTTPException(status_code=404, detail="Guest not found")
+    
+    guest_name = guest.name
+    delete_guests(db, [guest_id])
+    logger.info(f"Guest checked out: {guest_name} (ID: {guest_id})")
+    return {"success": True, "guest_id": guest_id, "message": "Guest visit ended"}
+
+
 @app.post("/api/visitors/initiate")
 async def initiate_visitor_entry(
     visitor_name: str = Form(...),
@@ -886,6 +1608,7 @@ async def initiate_visitor_entry(
 async def verify_visitor_otp(
     visitor_id: int,
     otp_code: str,
+    camera_id: int = 3,
     db = Depends(get_db)
 ):
     """Verify visitor OTP"""
@@ -899,12 +1622,15 @@ async def verify_visitor_otp(
             # Log access
             # We need resident_id from session or lookup visitor
             visitor = db.query(Visitor).filter(Visitor.id == visitor_id).first()
+            system_state.authorization_index.record(
+                camera_id, AuthorizationMethod.OTP, visitor.resident_id if visitor else None
+            )
             if visitor:
                 access_log = AccessLog(
                     visitor_id=visitor_id,
                     resident_id=visitor.resident_id,
                     access_type="OTP",
-                    camera_id=3,
+                    camera_id=camera_id,
                     confidence_score=1.0,
                     authorized=True,
                     timestamp=datetime.utcnow()
@@ -936,19 +1662,20 @@ async def verify_visitor_otp(
 
 
 @app.post("/api/rfid/authenticate")
-async def rfid_authenticate(rfid_tag: str, db = Depends(get_db)):
+async def rfid_authenticate(rfid_tag: str, camera_id: int = 3, db = Depends(get_db)):
     """Authenticate resident using RFID"""
     try:
         resident_id = rfid_auth.authenticate(rfid_tag)
         
         if resident_id:
             resident = db.query(Resident).filter(Resident.id == resident_id).first()
+            system_state.authorization_index.record(camera_id, AuthorizationMethod.RFID, resident_id)
             
             # Log access
             access_log = AccessLog(
                 resident_id=resident_id,
                 access_type="RFID",
-                camera_id=3,
+                camera_id=camera_id,
                 confidence_score=1.0,
                 authorized=True,
                 timestamp=datetime.utcnow()
@@ -1006,7 +1733,6 @@ async def whatsapp_webhook(request: dict):
             # Log as "Guest Entry" and Enroll Face if available
             try:
                 from database import SessionLocal
-                import pickle
                 db = SessionLocal()
                 
                 # Enroll Guest(s)
@@ -1014,36 +1740,9 @@ async def whatsapp_webhook(request: dict):
                 guests_enrolled = 0
                 
                 if alert_obj and alert_obj.unauthorized_embeddings:
-                    for i, embedding in enumerate(alert_obj.unauthorized_embeddings):
-                        guest_name = f"Guest of {pending['resident_name']}"
-                        
-                        # Create Resident record (Guest)
-                        guest_resident = Resident(
-                            name=guest_name,
-                            flat_number="GUEST",
-                            height_cm=0.0,
-                            phone_number=sender_clean, # Host's phone
-                            face_embedding=pickle.dumps(embedding),
-                            embedding_version="1.0",
-                            is_active=True,
-                            enrollment_date=datetime.utcnow(),
-                            last_updated=datetime.utcnow()
-                        )
-                        db.add(guest_resident)
-                        db.commit()
-                        db.refresh(guest_resident)
-                        
-                        # Add to in-memory DB
-                        with system_state.resident_db.lock:
-                            system_state.resident_db.residents[guest_resident.id] = {
-                                "name": guest_name,
-                                "embedding": embedding,
-                                "enrollment_time": datetime.utcnow(),
-                                "metadata": {"phone": sender_clean, "type": "GUEST"}
-                            }
-                        guests_enrolled += 1
-                        logger.info(f"Enrolled guest ID {guest_resident.id} for host {pending['resident_name']}")
-
+                    guests_enrolled = enroll_guest_embeddings(
+                        db, pending["resident_name"], sender_clean, alert_obj.unauthorized_embeddings
+                    )
                 
                 # Notify Dashboard: Green Alert
                 success_payload = {
@@ -1111,7 +1810,8 @@ async def whatsapp_webhook(request: dict):
                     person_ids="DENIED_BY_HOST",
                     additional_details=f"Host {pending['resident_name']} explicitly denied knowing the person.",
                     resolved=False,
-                    snapshot_path=pending["snapshot_path"]
+                    snapshot_path=pending["snapshot_path"],
+                    video_path=pending.get("video_path")
                 )
                 db.add(incident)
                 db.commit()
@@ -1165,31 +1865,32 @@ async def process_frame_endpoint(
         
         # Initialize processors
         processor = FrameProcessor()
-        tailgating_detector = system_state.tailgating_detectors.get(camera_id, TailgatingDetector(tripwire_y=300))
+        tailgating_detector = system_state.tailgating_detectors.get(camera_id) or create_tailgating_detector(camera_id)
+        scopes = camera_scopes(camera_id)
         
-        # Process frame with AI
-        detection_results = processor.process_frame(frame)
+        # Process frame with AI; an uploaded frame is stamped on arrival
+        stamp = FrameStamp.now()
+        detection_results = processor.process_frame(frame, stamp=stamp)
         
-        # Extract person bounding boxes and authorized IDs
-        person_bboxes = []
-        authorized_person_ids = []
+        persons = detection_results["persons"]
         
-        for person_data in detection_results["persons"]:
-            bbox = person_data["bbox"]
-            person_bboxes.append(bbox)
-            
-            # Face recognition
-            if person_data["embedding"] is not None:
-                match = system_state.resident_db.recognize_face(person_data["embedding"])
-                if match:
-                    authorized_person_ids.append(match["resident_id"])
+        # Face recognition per detection
+        person_matches = []
+        
+        for embedding in persons.embeddings:
+            match = None
+            if embedding is not None:
+                match = system_state.gallery.recognize_face(embedding, scopes=scopes)
+            person_matches.append(match)
         
         # Check for tailgating
         alert = tailgating_detector.update(
-            person_bboxes,
-            authorized_ids=authorized_person_ids,
+            persons.bbox_list(),
+            embeddings=persons.embeddings,
             camera_id=camera_id,
-            frame=frame
+            frame=frame,
+            resident_ids=[m["resident_id"] if m else None for m in person_matches],
+            stamp=stamp
         )
         
         # Handle alert if triggered
@@ -1202,19 +1903,19 @@ async def process_frame_endpoint(
             "timestamp": datetime.utcnow().isoformat(),
             "camera_id": camera_id,
             "detections": {
-                "persons": len(detection_results["persons"]),
+                "persons": len(persons),
                 "weapons": detection_results["weapons"],
                 "person_details": [
                     {
-                        "bbox": person["bbox"],
-                        "confidence": person["confidence"],
-                        "face_detected": person["embedding"] is not None,
-                        "recognized_resident": system_state.resident_db.recognize_face(person["embedding"]) if person["embedding"] else None
+                        "bbox": person.bbox,
+                        "confidence": person.confidence,
+                        "face_detected": person.embedding is not None,
+                        "recognized_resident": match
                     }
-                    for person in detection_results["persons"]
+                    for person, match in zip(persons, person_matches)
                 ]
             },
-            "authorized_persons": len(authorized_person_ids),
+            "authorized_persons": sum(1 for m in person_matches if m),
             "tailgating_alert": alert_data is not None
         }
         
@@ -1231,24 +1932,90 @@ async def process_frame_endpoint(
 # ==================== WEBSOCKET ====================
 
 class ConnectionManager:
+    """Fans messages out to per-client channels (own queue + sender task each)"""
+    
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.channels: Dict[WebSocket, ClientChannel] = {}
+        self._next_client_id = 1
+        # {camera_id or "*": {tier: subscribers}}; replaced whole on every change,
+        # so camera threads can read it without a lock
+        self._frame_watchers: Dict = {}
     
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket) -> ClientChannel:
         await websocket.accept()
-        self.active_connections.append(websocket)
+        channel = ClientChannel(
+            websocket,
+            self._next_client_id,
+            max_frames=WEBSOCKET_CONFIG["max_queued_frames"],
+            max_messages=WEBSOCKET_CONFIG["max_queued_messages"],
+            send_timeout=WEBSOCKET_CONFIG["send_timeout_seconds"]
+        )
+        self._next_client_id += 1
+        self.channels[websocket] = channel
+        channel.start()
         system_state.add_client(websocket)
+        return channel
     
     async def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        channel = self.channels.pop(websocket, None)
+        if channel:
+            channel.close()
+            self._index_frame_watchers()
         system_state.remove_client(websocket)
     
+    def update_subscriptions(self, channel: ClientChannel, message: dict) -> dict:
+        """Apply a subscribe/unsubscribe request; returns the reply for the client"""
+        try:
+            action, message_types, cameras, tier = parse_request(
+                message, PREVIEW_CONFIG["tiers"], PREVIEW_CONFIG["default_tier"]
+            )
+        except ValueError as e:
+            return {"type": "error", "request": message.get("type"), "detail": str(e)}
+        
+        if action == "subscribe":
+            channel.subscriptions.subscribe(message_types, cameras, tier)
+        else:
+            channel.subscriptions.unsubscribe(message_types, cameras)
+        self._index_frame_watchers()
+        return {"type": "subscribed", "subscriptions": channel.subscriptions.to_dict()}
+    
+    def _index_frame_watchers(self):
+        watchers = {}
+        for channel in list(self.channels.values()):
+            for camera, tier in channel.subscriptions.frame_subscriptions().items():
+                tiers = watchers.setdefault(camera, {})
+                tiers[tier] = tiers.get(tier, 0) + 1
+        self._frame_watchers = watchers
+    
+    def frame_tiers(self, camera_id: int) -> set:
+        """Preview tiers someone is watching `camera_id` at (empty: skip encoding)"""
+        watchers = self._frame_watchers
+        return set(watchers.get(camera_id, ())) | set(watchers.get(ALL, ()))
+    
+    def publish(self, message: Union[dict, FramePacket]):
+        """Queue a message for every subscribed client; never waits for a client (event loop thread only)"""
+        if isinstance(message, FramePacket):
+            message_type, camera_id = FRAME, message.camera_id
+        else:
+            message_type, camera_id = message.get("type"), message.get("camera_id")
+        for channel in list(self.channels.values()):
+            if not channel.subscriptions.wants(message_type, camera_id):
+                continue
+            if message_type == FRAME and getattr(message, "tier", None) is not None \
+                    and channel.subscriptions.frame_tier(camera_id) != message.tier:
+                continue  # Watching this camera at another tier
+            channel.enqueue(message)
+    
+    def publish_threadsafe(self, message: Union[dict, FramePacket]):
+        """publish() from a camera or worker thread"""
+        if main_loop:
+            main_loop.call_soon_threadsafe(self.publish, message)
+    
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting: {e}")
+        self.publish(message)
+    
+    def metrics(self) -> List[Dict]:
+        return [channel.metrics() for channel in list(self.channels.values())]
 
 
 manager = ConnectionManager()
@@ -1277,7 +2044,6 @@ async def manual_verify_guest(verification_id: str):
 
         # Log & Enroll
         from database import SessionLocal
-        import pickle
         db = SessionLocal()
         
         # Enroll Guest(s)
@@ -1285,33 +2051,9 @@ async def manual_verify_guest(verification_id: str):
         guests_enrolled = 0
         
         if alert_obj and alert_obj.unauthorized_embeddings:
-            for i, embedding in enumerate(alert_obj.unauthorized_embeddings):
-                guest_name = f"Guest of {pending['resident_name']}"
-                
-                guest_resident = Resident(
-                    name=guest_name,
-                    flat_number="GUEST",
-                    height_cm=0.0,
-                    phone_number=host_phone, 
-                    face_embedding=pickle.dumps(embedding),
-                    embedding_version="1.0",
-                    is_active=True,
-                    enrollment_date=datetime.utcnow(),
-                    last_updated=datetime.utcnow()
-                )
-                db.add(guest_resident)
-                db.commit()
-                db.refresh(guest_resident)
-                
-                # Add to in-memory DB
-                with system_state.resident_db.lock:
-                    system_state.resident_db.residents[guest_resident.id] = {
-                        "name": guest_name,
-                        "embedding": embedding,
-                        "enrollment_time": datetime.utcnow(),
-                        "metadata": {"phone": host_phone, "type": "GUEST"}
-                    }
-                guests_enrolled += 1
+            guests_enrolled = enroll_guest_embeddings(
+                db, pending["resident_name"], host_phone, alert_obj.unauthorized_embeddings
+            )
         
         # Notify Dashboard
         success_payload = {
@@ -1388,7 +2130,8 @@ async def manual_deny_guest(verification_id: str):
             person_ids="DENIED_MANUALLY",
             additional_details=f"Manual denial by Security Dashboard for {pending['resident_name']}'s guests.",
             resolved=False,
-            snapshot_path=pending["snapshot_path"]
+            snapshot_path=pending["snapshot_path"],
+            video_path=pending.get("video_path")
         )
         db.add(incident)
         db.commit()
@@ -1440,7 +2183,7 @@ async def simulate_tailgating(background_tasks: BackgroundTasks, db: Session = D
             persons_unauthorized=1,
             time_window=3.0,
             severity="MEDIUM",
-            snapshot=np.zeros((300, 300, 3), dtype=np.uint8), # Black dummy image
+            frame=np.zeros((300, 300, 3), dtype=np.uint8), # Black dummy image
             authorized_person_ids=[resident.id],
             additional_info="Simulated Tailgating Event for Testing"
         )
@@ -1462,24 +2205,27 @@ async def simulate_tailgating(background_tasks: BackgroundTasks, db: Session = D
 @app.websocket("/ws/alerts")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time alerts and updates"""
-    await manager.connect(websocket)
+    channel = await manager.connect(websocket)
     
     try:
         while True:
             data = await websocket.receive_text()
             logger.info(f"WebSocket message received: {data}")
             
-            # Echo back or handle specific commands
+            # Echo back or handle specific commands (replies go through the client's queue)
             try:
                 message = json.loads(data)
                 if message.get("type") == "ping":
-                    await websocket.send_json({"type": "pong", "timestamp": datetime.utcnow().isoformat()})
+                    channel.enqueue({"type": "pong", "timestamp": datetime.utcnow().isoformat()})
+                elif message.get("type") in ("subscribe", "unsubscribe"):
+                    channel.enqueue(manager.update_subscriptions(channel, message))
             except json.JSONDecodeError:
                 pass
     
-    except WebSocketDisconnect:
-        await manager.disconnect(websocket)
+    except (WebSocketDisconnect, RuntimeError):
         logger.info("Client disconnected")
+    finally:
+        await manager.disconnect(websocket)
 
 
 if __name__ == "__main__":
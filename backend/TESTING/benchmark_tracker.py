@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+from AI_ML.tailgating_logic import create_tracker
+import numpy as np
+import time
+
+print("\n" + "="*60)
+print("⏱️  TRACKER ASSIGNMENT BENCHMARK")
+print("="*60 + "\n")
+
+FRAMES = 300
+rng = np.random.default_rng(0)
+
+for tracker_type in ("centroid", "deepsort"):
+    for people in (5, 20, 50):
+        tracker = create_tracker(tracker_type, max_disappeared=40)
+        positions = rng.uniform(0, 700, size=(people, 2))
+        velocities = rng.normal(0, 3, size=(people, 2))
+
+        elapsed = 0.0
+        for _ in range(FRAMES):
+            positions += velocities + rng.normal(0, 1, size=(people, 2))
+            order = rng.permutation(people)  # Detector output order is arbitrary
+            boxes = np.hstack([positions - [25, 50], positions + [25, 50]])[order].astype(int)
+            rects = [tuple(box) for box in boxes]
+
+            start = time.perf_counter()
+            tracker.update(rects)
+            elapsed += time.perf_counter() - start
+
+        print(f"{tracker_type:>8} {people:>3} people: {elapsed / FRAMES * 1000:.3f} ms/frame, "
+              f"{tracker.nextObjectID} track IDs issued")
+
+print("\n" + "="*60 + "\n")
@@ -52,6 +52,12 @@ result = processor.process_frame(mock_frame)
 print(f"✅ Processed frame: {len(result['persons'])} persons, {len(result['weapons'])} weapons")
 print(f"   Timestamp: {result['timestamp']}")
 
+persons = result["persons"]
+assert persons.bboxes.dtype == np.int32 and persons.bboxes.shape == (len(persons), 4)
+assert len(persons.embeddings) == len(persons) and persons.bbox_list() == [p.bbox for p in persons]
+assert not hasattr(persons[0], "__dict__") if len(persons) else True
+print(f"✅ Detections batched as arrays: bboxes {persons.bboxes.shape}, centroids {persons.centroids().shape}")
+
 # Test 4: Resident Database
 print("\nTest 4: Resident Database")
 print("-" * 60)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+from SECURITY.authorization_index import AuthorizationIndex, AuthorizationMethod, TRACK_BOUND_METHODS
+from AI_ML.tailgating_logic import TailgatingDetector
+
+print("\n" + "="*60)
+print("🧪 AUTHORIZATION INDEX TEST")
+print("="*60 + "\n")
+
+# Test 1: Window counts per door
+print("Test 1: Window Counts")
+print("-" * 60)
+
+index = AuthorizationIndex(capacity_per_door=50)
+for t in range(100):
+    index.record(1, AuthorizationMethod.RFID, subject_id=t, timestamp=1000.0 + t)
+index.record(1, AuthorizationMethod.FACE, subject_id=7, timestamp=1095.5)
+index.record(2, AuthorizationMethod.OTP, subject_id=9, timestamp=1095.0)
+index.record(1, AuthorizationMethod.OTP, subject_id=8, timestamp=1090.5)  # Arrives late
+
+assert index.count_since(1, 1095.0, 1099.0) == 6
+assert index.count_in_window(1, 3.0, now=1099.0) == 4
+assert index.count_since(1, 1090.0, 1099.0, exclude=TRACK_BOUND_METHODS) == 11
+assert index.count_since(1, 1090.0, 1099.0, methods=[AuthorizationMethod.OTP]) == 1
+assert index.count_since(2, 1000.0, 1099.0) == 1
+assert index.count_since(1, 1000.0, 1040.0) == 0, "Only the newest 50 events per door and method are kept"
+assert [e.subject_id for e in index.events_since(1, 1095.0, 1096.0)] == [95, 7, 96]
+assert index.latest(1).subject_id == 99
+print("✅ Per-door window counts, late inserts and ring capacity")
+
+# Test 2: Detector uses door authorizations
+print("\nTest 2: Detector Window Check")
+print("-" * 60)
+
+index = AuthorizationIndex()
+detector = TailgatingDetector(tripwire_y=300, authorization_index=index, door_id=3)
+above = [(100, 200, 150, 290), (300, 200, 350, 290)]
+below = [(100, 250, 150, 350), (300, 250, 350, 350)]
+
+detector.update(above, camera_id=3)
+assert detector.update(below, camera_id=3) is None, "No authorization at the door: no tailgating window"
+
+detector.reset()
+index.record(3, AuthorizationMethod.RFID, subject_id=42)
+detector.update(above, camera_id=3)
+alert = detector.update(below, camera_id=3)
+assert alert is not None and alert.persons_authorized == 1 and alert.persons_unauthorized == 1
+assert alert.authorized_person_ids == [42]
+print(f"✅ RFID grant + 2 crossings → alert ({alert.persons_unauthorized} unauthorized, host {alert.authorized_person_ids})")
+
+detector.reset()
+index.record(3, AuthorizationMethod.OTP, subject_id=43)
+detector.update(above, camera_id=3)
+assert detector.update(below, camera_id=3) is None, "Two grants cover two crossings"
+print("✅ Two grants cover two crossings")
+
+print("\n✅ All authorization index tests completed successfully!\n")
+print("="*60 + "\n")
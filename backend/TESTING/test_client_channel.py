@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+from streaming.client_channel import ClientChannel
+from streaming.frame_protocol import encode_frame
+import asyncio
+
+print("\n" + "="*60)
+print("🧪 WEBSOCKET CLIENT CHANNEL TEST")
+print("="*60 + "\n")
+
+
+class FakeSocket:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.received = []
+        self.closed = False
+
+    async def send_json(self, message):
+        await asyncio.sleep(self.delay)
+        self.received.append(message)
+
+    async def send_bytes(self, data):
+        await asyncio.sleep(self.delay)
+        self.received.append(data)
+
+    async def close(self):
+        self.closed = True
+
+
+def frame(camera_id, n):
+    return {"type": "FRAME", "camera_id": camera_id, "frame": n}
+
+
+async def main():
+    # Test 1: A slow client does not hold up a fast one
+    print("Test 1: Independent Senders")
+    print("-" * 60)
+    fast_socket, slow_socket = FakeSocket(), FakeSocket(delay=0.05)
+    fast, slow = ClientChannel(fast_socket, 1), ClientChannel(slow_socket, 2, max_frames=2)
+    fast.start(), slow.start()
+    for n in range(20):
+        for channel in (fast, slow):
+            channel.enqueue(frame(n % 3, n))
+        if n == 10:
+            for channel in (fast, slow):
+                channel.enqueue({"type": "ALERT", "alert_id": "A"})
+        await asyncio.sleep(0.005)
+    await asyncio.sleep(0.01)
+    assert len(fast_socket.received) == 21 and fast.dropped_frames == 0
+    print(f"✅ Fast client got all 21 messages while the slow one had {len(slow_socket.received)}")
+
+    # Test 2: Frames are conflated / dropped oldest, alerts never dropped and sent first
+    print("\nTest 2: Drop Policy")
+    print("-" * 60)
+    await asyncio.sleep(0.3)
+    alerts = [m for m in slow_socket.received if m["type"] == "ALERT"]
+    frames = [m["frame"] for m in slow_socket.received if m["type"] == "FRAME"]
+    assert len(alerts) == 1 and slow.dropped_frames > 0
+    assert frames[-1] == 19 and frames == sorted(frames), frames
+    assert slow.dropped_frames + len(frames) == 20
+    metrics = slow.metrics()
+    assert metrics["queued_frames"] == 0 and metrics["sent_messages"] == 1
+    print(f"✅ Slow client: {len(frames)} frames sent, {slow.dropped_frames} dropped, alert delivered")
+
+    # Test 3: An alert backlog disconnects instead of dropping
+    print("\nTest 3: Alert Backlog")
+    print("-" * 60)
+    stuck_socket = FakeSocket(delay=10)
+    stuck = ClientChannel(stuck_socket, 3, max_messages=5, send_timeout=0.1)
+    stuck.start()
+    results = [stuck.enqueue({"type": "ALERT", "n": n}) for n in range(8)]
+    assert results == [True] * 5 + [False] * 3 and stuck.closed
+    await asyncio.sleep(0.05)
+    assert stuck_socket.closed
+
+    timed_out = ClientChannel(FakeSocket(delay=10), 4, send_timeout=0.05)
+    timed_out.start()
+    timed_out.enqueue({"type": "ALERT"})
+    await asyncio.sleep(0.2)
+    assert timed_out.closed and not timed_out.enqueue({"type": "ALERT"})
+    print("✅ Backlogged or stalled clients are disconnected")
+
+    # Test 4: Binary frame packets share one bytes object across clients
+    print("\nTest 4: Binary Frames")
+    print("-" * 60)
+    sockets = [FakeSocket(), FakeSocket()]
+    channels = [ClientChannel(sock, 10 + i) for i, sock in enumerate(sockets)]
+    for channel in channels:
+        channel.start()
+    packet = encode_frame(1, 1, 0.0, b"\xff\xd8jpeg")
+    for channel in channels:
+        channel.enqueue(packet)
+        channel.enqueue(encode_frame(2, 1, 0.0, b"\xff\xd8jpeg"))
+        channel.enqueue(packet)  # Same camera again: replaces the queued one
+    await asyncio.sleep(0.01)
+    assert all(sock.received[-1] is packet.data for sock in sockets)
+    assert all(channel.metrics()["sent_frame_bytes"] > 0 for channel in channels)
+    print("✅ Every client was sent the same bytes object")
+
+    fast.close(), slow.close()
+    for channel in channels:
+        channel.close()
+
+
+asyncio.run(main())
+
+print("\n✅ All client channel tests completed successfully!\n")
+print("="*60 + "\n")
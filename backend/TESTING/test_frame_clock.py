@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+from AI_ML.frame_clock import CaptureClock
+from datetime import datetime, timedelta
+import cv2
+
+print("\n" + "="*60)
+print("🧪 FRAME CAPTURE CLOCK TEST")
+print("="*60 + "\n")
+
+t0 = 1000.0
+wall0 = datetime(2024, 1, 1, 12, 0, 0)
+
+# Test 1: Frames buffered while processing lagged are stamped at capture time
+print("Test 1: Buffered Frames")
+print("-" * 60)
+clock = CaptureClock()
+# (pts seconds, delay between capture and cap.read() returning it)
+reads = [(0.04, 0.50), (0.08, 0.45), (0.12, 0.02), (0.16, 0.90), (0.20, 1.30), (0.24, 0.03)]
+errors = []
+for pts, delay in reads:
+    captured = t0 + pts
+    now = captured + delay
+    stamp = clock.stamp(pts * 1000, now=now, wall=wall0 + timedelta(seconds=now - t0))
+    assert stamp.monotonic <= now and stamp.pts_ms == pts * 1000
+    assert abs((stamp.wall - wall0).total_seconds() - (stamp.monotonic - t0)) < 1e-6
+    errors.append(stamp.monotonic - captured)
+assert abs(errors[0] - 0.50) < 1e-9, "First frame: best estimate is read time"
+assert all(abs(e - 0.02) < 1e-9 for e in errors[2:]), errors
+assert clock.anchors == 1
+print(f"✅ Error after the first promptly read frame: {errors[-1] * 1000:.0f} ms (read delays up to 1300 ms)")
+
+# Test 2: Re-anchoring and missing PTS
+print("\nTest 2: Reconnects and Missing PTS")
+print("-" * 60)
+stamp = clock.stamp(40.0, now=t0 + 60.0)          # Reconnect: PTS starts over
+assert stamp.monotonic == t0 + 60.0 and clock.anchors == 2
+stamp = clock.stamp(80.0 + 45_000, now=t0 + 160.0)  # Lag beyond max_lag_seconds
+assert stamp.monotonic == t0 + 160.0 and clock.anchors == 3
+for pts in (None, 0.0, -1.0):
+    stamp = clock.stamp(pts, now=t0 + 200.0, wall=wall0)
+    assert stamp.monotonic == t0 + 200.0 and stamp.wall == wall0 and stamp.pts_ms is None
+
+
+class FakeCapture:
+    def get(self, prop):
+        assert prop == cv2.CAP_PROP_POS_MSEC
+        return 1234.0
+
+
+assert CaptureClock().stamp_capture(FakeCapture()).pts_ms == 1234.0
+print("✅ PTS restarts re-anchor; frames without PTS use read time")
+
+print("\n✅ All frame clock tests completed successfully!\n")
+print("="*60 + "\n")
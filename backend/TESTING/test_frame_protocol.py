@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+from streaming.frame_protocol import encode_frame, decode_frame, HEADER
+import base64
+import cv2
+import json
+import numpy as np
+
+print("\n" + "="*60)
+print("🧪 BINARY FRAME PROTOCOL TEST")
+print("="*60 + "\n")
+
+frame = np.random.default_rng(0).integers(0, 255, (450, 800, 3), dtype=np.uint8)
+jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+detections = [{"bbox": [10, 20, 110, 220], "label": "Unknown", "known": False}]
+
+# Test 1: Round trip
+print("Test 1: Round Trip")
+print("-" * 60)
+packet = encode_frame(7, 2**32 + 5, 1704189600.25, jpeg, detections)
+header, decoded_detections, body = decode_frame(packet.data)
+assert HEADER.size == 20
+assert header == {"camera_id": 7, "sequence": 5, "timestamp": 1704189600.25, "flags": 0}
+assert decoded_detections == detections and bytes(body) == jpeg
+assert decode_frame(encode_frame(1, 1, 0.0, jpeg).data)[1] == []
+print(f"✅ Header {HEADER.size} bytes + {len(packet) - HEADER.size - len(jpeg)} bytes of detections")
+
+# Test 2: Size against base64-in-JSON
+print("\nTest 2: Wire Size")
+print("-" * 60)
+legacy = json.dumps({"type": "FRAME", "camera_id": 7, "frame": base64.b64encode(jpeg).decode(), "timestamp": "2024-01-02T10:00:00.250000"})
+assert len(packet) < 0.8 * len(legacy)
+print(f"✅ {len(packet)} bytes binary vs {len(legacy)} bytes base64 JSON ({100 * (1 - len(packet) / len(legacy)):.0f}% smaller)")
+
+print("\n✅ All frame protocol tests completed successfully!\n")
+print("="*60 + "\n")
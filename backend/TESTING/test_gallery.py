@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+from AI_ML.ai_ml_utils import ResidentDatabase
+from gallery.guest_tier import GuestGallery, TieredGallery
+from gallery.gallery_store import (
+    GallerySnapshot, encode_embedding, decode_embedding, decode_templates, embedding_columns,
+    EMBEDDING_FORMAT_VERSION
+)
+import numpy as np
+import pickle
+import tempfile
+import multiprocessing
+import os
+from datetime import datetime, timedelta
+
+print("\n" + "="*60)
+print("🧪 GALLERY STORAGE TEST")
+print("="*60 + "\n")
+
+# Test 1: Binary embedding codec
+print("Test 1: Binary Embedding Codec")
+print("-" * 60)
+
+np.random.seed(7)
+embedding = np.random.rand(128)
+blob = encode_embedding(embedding)
+assert len(blob) == 128 * 4
+decoded = decode_embedding(blob, dim=128, version=EMBEDDING_FORMAT_VERSION)
+assert decoded.dtype == np.float32
+assert np.allclose(decoded, embedding, atol=1e-6)
+print(f"✅ Round trip: {len(blob)} bytes for a 128D embedding")
+
+columns = embedding_columns(embedding, "Facenet")
+assert columns["embedding_dim"] == 128 and columns["embedding_version"] == EMBEDDING_FORMAT_VERSION
+
+legacy = decode_embedding(pickle.dumps(embedding), version="1.0")
+assert np.allclose(legacy, embedding, atol=1e-6)
+print("✅ Legacy pickled embedding decoded")
+
+try:
+    decode_embedding(pickle.dumps(datetime.utcnow()), version="1.0")
+    assert False, "Non-numpy pickle should be refused"
+except pickle.UnpicklingError:
+    print("✅ Non-numpy pickle refused")
+
+# Test 2: Vectorized recognition
+print("\nTest 2: Vectorized Recognition")
+print("-" * 60)
+
+resident_db = ResidentDatabase()
+gallery = np.random.rand(50, 128).astype(np.float32) - 0.5
+for i, row in enumerate(gallery):
+    resident_db.add_embedding(i + 1, f"Resident {i + 1}", row, {"flat": str(100 + i)})
+
+match = resident_db.recognize_face(gallery[17] + 0.01)
+assert match is not None and match["resident_id"] == 18
+print(f"✅ Matched {match['name']} (confidence: {match['confidence']:.3f})")
+
+assert resident_db.remove_resident(18)
+match = resident_db.recognize_face(gallery[17])
+assert match is None or match["resident_id"] != 18
+print("✅ Removed resident no longer matches")
+
+# Test 3: Memory-mapped snapshot
+print("\nTest 3: Gallery Snapshot")
+print("-" * 60)
+
+with tempfile.TemporaryDirectory() as snapshot_dir:
+    snapshot = GallerySnapshot(snapshot_dir)
+    created_at = snapshot.write(resident_db, "Facenet")
+    assert created_at is not None
+    assert snapshot.write(resident_db, "Facenet") is None, "Unchanged gallery should not be rewritten"
+
+    assert GallerySnapshot(snapshot_dir).read("VGG-Face") is None, "Snapshot from another model must be ignored"
+
+    restored_db = ResidentDatabase()
+    restored_time = GallerySnapshot(snapshot_dir).load_into(restored_db, "Facenet")
+    assert restored_time == created_at
+    assert len(restored_db.residents) == 49
+    assert isinstance(restored_db.residents[1]["templates"], np.memmap)
+    match = restored_db.recognize_face(gallery[3])
+    assert match["resident_id"] == 4 and match["metadata"]["flat"] == "103"
+    print(f"✅ Restored {len(restored_db.residents)} residents from memory-mapped snapshot")
+
+# Test 4: Multi-template residents
+print("\nTest 4: Multi-Template Residents")
+print("-" * 60)
+
+templates = np.stack([gallery[0] + 0.3 * (np.random.rand(128) - 0.5) for _ in range(3)]).astype(np.float32)
+columns = embedding_columns(templates, "Facenet")
+assert columns["template_count"] == 3
+restored = decode_templates(columns["face_embedding"], dim=128, version=EMBEDDING_FORMAT_VERSION)
+assert restored.shape == (3, 128) and np.allclose(restored, templates)
+print("✅ (3, 128) template matrix stored in one column")
+
+multi_db = ResidentDatabase(max_templates=4, shortlist=5, dedup_similarity=0.99)
+for i, row in enumerate(gallery):
+    multi_db.add_embedding(i + 1, f"Resident {i + 1}", row)
+multi_db.add_embedding(1, "Resident 1", templates)
+assert not multi_db.add_template(1, templates[0]), "Near-duplicate template should be skipped"
+assert multi_db.add_template(1, gallery[0] - 0.2)
+assert not multi_db.add_template(1, gallery[0] + 0.25), "Template limit reached"
+assert multi_db.get_templates(1).shape == (4, 128)
+
+for template in multi_db.get_templates(1):
+    match = multi_db.recognize_face(template)
+    assert match["resident_id"] == 1 and match["confidence"] > 0.99
+print("✅ Every template of resident 1 is found through the centroid shortlist")
+
+ids, matrix, records = multi_db.export_matrix()
+assert matrix.shape[0] == 4 + 49 and (ids == 1).sum() == 4
+reloaded = ResidentDatabase()
+reloaded.bulk_load(ids, matrix, records)
+assert reloaded.get_templates(1).shape == (4, 128)
+print("✅ Template rows survive export/bulk load")
+
+# Test 5: Expiring guest tier
+print("\nTest 5: Guest Tier")
+print("-" * 60)
+
+guests = GuestGallery(ttl_hours=1, max_entries=3)
+tiered = TieredGallery(ResidentDatabase(), guests)
+for i in range(5):
+    tiered.add_embedding(i + 1, f"Resident {i + 1}", gallery[i], {"flat": str(100 + i)})
+guest_meta = {"phone": "1", "flat": "GUEST", "type": "GUEST"}
+for i in range(10, 13):
+    tiered.add_embedding(i + 1, f"Guest {i + 1}", gallery[i], guest_meta)
+assert len(tiered.residents.residents) == 5 and len(guests) == 3
+assert tiered.recognize_face(gallery[11])["resident_id"] == 12
+assert tiered.recognize_face(gallery[2])["resident_id"] == 3
+print("✅ Residents and guests routed to their own tier")
+
+tiered.add_embedding(14, "Guest 14", gallery[13], guest_meta)
+assert len(guests) == 4, "Capacity is enforced from shared recency, not per process"
+tiered.recognize_face(gallery[10])  # Guest 11 seen by this worker
+seen = guests.drain_seen()
+assert set(seen) == {11, 12} and guests.drain_seen() == {}
+
+# Another worker saw Guest 13 later; both workers rank the same shared times
+other_worker = GuestGallery(ttl_hours=1, max_entries=3)
+enrolled = datetime.utcnow() - timedelta(minutes=30)
+shared = {11: seen[11], 12: seen[12], 13: datetime.utcnow(), 14: enrolled}
+assert guests.select_overflow(shared.items()) == other_worker.select_overflow(shared.items()) == [14]
+shared[14] = None  # Never recognized and no enrollment time: evicted first
+assert guests.select_overflow(list(shared.items()) + [(15, enrolled)]) == [14, 15]
+guests.remove_resident(14)
+print("✅ Least recently seen guest (across workers) evicted at capacity")
+
+# A resident who looks like a guest must not keep that guest "seen"
+tiered.add_embedding(20, "Look-alike", gallery[11] + 0.01, {"flat": "120"})
+assert tiered.recognize_face(gallery[11] + 0.01)["resident_id"] == 20
+assert guests.drain_seen() == {}, "Losing guest match recorded a sighting"
+tiered.remove_resident(20)
+
+assert guests.evict_expired(datetime.utcnow() + timedelta(hours=2)) == [11, 12, 13]
+assert len(guests) == 0 and tiered.recognize_face(gallery[10]) is None
+tiered.add_embedding(15, "Guest 15", gallery[14], {**guest_meta, "expires_at": datetime.utcnow() - timedelta(minutes=1)})
+assert len(guests) == 0, "Already expired guest must not be loaded"
+print("✅ Expired guests removed")
+
+# Test 6: Scope partitions
+print("\nTest 6: Scope Partitions")
+print("-" * 60)
+
+scoped_db = ResidentDatabase(shortlist=3)
+for i, row in enumerate(gallery[:30]):
+    scopes = ["building:A"] if i < 10 else ["building:B"] if i < 20 else []
+    if i == 5:
+        scopes = ["building:A", "zone:parking"]
+    scoped_db.add_embedding(i + 1, f"Resident {i + 1}", row, {"scopes": scopes})
+
+sizes = scoped_db.partition_sizes()
+assert sizes["building:A"] == 10 and sizes["building:B"] == 10 and sizes["zone:parking"] == 1 and sizes[None] == 10
+assert scoped_db.recognize_face(gallery[12], scopes=["building:B"])["resident_id"] == 13
+assert scoped_db.recognize_face(gallery[12], scopes=["building:A"]) is None
+assert scoped_db.recognize_face(gallery[25], scopes=["building:A"])["resident_id"] == 26, "Unscoped residents match everywhere"
+assert scoped_db.recognize_face(gallery[5], scopes=["zone:parking"])["resident_id"] == 6
+assert scoped_db.recognize_face(gallery[12])["resident_id"] == 13, "No scopes searches the whole gallery"
+print(f"✅ Partitions {sizes} searched independently")
+
+# Test 7: Concurrent snapshot writers
+print("\nTest 7: Concurrent Snapshot Writers")
+print("-" * 60)
+
+
+def write_snapshots(snapshot_dir, worker):
+    # Every row of worker k's gallery holds k, so mixed files are detectable
+    for round_ in range(15):
+        db = ResidentDatabase()
+        for i in range(5 + worker):
+            db.add_embedding(i + 1, f"W{worker}", np.full(128, worker + 1, dtype=np.float32))
+        GallerySnapshot(snapshot_dir).write(db, "Facenet", feed_version=round_)
+
+
+with tempfile.TemporaryDirectory() as snapshot_dir:
+    writers = [multiprocessing.Process(target=write_snapshots, args=(snapshot_dir, w)) for w in range(4)]
+    for process in writers:
+        process.start()
+    reads = 0
+    while any(process.is_alive() for process in writers):
+        snapshot = GallerySnapshot(snapshot_dir).read("Facenet")
+        if snapshot is not None:
+            ids, matrix, records, _ = snapshot
+            assert len(ids) == len(matrix) and len(np.unique(matrix)) == 1
+            assert len(ids) == 4 + int(matrix[0, 0]), "ids and embeddings from different writers"
+            reads += 1
+    assert all(process.exitcode == 0 for process in writers)
+    assert not any(name.endswith(".tmp") or name.startswith(".CURRENT-") for name in os.listdir(snapshot_dir))
+    assert len([name for name in os.listdir(snapshot_dir) if name.startswith("snapshot-")]) <= 2
+
+    # A lagging worker must not replace a newer snapshot
+    live = GallerySnapshot(snapshot_dir)
+    assert live.read("Facenet") and live.feed_version == 14
+    assert GallerySnapshot(snapshot_dir).write(resident_db, "Facenet", feed_version=3) is None
+    assert GallerySnapshot(snapshot_dir).write(resident_db, "Facenet", feed_version=20) is not None
+
+    # Another writer's filled but not yet committed directory survives pruning; a crashed writer's does not
+    in_progress = tempfile.mkdtemp(prefix="snapshot-", dir=snapshot_dir)
+    crashed = tempfile.mkdtemp(prefix="snapshot-", dir=snapshot_dir)
+    os.utime(crashed, (0, 0))
+    for version in (21, 22, 23):
+        resident_db.add_embedding(100 + version, "New", gallery[0])
+        assert GallerySnapshot(snapshot_dir).write(resident_db, "Facenet", feed_version=version) is not None
+    assert os.path.isdir(in_progress) and not os.path.exists(crashed)
+    committed = [name for name in os.listdir(snapshot_dir) if name.startswith("snapshot-") and name != os.path.basename(in_progress)]
+    assert len(committed) == 2
+    print(f"✅ {reads} consistent reads while 4 processes wrote; older snapshots never win")
+
+print("\n✅ All gallery tests completed successfully!\n")
+print("="*60 + "\n")
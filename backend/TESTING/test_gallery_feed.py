@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models import Resident
+from AI_ML.ai_ml_utils import ResidentDatabase
+from gallery.gallery_store import embedding_columns
+from gallery.change_feed import GalleryChangeFeed, record_change, UPSERT, DEACTIVATE, DELETE
+import numpy as np
+import os
+import tempfile
+
+print("\n" + "="*60)
+print("🧪 GALLERY CHANGE FEED TEST")
+print("="*60 + "\n")
+
+tmp_dir = tempfile.mkdtemp()
+engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'feed.db')}", connect_args={"check_same_thread": False})
+Base.metadata.create_all(bind=engine)
+Session = sessionmaker(bind=engine)
+signal_path = os.path.join(tmp_dir, "changes.signal")
+
+# Two "worker processes", each with its own gallery
+worker_a = ResidentDatabase()
+worker_b = ResidentDatabase()
+feed_a = GalleryChangeFeed(Session, worker_a, signal_path=signal_path, full_poll_interval=3600)
+feed_b = GalleryChangeFeed(Session, worker_b, signal_path=signal_path, full_poll_interval=3600)
+feed_a.poll_once(force=True)
+feed_b.poll_once(force=True)
+
+# Test 1: Enrollment on one worker reaches the other
+print("Test 1: Incremental Insert")
+print("-" * 60)
+
+np.random.seed(3)
+embedding = np.random.rand(128)
+db = Session()
+resident = Resident(name="Priya", flat_number="302", phone_number="555-0102", is_active=True,
+                    **embedding_columns(embedding, "Facenet"))
+db.add(resident)
+db.flush()
+record_change(db, resident.id, UPSERT)
+db.commit()
+feed_a.notify()
+resident_id = resident.id
+
+assert feed_b.poll_once() == 1
+match = worker_b.recognize_face(embedding)
+assert match is not None and match["resident_id"] == resident_id
+print(f"✅ Worker B recognizes {match['name']} enrolled via worker A")
+assert feed_b.poll_once() == 0, "No signal, no full poll due -> nothing to do"
+
+# Test 2: Deactivation
+print("\nTest 2: Incremental Deactivation")
+print("-" * 60)
+
+resident.is_active = False
+record_change(db, resident_id, DEACTIVATE)
+db.commit()
+feed_a.notify()
+feed_b.poll_once(force=True)
+assert worker_b.recognize_face(embedding) is None
+print("✅ Deactivated resident removed from worker B")
+
+# Test 3: Re-activation followed by hard delete in one batch collapses to a delete
+print("\nTest 3: Collapsed Upsert + Delete")
+print("-" * 60)
+
+resident.is_active = True
+record_change(db, resident_id, UPSERT)
+db.commit()
+db.delete(resident)
+record_change(db, resident_id, DELETE)
+db.commit()
+feed_a.poll_once(force=True)
+assert resident_id not in worker_a.residents
+assert feed_a.last_version == feed_b.latest_version(db)
+print(f"✅ Feed at version {feed_a.last_version}, deleted resident absent")
+
+assert feed_a.covers(db, 0)
+
+# Test 4: A lower feed id committed after a higher one is still applied
+print("\nTest 4: Out-of-Order Commits")
+print("-" * 60)
+
+from models import GalleryChange
+late_embedding, early_embedding = np.random.rand(128), np.random.rand(128)
+late = Resident(name="Late", flat_number="401", phone_number="555-0401", is_active=True, **embedding_columns(late_embedding, "Facenet"))
+early = Resident(name="Early", flat_number="402", phone_number="555-0402", is_active=True, **embedding_columns(early_embedding, "Facenet"))
+db.add_all([late, early])
+db.flush()
+base = feed_b.latest_version(db)
+# Transaction 1 got id base+1 but commits last; transaction 2 (base+2) commits first
+db.add(GalleryChange(id=base + 2, resident_id=early.id, operation=UPSERT))
+db.commit()
+feed_b.poll_once(force=True)
+assert early.id in worker_b.residents and feed_b.last_version == base + 2 and base + 1 in feed_b.gaps
+db.add(GalleryChange(id=base + 1, resident_id=late.id, operation=UPSERT))
+db.commit()
+assert feed_b.poll_once(force=True) == 1
+assert late.id in worker_b.residents and not feed_b.gaps
+print(f"✅ Change {base + 1} committed after {base + 2} was picked up")
+
+# A late DEACTIVATE must not undo a newer re-activation; rows are the source of truth
+db.add(GalleryChange(id=base + 4, resident_id=late.id, operation=UPSERT))
+db.commit()
+feed_b.poll_once(force=True)
+db.add(GalleryChange(id=base + 3, resident_id=late.id, operation=DEACTIVATE))
+db.commit()
+feed_b.poll_once(force=True)
+assert late.id in worker_b.residents, "Row is still active"
+
+# Ids that never commit (rolled back) stop being queried after gap_timeout
+feed_b.gap_timeout = 0.0
+db.add(GalleryChange(id=base + 6, resident_id=early.id, operation=UPSERT))
+db.commit()
+feed_b.poll_once(force=True)
+assert base + 5 in feed_b.gaps
+feed_b.poll_once(force=True)
+assert not feed_b.gaps
+print("✅ Late entries re-read rows; abandoned gaps expire")
+db.close()
+
+print("\n✅ All change feed tests completed successfully!\n")
+print("="*60 + "\n")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+from streaming.mjpeg import MjpegStreams, PLACEHOLDER_PART
+from streaming.frame_protocol import encode_frame
+from fastapi import FastAPI, HTTPException
+from starlette.requests import ClientDisconnect
+import asyncio
+import time
+
+print("\n" + "="*60)
+print("🧪 MJPEG STREAMING TEST")
+print("="*60 + "\n")
+
+
+def packet(sequence, tier="grid"):
+    return encode_frame(1, sequence, float(sequence), b"\xff\xd8jpeg%d\xff\xd9" % sequence, [{"bbox": [0, 0, 1, 1]}], tier=tier)
+
+
+async def read_part(body):
+    header = await body.__anext__()
+    jpeg = await body.__anext__()
+    assert await body.__anext__() == b"\r\n"
+    return header, jpeg
+
+
+async def main():
+    # Test 1: Parts are views of the shared packet, only watched tiers are published
+    print("Test 1: Shared Packets")
+    print("-" * 60)
+    streams = MjpegStreams(max_viewers=2, keepalive_seconds=0.3)
+    assert streams.tiers(1) == set()
+    assert streams.join(1, "grid") and streams.join(1, "grid") and not streams.join(2, "grid")
+    assert streams.tiers(1) == {"grid"} and streams.rejected == 1
+    a, b = streams.stream(1, "grid", fps=10), streams.stream(1, "grid", fps=10)
+    first = packet(1)
+    streams.publish(first)
+    streams.publish(packet(1, tier="focus"))   # Nobody watches focus
+    assert (1, "focus") not in streams.latest
+    (header_a, jpeg_a), (_, jpeg_b) = await read_part(a), await read_part(b)
+    assert header_a.startswith(b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: 9\r\n")
+    assert bytes(jpeg_a) == b"\xff\xd8jpeg1\xff\xd9" and jpeg_a.obj is first.data and jpeg_b.obj is first.data
+    print("✅ Both viewers got a view of the same packet bytes")
+
+    # Test 2: Rate limit with conflation
+    print("\nTest 2: Rate Limit")
+    print("-" * 60)
+    started = time.monotonic()
+    next_part = asyncio.ensure_future(read_part(a))
+    for sequence in range(2, 6):
+        streams.publish(packet(sequence))
+        await asyncio.sleep(0.01)
+    _, jpeg = await next_part
+    elapsed = time.monotonic() - started
+    assert bytes(jpeg) == b"\xff\xd8jpeg5\xff\xd9" and 0.08 <= elapsed < 0.2, elapsed
+    print(f"✅ Next part after {elapsed * 1000:.0f} ms, intermediate frames skipped")
+
+    # Test 3: Keepalive repeats the last frame, leaving cleans up
+    print("\nTest 3: Keepalive and Cleanup")
+    print("-" * 60)
+    started = time.monotonic()
+    _, jpeg = await read_part(a)
+    assert bytes(jpeg) == b"\xff\xd8jpeg5\xff\xd9" and 0.25 <= time.monotonic() - started < 0.5
+    await a.aclose()
+    streams.leave(1, "grid")
+    assert streams.viewers == {(1, "grid"): 1}
+    await b.aclose()
+    streams.leave(1, "grid")
+    assert streams.viewers == {} and streams.latest == {} and streams.tiers(1) == set()
+    metrics = streams.metrics()
+    assert metrics["sent_parts"] == 4 and metrics["total_viewers"] == 2, metrics
+    print(f"✅ Metrics {metrics}")
+
+    # Test 4: Idle camera
+    print("\nTest 4: Idle Camera")
+    print("-" * 60)
+    assert streams.join(3, "grid")
+    idle = streams.stream(3, "grid", fps=10)
+    started = time.monotonic()
+    assert await idle.__anext__() == PLACEHOLDER_PART and 0.25 <= time.monotonic() - started < 0.5
+    assert await idle.__anext__() == PLACEHOLDER_PART
+    await idle.aclose()
+    streams.leave(3, "grid")
+    assert streams.viewers == {} and streams.tiers(3) == set()
+    print("✅ A camera without frames still gets keepalive parts")
+
+    # Test 5: Responses through an app - capacity race, early disconnects
+    print("\nTest 5: Responses")
+    print("-" * 60)
+    streams = MjpegStreams(max_viewers=1, keepalive_seconds=0.1)
+    app = FastAPI()
+
+    @app.get("/stream.mjpeg")
+    async def stream_mjpeg():
+        response = streams.open(1, "grid", fps=10)
+        if response is None:
+            raise HTTPException(status_code=503)
+        return response
+
+    async def request(gone_on=None):
+        """Raw ASGI request; the client leaves when `gone_on` matches a sent message (or after the first part)"""
+        sent = []
+        async def receive():
+            await asyncio.sleep(3600)
+        async def send(message):
+            sent.append(message)
+            if (gone_on or (lambda m: m.get("body", b"").startswith(b"--frame")))(message):
+                raise OSError("client gone")
+        scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+                 "method": "GET", "scheme": "http", "path": "/stream.mjpeg", "raw_path": b"/stream.mjpeg",
+                 "query_string": b"", "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("testserver", 80)}
+        try:
+            await app(scope, receive, send)
+        except ClientDisconnect:
+            pass
+        return sent
+
+    first, second = await asyncio.gather(request(), request())
+    statuses = sorted(messages[0]["status"] for messages in (first, second))
+    winner = first if first[0]["status"] == 200 else second
+    assert statuses == [200, 503] and winner[1]["body"] == PLACEHOLDER_PART, statuses
+    assert streams.viewers == {} and streams.rejected == 1
+    print("✅ Two viewers racing for the last slot: one 200 stream, one 503")
+
+    await request(gone_on=lambda message: message["type"] == "http.response.start")
+    assert streams.viewers == {} and streams.tiers(1) == set() and streams.total_viewers == 2
+    print("✅ A client gone before the body started released its slot")
+
+asyncio.run(main())
+
+print("\n✅ All MJPEG streaming tests completed successfully!\n")
+print("="*60 + "\n")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+from streaming.preview import PreviewEncoder
+from streaming.frame_protocol import decode_frame
+import cv2
+import numpy as np
+
+print("\n" + "="*60)
+print("🧪 PREVIEW TIER TEST")
+print("="*60 + "\n")
+
+TIERS = {
+    "grid": {"max_width": 480, "quality": 60},
+    "focus": {"max_width": None, "quality": 85}
+}
+frame = np.random.default_rng(0).integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+original = frame.copy()
+detections = [{"bbox": [100, 200, 300, 600], "label": "Unknown", "known": False}]
+
+# Test 1: One packet per requested tier, sized and scaled for it
+print("Test 1: Tier Encoding")
+print("-" * 60)
+encoder = PreviewEncoder(TIERS)
+packets = encoder.encode(3, frame, {"grid", "focus"}, 42, 1704189600.5, detections)
+assert set(packets) == {"grid", "focus"} and np.array_equal(frame, original)
+sizes = {}
+for tier, packet in packets.items():
+    header, tier_detections, jpeg = decode_frame(packet.data)
+    image = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+    sizes[tier] = image.shape[:2]
+    assert packet.tier == tier and header["camera_id"] == 3 and header["sequence"] == 42
+    if tier == "grid":
+        assert tier_detections[0]["bbox"] == [38, 75, 112, 225]
+    else:
+        assert tier_detections == detections
+assert sizes == {"grid": (270, 480), "focus": (720, 1280)}
+assert len(packets["grid"]) < len(packets["focus"]) / 3
+print(f"✅ grid {len(packets['grid'])} bytes, focus {len(packets['focus'])} bytes")
+
+# Test 2: Only watched tiers are encoded
+print("\nTest 2: Watched Tiers Only")
+print("-" * 60)
+assert set(encoder.encode(3, frame, {"grid", "unknown"}, 43, 0.0)) == {"grid"}
+assert encoder.encode(3, frame, set(), 44, 0.0) == {}
+metrics = encoder.metrics()
+assert metrics["tiers"]["grid"]["encoded"] == 2 and metrics["tiers"]["focus"]["encoded"] == 1
+print(f"✅ Encode counts {({t: m['encoded'] for t, m in metrics['tiers'].items()})}")
+
+print("\n✅ All preview tier tests completed successfully!\n")
+print("="*60 + "\n")
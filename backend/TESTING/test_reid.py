@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+from AI_ML.reid import ReIDService
+from AI_ML.tailgating_logic import TailgatingDetector
+from SECURITY.authorization_index import AuthorizationIndex
+import numpy as np
+
+print("\n" + "="*60)
+print("🧪 CROSS-CAMERA RE-ID TEST")
+print("="*60 + "\n")
+
+rng = np.random.default_rng(7)
+alice, bob = rng.normal(size=(2, 128)).astype(np.float32)
+
+def noisy(embedding):
+    return embedding + rng.normal(scale=0.1, size=embedding.shape).astype(np.float32)
+
+# Test 1: Hand-off between cameras
+print("Test 1: Track Hand-off")
+print("-" * 60)
+
+reid = ReIDService(ttl_seconds=60, similarity_threshold=0.6, max_identities=4)
+gate = reid.resolve(1, 10, noisy(alice), now=100.0)
+lobby = reid.resolve(2, 3, noisy(alice), now=110.0)
+other = reid.resolve(2, 4, noisy(bob), now=110.0)
+assert gate == lobby and other != gate
+assert reid.resolve(2, 3, None, now=111.0) == lobby, "Bound tracks keep their identity without an embedding"
+assert reid.resolve(3, 1, None, now=111.0) is None
+assert reid.resolve(1, 11, noisy(alice), now=112.0) != gate, "A person tracked on this camera is not matched twice"
+assert reid.resolve(3, 1, noisy(alice), now=500.0) not in (gate, lobby), "Expired identities are not matched"
+assert reid.identities[gate].cameras == [1, 2]
+print(f"✅ Gate track and lobby track share identity {gate}")
+
+# Test 2: Bounded index
+print("\nTest 2: Bounded Index")
+print("-" * 60)
+
+for i in range(10):
+    reid.resolve(4, 100 + i, rng.normal(size=128), now=600.0 + i)
+assert len(reid.identities) == 4 and reid.stats()["capacity"] == 4
+reid.release_track(4, 109)
+newest = max(reid.identities)
+assert reid.evict_expired(now=1000.0) == [newest]
+print("✅ Least recently seen identities recycled, released ones expire")
+
+# Test 3: Shared recognition and alerts across detectors
+print("\nTest 3: Detectors Share Identities")
+print("-" * 60)
+
+reid = ReIDService()
+index = AuthorizationIndex()
+above = [(100, 200, 150, 290), (300, 200, 350, 290)]
+below = [(100, 250, 150, 350), (300, 250, 350, 350)]
+alerts = {}
+for camera_id in (1, 2):
+    detector = TailgatingDetector(tripwire_y=300, authorization_index=index, door_id=camera_id, reid=reid)
+    index.record(camera_id, "RFID", subject_id=5)
+    faces = [noisy(alice), noisy(bob)]
+    detector.update(above, embeddings=faces, camera_id=camera_id)
+    alerts[camera_id] = detector.update(below, embeddings=[noisy(alice), noisy(bob)], camera_id=camera_id)
+
+assert alerts[1] is not None and len(alerts[1].global_ids) == 2
+assert alerts[2] is None, "The same tailgater is not alerted again on the next camera"
+print(f"✅ Suspects {alerts[1].global_ids} alerted once across two doors")
+
+detector = TailgatingDetector(tripwire_y=300, door_id=3, reid=reid)
+reid.resolve(1, 50, alice, resident_id=42)
+detector.update([(100, 200, 150, 290)], embeddings=[noisy(alice)], camera_id=3)
+assert 42 in detector.track_residents.values(), "Resident recognized on camera 1 is known on camera 3"
+print("✅ Recognition on one camera is shared with the others")
+
+print("\n✅ All re-ID tests completed successfully!\n")
+print("="*60 + "\n")
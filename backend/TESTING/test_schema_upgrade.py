@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+from sqlalchemy import create_engine, inspect, Column, Integer, String, Float, Boolean, DateTime, LargeBinary
+from sqlalchemy.orm import sessionmaker, declarative_base
+from database import upgrade_schema
+from models import Base, Resident, CameraConfig, IncidentLog
+from datetime import datetime
+import os
+import tempfile
+
+print("\n" + "="*60)
+print("🧪 SCHEMA UPGRADE TEST")
+print("="*60 + "\n")
+
+# Tables as they were before the float32 gallery / tripwire columns
+Baseline = declarative_base()
+
+
+class BaselineResident(Baseline):
+    __tablename__ = "residents"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, index=True)
+    flat_number = Column(String)
+    height_cm = Column(Float)
+    phone_number = Column(String)
+    face_embedding = Column(LargeBinary)
+    embedding_version = Column(String, default="1.0")
+    is_active = Column(Boolean, default=True)
+    enrollment_date = Column(DateTime, default=datetime.utcnow)
+    last_updated = Column(DateTime, default=datetime.utcnow)
+
+
+class BaselineCameraConfig(Baseline):
+    __tablename__ = "camera_configs"
+    id = Column(Integer, primary_key=True, index=True)
+    camera_id = Column(Integer, unique=True)
+    name = Column(String)
+    url = Column(String)
+    enabled = Column(Boolean, default=True)
+
+
+class BaselineIncidentLog(Baseline):
+    __tablename__ = "incident_logs"
+    id = Column(Integer, primary_key=True, index=True)
+    incident_type = Column(String)
+    severity = Column(String)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+    camera_id = Column(Integer)
+    detected_persons = Column(Integer, default=0)
+    authorized_persons = Column(Integer, default=0)
+    person_ids = Column(String, nullable=True)
+    additional_details = Column(String, nullable=True)
+    resolved = Column(Boolean, default=False)
+    snapshot_path = Column(String, nullable=True)
+
+
+db_path = os.path.join(tempfile.mkdtemp(), "baseline.db")
+engine = create_engine(f"sqlite:///{db_path}")
+Baseline.metadata.create_all(bind=engine)
+with sessionmaker(bind=engine)() as db:
+    db.add(BaselineResident(name="Legacy", phone_number="1", face_embedding=b"pickle"))
+    db.add(BaselineCameraConfig(camera_id=1, name="Gate", url="0"))
+    db.add(BaselineIncidentLog(incident_type="TAILGATING", severity="LOW", camera_id=1, snapshot_path="/old.jpg"))
+    db.commit()
+
+# Test 1: Missing columns are added, existing rows get defaults
+print("Test 1: Upgrade Baseline Database")
+print("-" * 60)
+added = upgrade_schema(engine, Base.metadata)
+for column in ("residents.embedding_dim", "residents.template_count", "residents.embedding_model",
+               "residents.expires_at", "residents.access_scopes", "camera_configs.tripwires",
+               "incident_logs.video_path"):
+    assert column in added, (column, added)
+with sessionmaker(bind=engine)() as db:
+    legacy = db.query(Resident).one()
+    assert legacy.name == "Legacy" and legacy.template_count == 1 and legacy.embedding_dim is None
+    assert db.query(CameraConfig).one().tripwires is None
+    db.add(Resident(name="New", phone_number="2", embedding_dim=128, access_scopes="zone:parking"))
+    db.commit()
+    assert db.query(Resident).filter(Resident.expires_at.is_(None)).count() == 2
+    # Incident inserts with clips, the incidents list and the retention protected-path query
+    db.add(IncidentLog(incident_type="WEAPON", severity="HIGH", camera_id=1, video_path="/clip.avi"))
+    db.commit()
+    paths = db.query(IncidentLog.snapshot_path, IncidentLog.video_path).filter(
+        (IncidentLog.snapshot_path.isnot(None)) | (IncidentLog.video_path.isnot(None))
+    ).order_by(IncidentLog.id).all()
+    assert [tuple(row) for row in paths] == [("/old.jpg", None), (None, "/clip.avi")]
+indexes = {index["name"] for index in inspect(engine).get_indexes("residents")}
+assert "ix_residents_expires_at" in indexes and "ix_residents_last_updated" in indexes
+assert "gallery_changes" in inspect(engine).get_table_names()
+print(f"✅ Added {len(added)} columns: {', '.join(added)}")
+
+# Test 2: Running again changes nothing
+print("\nTest 2: Idempotent")
+print("-" * 60)
+assert upgrade_schema(engine, Base.metadata) == []
+print("✅ Second run adds nothing")
+
+print("\n✅ All schema upgrade tests completed successfully!\n")
+print("="*60 + "\n")
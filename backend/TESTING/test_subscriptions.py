@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+from streaming.subscriptions import Subscriptions, parse_request
+
+print("\n" + "="*60)
+print("🧪 WEBSOCKET SUBSCRIPTIONS TEST")
+print("="*60 + "\n")
+
+TIERS = ["grid", "focus"]
+
+# Test 1: Defaults - every alert, no previews
+print("Test 1: Defaults")
+print("-" * 60)
+subs = Subscriptions()
+assert subs.wants("ALERT", 1) and subs.wants("AUTHORIZED_ENTRY") and subs.wants("pong")
+assert not subs.wants("FRAME", 1) and subs.frame_tier(1) is None
+print("✅ New client gets alerts on all cameras and no preview frames")
+
+# Test 2: Preview subscriptions per camera and tier
+print("\nTest 2: Preview Subscriptions")
+print("-" * 60)
+subs.subscribe(*parse_request({"type": "subscribe", "cameras": [1, 2]}, TIERS, "grid")[1:])
+subs.subscribe(*parse_request({"type": "subscribe", "cameras": 2, "tier": "focus"}, TIERS, "grid")[1:])
+assert subs.wants("FRAME", 1) and not subs.wants("FRAME", 3)
+assert subs.frame_tier(1) == "grid" and subs.frame_tier(2) == "focus"
+subs.unsubscribe(["FRAME"], {1})
+assert not subs.wants("FRAME", 1) and subs.frame_subscriptions() == {2: "focus"}
+subs.subscribe(["FRAME"], {"*"}, "grid")
+assert subs.frame_tier(7) == "grid" and subs.frame_tier(2) == "focus"
+subs.unsubscribe(["FRAME"], {"*"})
+assert not subs.wants("FRAME", 2) and subs.wants("ALERT", 2)
+print(f"✅ Per-camera tiers; state {subs.to_dict()}")
+
+# Test 3: Narrowing a JSON message type to some cameras
+print("\nTest 3: Alert Filters")
+print("-" * 60)
+subs.unsubscribe(["ALERT"], {"*"})
+subs.subscribe(["ALERT"], {4}, None)
+assert subs.wants("ALERT", 4) and not subs.wants("ALERT", 5) and subs.wants("ALERT")
+assert subs.wants("AUTHORIZED_ENTRY", 5) and subs.wants("error")
+print("✅ ALERT narrowed to Camera 4, other types unchanged")
+
+# Test 4: Invalid requests are rejected
+print("\nTest 4: Validation")
+print("-" * 60)
+for bad in ({"type": "subscribe", "tier": "huge"},
+            {"type": "subscribe", "cameras": ["lobby"]},
+            {"type": "subscribe", "cameras": [True]},
+            {"type": "subscribe", "messages": []},
+            {"type": "watch"}):
+    try:
+        parse_request(bad, TIERS, "grid")
+        assert False, bad
+    except ValueError as e:
+        print(f"   rejected: {e}")
+print("✅ Invalid requests raise ValueError")
+
+print("\n✅ All subscription tests completed successfully!\n")
+print("="*60 + "\n")
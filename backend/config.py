@@ -10,19 +10,49 @@ BASE_DIR = Path(__file__).resolve().parent
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./surakshasetu.db")
 
 # Camera Settings
+# "scopes" limits face search to residents tagged with one of these access scopes
+# (plus untagged residents). Cameras without "scopes" search the whole gallery.
+# "tracker" overrides TAILGATING_CONFIG["tracker_type"] for one camera.
+# "tripwires" lists directional lines/zones (see AI_ML/tripwires.py), e.g.
+#   [{"type": "line", "points": [[0, 300], [800, 300]], "direction": "positive"},
+#    {"type": "zone", "points": [[100, 250], [500, 250], [500, 450], [100, 450]], "direction": "enter"}]
+# Without it a camera uses a horizontal line at TAILGATING_CONFIG["tripwire_y"], crossed downwards.
 CAMERA_CONFIG = {
     1: {"name": "Entry Gate", "stream_url": "http://192.168.0.190:8080/video", "active": True},
-    2: {"name": "Lobby", "stream_url": "http://192.0.0.2:8080/video", "active": True},
+    2: {"name": "Lobby", "stream_url": "http://192.0.0.2:8080/video", "active": True, "tracker": "deepsort"},
     3: {"name": "Stairwell", "stream_url": "http://192.168.0.122:8080/video", "active": True},
-    4: {"name": "Parking", "stream_url": "http://192.168.0.116:8080/video", "active": True},
+    4: {"name": "Parking", "stream_url": "http://192.168.0.116:8080/video", "active": True, "scopes": ["zone:parking"]},
     0: {"name": "Webcam", "stream_url": 0, "active": True}
 }
 
 # Detection Settings
 TAILGATING_CONFIG = {
-    "tripwire_y": 300,
+    "tripwire_y": 300,           # Default tripwire for cameras without "tripwires"
     "time_window": 3.0,
-    "distance_threshold": 50
+    "distance_threshold": 50,
+    "alert_history_size": 100,   # Ring buffer capacities per detector
+    "recent_alerts_size": 20,
+    "crossing_history_size": 10, # Crossing times kept per live track
+    "authorization_ring_size": 256,  # RFID/OTP/face grants kept per door and method
+    "tracker_type": "centroid",  # "centroid" or "deepsort" (Kalman + appearance)
+    "tracker": {
+        "max_disappeared": 40,
+        "max_distance": 80.0,  # Pixels; further jumps start a new track
+        "iou_weight": 0.3,     # Share of (1 - IoU) in the assignment cost
+        # DeepSORT only
+        "appearance_weight": 0.5,        # Share of embedding distance when both sides have one
+        "max_appearance_distance": 0.4,  # Cosine distance above which a pairing is refused
+        "feature_momentum": 0.9          # Running-average weight of a track's stored embedding
+    }
+}
+
+# Cross-camera re-identification (AI_ML/reid.py)
+REID_CONFIG = {
+    "enabled": True,
+    "ttl_seconds": 120,            # A global identity is matchable this long after it was last seen
+    "similarity_threshold": 0.6,   # Cosine similarity needed to hand a track over to an identity
+    "max_identities": 1000,        # Least recently seen identities are recycled beyond this
+    "feature_momentum": 0.9        # Running-average weight of an identity's embedding
 }
 
 OTP_CONFIG = {
@@ -38,9 +68,84 @@ AI_CONFIG = {
     "object_confidence": 0.5
 }
 
+GALLERY_CONFIG = {
+    "snapshot_dir": BASE_DIR / "gallery_snapshot",
+    "snapshot_interval_seconds": 300,
+    "allow_legacy_pickle": True,  # Read (and migrate) pre-2.0 pickled embeddings
+    "change_signal_path": BASE_DIR / "gallery_snapshot" / "changes.signal",
+    "change_poll_interval_seconds": 1.0,
+    "change_full_poll_seconds": 30.0,  # Query the DB even without a signal (other hosts)
+    "change_gap_seconds": 60.0,    # How long a skipped feed id may still commit late (longest write transaction)
+    "change_retention_hours": 24,
+    "max_templates_per_identity": 5,
+    "template_dedup_similarity": 0.97,  # New templates closer than this to an existing one are skipped
+    "centroid_shortlist": 8,  # Identities re-ranked against their full templates
+    "guest_ttl_hours": 24,
+    "guest_max_entries": 500,  # Least recently seen guests (by any worker) are evicted beyond this
+    "guest_eviction_interval_seconds": 60
+}
+
 INCIDENT_CONFIG = {
     "snapshot_quality": 80,
-    "snapshot_dir": BASE_DIR / "incidents"
+    "snapshot_dir": BASE_DIR / "incidents",
+    "snapshot_workers": 2,        # Threads encoding and writing incident snapshots
+    "snapshot_queue_size": 64,    # Pending snapshots; further ones are dropped (and counted)
+    # Retention over snapshot_dir (snapshots and clips)
+    "max_disk_mb": 2048,
+    "max_age_days": 30,
+    "retention_grace_seconds": 300,        # Newer files are never evicted (alerts in flight)
+    "retention_interval_seconds": 600,
+    # Serving
+    "thumbnail_dir": BASE_DIR / "incidents" / "thumbnails",
+    "thumbnail_widths": [160, 320, 640],
+    "thumbnail_quality": 75,
+    "media_cache_seconds": 86400
+}
+
+CLIP_CONFIG = {
+    "enabled": True,
+    "clip_dir": BASE_DIR / "incidents" / "clips",
+    "pre_seconds": 5.0,           # Buffered footage before the event
+    "post_seconds": 5.0,          # Footage after the event
+    "fps": 10.0,                  # Frames sampled into the buffer per second
+    "quality": 70,
+    "max_buffer_bytes": 8 * 1024 * 1024,   # Per camera
+    "max_pending": 8              # Clips collecting at once; further events get no clip
+}
+
+RECORDING_CONFIG = {
+    "enabled": True,
+    "recording_dir": BASE_DIR / "recordings",
+    "index_path": BASE_DIR / "recordings" / "segments.db",
+    "segment_seconds": 60,
+    "fps": 10.0,
+    "fourcc": "mp4v",
+    "extension": ".mp4",
+    "max_gap_seconds": 2.0,        # Longer capture gaps start a new segment
+    "queue_seconds": 2.0,          # Frames buffered per camera writer before dropping
+    "max_disk_mb": 20480,
+    "max_age_days": 7,
+    "retention_interval_seconds": 600
+}
+
+WEBSOCKET_CONFIG = {
+    "max_queued_frames": 16,       # Pending FRAME messages per client (newest per camera); older ones are dropped
+    "max_queued_messages": 1000,   # Alert/control backlog per client before it is disconnected (never dropped)
+    "send_timeout_seconds": 10.0   # A single send taking longer disconnects the client
+}
+
+# Live preview tiers: each watched camera is encoded once per tier, shared by all its viewers
+PREVIEW_CONFIG = {
+    "interval_frames": 5,          # Every Nth camera frame becomes a preview
+    "default_tier": "grid",
+    "tiers": {
+        "grid": {"max_width": 480, "quality": 60},     # Camera grid thumbnails
+        "focus": {"max_width": None, "quality": 85}    # Enlarged view, full resolution
+    },
+    # GET /api/cameras/{id}/stream.mjpeg (NVR walls, <img> tags), fed from the same packets
+    "mjpeg_max_fps": 5,            # Per-connection rate limit
+    "mjpeg_max_viewers": 32,
+    "mjpeg_keepalive_seconds": 5.0  # Repeat the last frame when the camera is quiet this long
 }
 
 FEATURES = {
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, literal, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # Supabase PostgreSQL URL
@@ -17,4 +18,37 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def upgrade_schema(bind=engine, metadata=None) -> list:
+    """
+    Bring existing tables up to the models: create_all() only creates missing
+    tables, so columns and indexes added to a model since are added here with
+    ALTER TABLE ... ADD COLUMN (scalar defaults included). Idempotent and safe
+    to run from several workers at once. Returns the added "table.column" names.
+    """
+    metadata = metadata if metadata is not None else Base.metadata
+    metadata.create_all(bind=bind)
+    added = []
+    for table in metadata.sorted_tables:
+        existing = {column["name"] for column in inspect(bind).get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=bind.dialect)
+            ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+            if column.default is not None and column.default.is_scalar:
+                value = literal(column.default.arg).compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True})
+                ddl += f" DEFAULT {value}"
+            try:
+                with bind.begin() as conn:
+                    conn.execute(text(ddl))
+                added.append(f"{table.name}.{column.name}")
+            except (OperationalError, ProgrammingError):
+                # Another worker added it first
+                if column.name not in {c["name"] for c in inspect(bind).get_columns(table.name)}:
+                    raise
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+    return added
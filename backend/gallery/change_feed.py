@@ -0,0 +1,199 @@
+"""
+GALLERY CHANGE FEED
+Keeps the in-memory ResidentDatabase of every worker process in sync.
+
+Writers append a GalleryChange row (UPSERT / DEACTIVATE / DELETE) in the same
+transaction as the Resident change and then touch a signal file. Each process
+polls the signal file cheaply and only queries the feed table when it moved
+(or every `full_poll_interval` seconds, for writers on other hosts), applying
+changes after its last seen version incrementally.
+
+Feed ids are allocated when a transaction inserts, not when it commits, so a
+lower id can become visible after a higher one was read. Ids skipped below the
+high-water mark are kept as gaps and queried again until they show up or
+`gap_timeout` passes (rolled back transactions leave permanent holes).
+Changes are applied by re-reading the resident's row, so a late entry never
+undoes a newer state.
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Dict
+
+from sqlalchemy import or_
+
+from models import GalleryChange, Resident
+from gallery.gallery_store import apply_resident_row
+
+logger = logging.getLogger(__name__)
+
+UPSERT = "UPSERT"
+DEACTIVATE = "DEACTIVATE"
+DELETE = "DELETE"
+
+
+def record_change(db, resident_id: int, operation: str):
+    """Append a feed entry. Commit it together with the Resident change."""
+    db.add(GalleryChange(resident_id=resident_id, operation=operation, timestamp=datetime.utcnow()))
+
+
+class GalleryChangeFeed:
+    """Polls the gallery_changes table and applies new entries to a ResidentDatabase"""
+
+    def __init__(self,
+                 session_factory,
+                 resident_db,
+                 signal_path=None,
+                 poll_interval: float = 1.0,
+                 full_poll_interval: float = 30.0,
+                 allow_legacy_pickle: bool = True,
+                 batch_size: int = 1000,
+                 gap_timeout: float = 60.0,
+                 max_gaps: int = 1000):
+        self.session_factory = session_factory
+        self.resident_db = resident_db
+        self.signal_path = str(signal_path) if signal_path else None
+        self.poll_interval = poll_interval
+        self.full_poll_interval = full_poll_interval
+        self.allow_legacy_pickle = allow_legacy_pickle
+        self.batch_size = batch_size
+        self.gap_timeout = gap_timeout
+        self.max_gaps = max_gaps
+
+        self.last_version = 0
+        self.gaps: Dict[int, float] = {}  # Unseen ids below last_version -> when first missed
+        self._last_signal = None
+        self._last_full_poll = 0.0
+        self._stop = threading.Event()
+        self.lock = threading.Lock()
+
+    def notify(self):
+        """Tell other processes that the feed moved. Call after commit."""
+        if not self.signal_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.signal_path), exist_ok=True)
+            with open(self.signal_path, "a"):
+                os.utime(self.signal_path, None)
+        except OSError as e:
+            logger.warning(f"Could not touch gallery change signal: {e}")
+
+    def latest_version(self, db) -> int:
+        latest = db.query(GalleryChange.id).order_by(GalleryChange.id.desc()).first()
+        return latest[0] if latest else 0
+
+    def covers(self, db, version: Optional[int]) -> bool:
+        """True if every change after `version` is still in the (pruned) feed"""
+        if version is None:
+            return False
+        oldest = db.query(GalleryChange.id).order_by(GalleryChange.id.asc()).first()
+        return oldest is None or oldest[0] <= version + 1
+
+    def seek(self, version: int):
+        """Set the position; the next poll applies changes after `version`"""
+        with self.lock:
+            self.last_version = version
+            self.gaps.clear()
+
+    def _signal_moved(self) -> bool:
+        if not self.signal_path:
+            return False
+        try:
+            stamp = os.stat(self.signal_path).st_mtime_ns
+        except OSError:
+            return False
+        moved = stamp != self._last_signal
+        self._last_signal = stamp
+        return moved
+
+    def poll_once(self, force: bool = False) -> int:
+        """Apply pending changes. Returns the number of residents touched."""
+        now = time.monotonic()
+        signal_moved = self._signal_moved()
+        if not (force or signal_moved or now - self._last_full_poll >= self.full_poll_interval):
+            return 0
+        self._last_full_poll = now
+
+        applied = 0
+        with self.lock:
+            for change_id, missed_at in list(self.gaps.items()):
+                if now - missed_at > self.gap_timeout:
+                    del self.gaps[change_id]  # Rolled back, never coming
+
+            db = self.session_factory()
+            try:
+                while True:
+                    condition = GalleryChange.id > self.last_version
+                    if self.gaps:
+                        condition = or_(condition, GalleryChange.id.in_(list(self.gaps)))
+                    changes = (
+                        db.query(GalleryChange)
+                        .filter(condition)
+                        .order_by(GalleryChange.id.asc())
+                        .limit(self.batch_size)
+                        .all()
+                    )
+                    if not changes:
+                        break
+
+                    resident_ids = set()
+                    for change in changes:
+                        resident_ids.add(change.resident_id)
+                        if self.gaps.pop(change.id, None) is not None:
+                            continue
+                        skipped = change.id - self.last_version - 1
+                        if 0 < skipped <= self.max_gaps:
+                            for missing in range(self.last_version + 1, change.id):
+                                self.gaps[missing] = now
+                        self.last_version = max(self.last_version, change.id)
+
+                    # Bring each touched resident in line with its row (inactive or deleted -> removed)
+                    rows = db.query(Resident).filter(Resident.id.in_(resident_ids)).all()
+                    for row in rows:
+                        try:
+                            apply_resident_row(self.resident_db, row, self.allow_legacy_pickle)
+                        except Exception as e:
+                            logger.error(f"Failed to apply gallery change for resident {row.id}: {e}")
+                    for rid in resident_ids - {row.id for row in rows}:
+                        self.resident_db.remove_resident(rid)
+
+                    applied += len(resident_ids)
+                    if len(changes) < self.batch_size:
+                        break
+            finally:
+                db.close()
+
+        if applied:
+            logger.info(f"Applied {applied} gallery change(s), feed version {self.last_version}")
+        return applied
+
+    def prune(self, retention_hours: float) -> int:
+        """Delete feed entries older than the retention window"""
+        db = self.session_factory()
+        try:
+            cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+            deleted = db.query(GalleryChange).filter(GalleryChange.timestamp < cutoff).delete()
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+    def run(self):
+        """Blocking poll loop"""
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error(f"Gallery change feed poll failed: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,366 @@
+"""
+GALLERY STORAGE
+Compact binary embedding encoding and memory-mapped gallery snapshots.
+
+Embeddings are persisted as raw little-endian float32 bytes together with
+their dimension and model name, so loading a resident never needs pickle.
+A resident may hold several templates (angles/lighting); they are stored
+back to back in the same column as a (K, D) matrix.
+A periodically written snapshot (.npy matrix + IDs + JSON sidecar) lets the
+server memory-map the whole gallery at startup and only replay DB rows
+that changed after the snapshot was taken.
+"""
+
+import io
+import os
+import json
+import pickle
+import time
+import shutil
+import logging
+import tempfile
+import contextlib
+import numpy as np
+from datetime import datetime
+from typing import Optional, Dict, Tuple, List
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DTYPE = np.dtype("<f4")
+EMBEDDING_FORMAT_VERSION = "2.0"
+LEGACY_PICKLE_VERSION = "1.0"
+
+
+class _NumpyOnlyUnpickler(pickle.Unpickler):
+    """Unpickler for legacy rows that refuses anything but plain numpy arrays"""
+
+    ALLOWED = {
+        ("numpy", "ndarray"),
+        ("numpy", "dtype"),
+        ("numpy.core.multiarray", "_reconstruct"),
+        ("numpy._core.multiarray", "_reconstruct"),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) in self.ALLOWED:
+            return super().find_class(module, name)
+        raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from embedding blob")
+
+
+def encode_embedding(embedding: np.ndarray) -> bytes:
+    """Encode an embedding (D,) or template matrix (K, D) as raw little-endian float32 bytes"""
+    return np.ascontiguousarray(embedding, dtype=EMBEDDING_DTYPE).ravel().tobytes()
+
+
+def decode_embedding(blob: bytes,
+                     dim: Optional[int] = None,
+                     version: Optional[str] = None,
+                     allow_legacy_pickle: bool = True) -> np.ndarray:
+    """
+    Decode an embedding column.
+
+    Args:
+        blob: Raw column bytes
+        dim: Stored embedding dimension (validated when given)
+        version: Stored embedding_version; "1.0"/None means legacy pickle
+        allow_legacy_pickle: Accept pickled numpy arrays from older rows
+
+    Returns:
+        float32 array of shape (dim,)
+    """
+    if version in (None, LEGACY_PICKLE_VERSION):
+        if not allow_legacy_pickle:
+            raise ValueError("Legacy pickled embedding found and legacy loading is disabled")
+        embedding = _NumpyOnlyUnpickler(io.BytesIO(blob)).load()
+        if not isinstance(embedding, np.ndarray):
+            raise ValueError(f"Legacy embedding blob holds {type(embedding).__name__}, not an array")
+        return np.asarray(embedding, dtype=np.float32).ravel()
+
+    embedding = np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
+    if dim is not None and embedding.shape[0] != dim:
+        raise ValueError(f"Embedding has {embedding.shape[0]} values, expected {dim}")
+    return embedding.astype(np.float32)
+
+
+def decode_templates(blob: bytes,
+                     dim: Optional[int] = None,
+                     version: Optional[str] = None,
+                     allow_legacy_pickle: bool = True) -> np.ndarray:
+    """
+    Decode an embedding column holding one or more templates.
+
+    Returns:
+        float32 array of shape (K, dim)
+    """
+    if version in (None, LEGACY_PICKLE_VERSION) or dim is None:
+        embedding = decode_embedding(blob, version=version, allow_legacy_pickle=allow_legacy_pickle)
+        return embedding.reshape(1, -1)
+
+    flat = np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
+    if dim <= 0 or flat.shape[0] % dim != 0:
+        raise ValueError(f"Embedding blob of {flat.shape[0]} values is not a multiple of {dim}")
+    return flat.reshape(-1, dim).astype(np.float32)
+
+
+def embedding_columns(embedding: np.ndarray, model_name: str) -> Dict:
+    """Column values for Resident rows storing this embedding (D,) or templates (K, D)"""
+    templates = np.atleast_2d(np.asarray(embedding))
+    return {
+        "face_embedding": encode_embedding(templates),
+        "embedding_dim": int(templates.shape[1]),
+        "template_count": int(templates.shape[0]),
+        "embedding_model": model_name,
+        "embedding_version": EMBEDDING_FORMAT_VERSION
+    }
+
+
+def parse_scopes(value) -> List[str]:
+    """Access scopes from a comma-separated column value or list; empty means everywhere"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return sorted({scope.strip() for scope in value if scope and scope.strip()})
+
+
+def format_scopes(value) -> Optional[str]:
+    """Column value for a list or comma-separated string of access scopes"""
+    scopes = parse_scopes(value)
+    return ",".join(scopes) if scopes else None
+
+
+def resident_metadata(resident) -> Dict:
+    """In-memory gallery metadata for a Resident row"""
+    metadata = {
+        "phone": resident.phone_number,
+        "flat": resident.flat_number,
+        "scopes": parse_scopes(resident.access_scopes)
+    }
+    if resident.flat_number == "GUEST":
+        metadata["type"] = "GUEST"
+        metadata["expires_at"] = resident.expires_at
+    return metadata
+
+
+def apply_resident_row(resident_db, resident, allow_legacy_pickle: bool = True) -> Optional[np.ndarray]:
+    """
+    Bring the in-memory gallery in line with one Resident row.
+    Inactive rows (or rows without an embedding) are removed.
+    Returns the decoded (K, D) templates when the resident was inserted, else None.
+    """
+    if not resident.is_active or not resident.face_embedding:
+        resident_db.remove_resident(resident.id)
+        return None
+
+    templates = decode_templates(
+        resident.face_embedding,
+        dim=resident.embedding_dim,
+        version=resident.embedding_version,
+        allow_legacy_pickle=allow_legacy_pickle
+    )
+    resident_db.add_embedding(
+        resident.id, resident.name, templates, resident_metadata(resident),
+        enrollment_time=resident.enrollment_date
+    )
+    return templates
+
+
+@contextlib.contextmanager
+def _exclusive_lock(path: str):
+    """Exclusive lock on `path` across processes (blocks until acquired)"""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class GallerySnapshot:
+    """
+    On-disk gallery snapshot, one directory per write:
+        <snapshot_dir>/CURRENT                  name of the live snapshot directory
+        <snapshot_dir>/snapshot-*/
+            gallery_embeddings.npy  float32 (T, D) template matrix, memory-mapped on load
+            gallery_ids.npy         int64 (T,) owning resident ID of each template row
+            gallery_meta.json       creation time, model, dimension, change-feed version and per-ID records
+            COMMITTED               marker: this directory was made live at some point
+    Every worker process runs a snapshot writer. Each write goes to its own new
+    directory, and CURRENT is switched under a file lock only if the snapshot is
+    not older (by change-feed version) than the live one. So readers never pair
+    files from different writers, and a lagging worker cannot roll the snapshot back.
+    Only committed directories other than the live and the previous one are pruned;
+    another writer's uncommitted directory is left alone unless it is stale (crashed writer).
+    """
+
+    POINTER = "CURRENT"
+    COMMITTED = "COMMITTED"
+    STALE_SECONDS = 3600
+    MATRIX = "gallery_embeddings.npy"
+    IDS = "gallery_ids.npy"
+    META = "gallery_meta.json"
+
+    def __init__(self, snapshot_dir):
+        self.snapshot_dir = str(snapshot_dir)
+        self.pointer_path = os.path.join(self.snapshot_dir, self.POINTER)
+        self.lock_path = os.path.join(self.snapshot_dir, "writer.lock")
+        self.last_written_version = None
+        self.feed_version = None  # Change-feed position of the last snapshot read
+
+    def current_dir(self) -> Optional[str]:
+        """Directory of the live snapshot; the snapshot dir itself for the legacy flat layout"""
+        try:
+            with open(self.pointer_path) as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            legacy = os.path.exists(os.path.join(self.snapshot_dir, self.META))
+            return self.snapshot_dir if legacy else None
+        return os.path.join(self.snapshot_dir, name) if name else None
+
+    @classmethod
+    def _read_meta(cls, directory: Optional[str]) -> Optional[Dict]:
+        try:
+            with open(os.path.join(directory, cls.META)) as f:
+                return json.load(f)
+        except (TypeError, OSError, ValueError):
+            return None
+
+    def write(self,
+              resident_db,
+              model_name: str,
+              created_at: datetime = None,
+              feed_version: int = None) -> Optional[datetime]:
+        """
+        Write the current gallery atomically.
+        Returns the snapshot timestamp, or None if nothing changed since the last
+        write or a newer snapshot is already live.
+        """
+        if resident_db.version == self.last_written_version:
+            return None
+
+        created_at = created_at or datetime.utcnow()
+        version = resident_db.version
+        ids, matrix, records = resident_db.export_matrix()
+
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        directory = tempfile.mkdtemp(prefix=f"snapshot-{created_at.strftime('%Y%m%d%H%M%S')}-", dir=self.snapshot_dir)
+        try:
+            np.save(os.path.join(directory, self.MATRIX), matrix.astype(EMBEDDING_DTYPE))
+            np.save(os.path.join(directory, self.IDS), ids)
+            meta = {
+                "created_at": created_at.isoformat(),
+                "model": model_name,
+                "dim": int(matrix.shape[1]) if matrix.ndim == 2 and len(ids) else 0,
+                "count": int(len(ids)),
+                "embedding_version": EMBEDDING_FORMAT_VERSION,
+                "feed_version": feed_version,
+                "records": {
+                    str(resident_id): {
+                        "name": record["name"],
+                        "metadata": record["metadata"],
+                        "enrollment_time": record["enrollment_time"].isoformat() if record["enrollment_time"] else None
+                    }
+                    for resident_id, record in records.items()
+                }
+            }
+            with open(os.path.join(directory, self.META), "w") as f:
+                json.dump(meta, f)
+
+            with _exclusive_lock(self.lock_path):
+                previous = self.current_dir()
+                live = self._read_meta(previous)
+                live_version = live.get("feed_version") if live else None
+                if live_version is not None and (feed_version is None or live_version > feed_version):
+                    shutil.rmtree(directory, ignore_errors=True)
+                    self.last_written_version = version
+                    return None
+                open(os.path.join(directory, self.COMMITTED), "w").close()
+                fd, tmp_path = tempfile.mkstemp(prefix=".CURRENT-", dir=self.snapshot_dir)
+                with os.fdopen(fd, "w") as f:
+                    f.write(os.path.basename(directory))
+                os.replace(tmp_path, self.pointer_path)
+                self._remove_old(keep={directory, previous})
+        except BaseException:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+
+        self.last_written_version = version
+        logger.info(f"Gallery snapshot written: {len(ids)} embeddings")
+        return created_at
+
+    def _remove_old(self, keep: set):
+        """
+        Delete superseded snapshot directories (called under the writer lock).
+        `keep` holds the live and the previous one, for readers mid-load.
+        """
+        stale_before = time.time() - self.STALE_SECONDS
+        for entry in os.scandir(self.snapshot_dir):
+            if not entry.is_dir() or not entry.name.startswith("snapshot-") or entry.path in keep:
+                continue
+            committed = os.path.exists(os.path.join(entry.path, self.COMMITTED))
+            if committed or entry.stat().st_mtime < stale_before:
+                shutil.rmtree(entry.path, ignore_errors=True)  # Still mapped by a reader on Windows: retried next time
+
+    def read(self, model_name: str = None) -> Optional[Tuple[np.ndarray, np.ndarray, Dict[int, Dict], datetime]]:
+        """
+        Memory-map the snapshot.
+        Returns (ids, matrix, records, created_at) or None if missing, stale or inconsistent.
+        """
+        directory = self.current_dir()
+        if directory is None:
+            return None
+
+        try:
+            with open(os.path.join(directory, self.META)) as f:
+                meta = json.load(f)
+
+            if model_name and meta.get("model") != model_name:
+                logger.warning(f"Gallery snapshot built with {meta.get('model')}, expected {model_name}. Ignoring.")
+                return None
+
+            ids = np.load(os.path.join(directory, self.IDS))
+            if meta["count"] == 0:
+                matrix = np.zeros((0, 0), dtype=np.float32)
+            else:
+                matrix = np.load(os.path.join(directory, self.MATRIX), mmap_mode="r")
+            if len(ids) != meta["count"] or matrix.shape[0] != meta["count"]:
+                logger.warning("Gallery snapshot files are inconsistent. Ignoring.")
+                return None
+
+            records = {}
+            for key, record in meta["records"].items():
+                enrollment_time = record.get("enrollment_time")
+                records[int(key)] = {
+                    "name": record["name"],
+                    "metadata": record.get("metadata", {}),
+                    "enrollment_time": datetime.fromisoformat(enrollment_time) if enrollment_time else None
+                }
+            self.feed_version = meta.get("feed_version")
+            return ids, matrix, records, datetime.fromisoformat(meta["created_at"])
+        except Exception as e:
+            logger.error(f"Failed to read gallery snapshot: {e}")
+            return None
+
+    def load_into(self, resident_db, model_name: str = None) -> Optional[datetime]:
+        """Load the snapshot into a ResidentDatabase. Returns the snapshot time or None"""
+        snapshot = self.read(model_name)
+        if snapshot is None:
+            return None
+        ids, matrix, records, created_at = snapshot
+        resident_db.bulk_load(ids, matrix, records)
+        self.last_written_version = resident_db.version
+        return created_at
@@ -0,0 +1,179 @@
+"""
+GUEST GALLERY TIER
+Verified guests live in their own small, expiring gallery instead of the
+permanent resident gallery. Every guest has an expiry (TTL from enrollment,
+or an explicit end of visit) and the tier is capped in size; when full, the
+least recently recognized guest is evicted.
+
+Recency must agree across worker processes, since an eviction deletes the
+guest everywhere. Each process only collects its own sightings (drain_seen);
+the eviction worker writes them to the shared Resident.last_seen column and
+picks capacity evictions from those shared times (select_overflow), so every
+worker evicts the same guests.
+
+TieredGallery puts both tiers behind the ResidentDatabase interface, so
+startup loading, the change feed and enrollment code route rows by
+metadata type without knowing about tiers.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Dict, List, Iterable, Tuple
+
+import numpy as np
+
+from AI_ML.ai_ml_utils import ResidentDatabase
+
+
+class GuestGallery:
+    """Expiring, size-capped guest gallery with shared least-recently-seen eviction"""
+
+    def __init__(self, ttl_hours: float = 24, max_entries: int = 500, **db_kwargs):
+        self.db = ResidentDatabase(**db_kwargs)
+        self.ttl = timedelta(hours=ttl_hours)
+        self.max_entries = max_entries
+        self.expires = {}          # {guest_id: expires_at}
+        self.seen = {}             # {guest_id: last recognized here}, not yet written to the DB
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.expires)
+
+    def expiry_for(self, metadata: Dict = None, enrollment_time: datetime = None) -> datetime:
+        expires_at = (metadata or {}).get("expires_at")
+        if expires_at is not None:
+            return expires_at
+        return (enrollment_time or datetime.utcnow()) + self.ttl
+
+    def add_embedding(self,
+                      guest_id: int,
+                      name: str,
+                      embedding: np.ndarray,
+                      metadata: dict = None,
+                      enrollment_time: datetime = None):
+        """Insert or refresh a guest. Already expired guests are dropped instead."""
+        expires_at = self.expiry_for(metadata, enrollment_time)
+        if expires_at <= datetime.utcnow():
+            self.remove_resident(guest_id)
+            return
+
+        self.db.add_embedding(guest_id, name, embedding, metadata, enrollment_time)
+        with self.lock:
+            self.expires[guest_id] = expires_at
+
+    def add_template(self, guest_id: int, embedding: np.ndarray) -> bool:
+        return self.db.add_template(guest_id, embedding)
+
+    def get_templates(self, guest_id: int) -> Optional[np.ndarray]:
+        return self.db.get_templates(guest_id)
+
+    def get_resident_embedding(self, guest_id: int) -> Optional[np.ndarray]:
+        return self.db.get_resident_embedding(guest_id)
+
+    def remove_resident(self, guest_id: int) -> bool:
+        with self.lock:
+            self.expires.pop(guest_id, None)
+            self.seen.pop(guest_id, None)
+        return self.db.remove_resident(guest_id)
+
+    def recognize_face(self, embedding: np.ndarray, threshold: float = 0.6, scopes=None) -> Optional[Dict]:
+        """Match against current guests; a hit marks the guest as recently seen"""
+        return self.accept_match(self.db.recognize_face(embedding, threshold, scopes))
+
+    def accept_match(self, match: Optional[Dict]) -> Optional[Dict]:
+        """
+        Use a match from `self.db`: marks the guest as seen, or drops it (None)
+        if it has expired. Only for matches that are actually returned.
+        """
+        if match is None:
+            return None
+
+        guest_id = match["resident_id"]
+        now = datetime.utcnow()
+        with self.lock:
+            expires_at = self.expires.get(guest_id)
+            expired = expires_at is None or expires_at <= now
+            if not expired:
+                self.seen[guest_id] = now
+        if expired:
+            self.remove_resident(guest_id)
+            return None
+        return match
+
+    def evict_expired(self, now: datetime = None) -> List[int]:
+        """Remove guests past their expiry. Returns their IDs."""
+        now = now or datetime.utcnow()
+        with self.lock:
+            expired = [guest_id for guest_id, expires_at in self.expires.items() if expires_at <= now]
+        for guest_id in expired:
+            self.remove_resident(guest_id)
+        return expired
+
+    def drain_seen(self) -> Dict[int, datetime]:
+        """{guest_id: last recognition time} since the last call, to share via the DB"""
+        with self.lock:
+            seen, self.seen = self.seen, {}
+        return seen
+
+    def select_overflow(self, guests: Iterable[Tuple[int, datetime]]) -> List[int]:
+        """
+        Guests to evict for capacity, from (guest_id, shared last-seen time) of
+        every active guest: the least recently seen beyond `max_entries`.
+        """
+        ranked = sorted(guests, key=lambda guest: (guest[1] or datetime.min, guest[0]), reverse=True)
+        return sorted(guest_id for guest_id, _ in ranked[self.max_entries:])
+
+
+class TieredGallery:
+    """Resident gallery + guest tier behind the ResidentDatabase interface"""
+
+    def __init__(self, resident_db: ResidentDatabase, guest_gallery: GuestGallery):
+        self.residents = resident_db
+        self.guests = guest_gallery
+
+    @property
+    def face_engine(self):
+        return self.residents.face_engine
+
+    @staticmethod
+    def is_guest(metadata: Dict = None) -> bool:
+        return (metadata or {}).get("type") == "GUEST"
+
+    def add_embedding(self,
+                      resident_id: int,
+                      name: str,
+                      embedding: np.ndarray,
+                      metadata: dict = None,
+                      enrollment_time: datetime = None):
+        if self.is_guest(metadata):
+            self.residents.remove_resident(resident_id)
+            self.guests.add_embedding(resident_id, name, embedding, metadata, enrollment_time)
+        else:
+            self.guests.remove_resident(resident_id)
+            self.residents.add_embedding(resident_id, name, embedding, metadata, enrollment_time)
+
+    def add_template(self, resident_id: int, embedding: np.ndarray) -> bool:
+        return self.residents.add_template(resident_id, embedding) or self.guests.add_template(resident_id, embedding)
+
+    def get_templates(self, resident_id: int) -> Optional[np.ndarray]:
+        templates = self.residents.get_templates(resident_id)
+        return templates if templates is not None else self.guests.get_templates(resident_id)
+
+    def get_resident_embedding(self, resident_id: int) -> Optional[np.ndarray]:
+        embedding = self.residents.get_resident_embedding(resident_id)
+        return embedding if embedding is not None else self.guests.get_resident_embedding(resident_id)
+
+    def remove_resident(self, resident_id: int) -> bool:
+        removed_resident = self.residents.remove_resident(resident_id)
+        removed_guest = self.guests.remove_resident(resident_id)
+        return removed_resident or removed_guest
+
+    def recognize_face(self, embedding: np.ndarray, threshold: float = 0.6, scopes=None) -> Optional[Dict]:
+        """Best match across residents and current guests within `scopes`"""
+        resident_match = self.residents.recognize_face(embedding, threshold, scopes)
+        # Only a guest match that wins counts as a sighting (it keeps the guest from eviction)
+        guest_match = self.guests.db.recognize_face(embedding, threshold, scopes)
+        if guest_match is None or (resident_match is not None and guest_match["confidence"] <= resident_match["confidence"]):
+            return resident_match
+        return self.guests.accept_match(guest_match) or resident_match
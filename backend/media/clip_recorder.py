@@ -0,0 +1,282 @@
+"""
+INCIDENT CLIP RECORDER
+Every camera keeps the last few seconds as JPEG packets in a memory-capped
+ring. When an alert fires, the pre-event packets plus the packets of the next
+`post_seconds` are written to a clip by a background thread.
+
+Clips are Motion-JPEG AVI files built by copying the buffered JPEG packets
+into the container as they are: no frame is decoded or re-encoded. (An MP4 /
+H.264 clip would need every frame decoded and encoded again.) OpenCV, ffmpeg
+and VLC read them directly.
+
+The camera thread only encodes a sampled frame (at `fps`) and appends it to
+the ring; it never waits for disk I/O.
+"""
+
+import os
+import queue
+import struct
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Optional, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from media.retention import shard_dir
+
+logger = logging.getLogger(__name__)
+
+
+class ClipBuffer:
+    """Rolling (capture time, JPEG) packets of one camera, capped by age and bytes"""
+
+    def __init__(self, seconds: float, max_bytes: int):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.packets = deque()   # (monotonic, jpeg bytes)
+        self.bytes = 0
+        self.size = None         # (width, height) of the packets
+
+    def push(self, timestamp: float, jpeg: bytes, size: Tuple[int, int]):
+        if self.size != size:
+            # Resolution changed: older packets cannot share a clip with the new ones
+            self.packets.clear()
+            self.bytes = 0
+            self.size = size
+        self.packets.append((timestamp, jpeg))
+        self.bytes += len(jpeg)
+        while self.packets and (self.packets[0][0] < timestamp - self.seconds or self.bytes > self.max_bytes):
+            _, old = self.packets.popleft()
+            self.bytes -= len(old)
+
+    def since(self, timestamp: float) -> List[Tuple[float, bytes]]:
+        return [packet for packet in self.packets if packet[0] >= timestamp]
+
+
+class ClipTicket:
+    """A clip being collected; `future` completes with the path (or None)"""
+    __slots__ = ("clip_id", "path", "camera_id", "event_time", "end_time", "size", "packets", "future")
+
+    def __init__(self, clip_id: str, path: str, camera_id: int, event_time: float, end_time: float):
+        self.clip_id = clip_id
+        self.path = path
+        self.camera_id = camera_id
+        self.event_time = event_time
+        self.end_time = end_time
+        self.size = None
+        self.packets = []
+        self.future = Future()
+
+    def result(self, timeout: Optional[float] = None) -> Optional[str]:
+        return self.future.result(timeout)
+
+
+def write_mjpeg_avi(path: str, packets: List[Tuple[float, bytes]], size: Tuple[int, int], fps: float = None):
+    """
+    Write JPEG packets as a Motion-JPEG AVI (one video stream, keyframe index).
+    The frame rate defaults to the packets' average capture rate.
+    """
+    width, height = size
+    if fps is None:
+        span = packets[-1][0] - packets[0][0] if len(packets) > 1 else 0
+        fps = (len(packets) - 1) / span if span > 0 else 10.0
+    rate, scale = max(1, int(round(fps * 1000))), 1000
+    largest = max(len(jpeg) for _, jpeg in packets)
+
+    def chunk(fourcc: bytes, data: bytes) -> bytes:
+        return fourcc + struct.pack("<I", len(data)) + data + (b"\0" if len(data) % 2 else b"")
+
+    def riff_list(kind: bytes, data: bytes) -> bytes:
+        return b"LIST" + struct.pack("<I", len(data) + 4) + kind + data
+
+    avih = struct.pack(
+        "<14I",
+        int(1e6 * scale / rate),      # Microseconds per frame
+        int(largest * rate / scale),  # Max bytes per second
+        0,
+        0x10,                         # AVIF_HASINDEX
+        len(packets), 0, 1, largest, width, height, 0, 0, 0, 0
+    )
+    strh = struct.pack(
+        "<4s4sIHHIIIIIIIIhhhh",
+        b"vids", b"MJPG", 0, 0, 0, 0, scale, rate, 0, len(packets), largest, 0xFFFFFFFF, 0,
+        0, 0, width, height
+    )
+    strf = struct.pack("<IiiHH4sIiiII", 40, width, height, 1, 24, b"MJPG", width * height * 3, 0, 0, 0, 0)
+    hdrl = riff_list(b"hdrl", chunk(b"avih", avih) + riff_list(b"strl", chunk(b"strh", strh) + chunk(b"strf", strf)))
+
+    movi = []
+    index = []
+    offset = 4  # idx1 offsets count from the "movi" fourcc
+    for _, jpeg in packets:
+        data = chunk(b"00dc", jpeg)
+        index.append(struct.pack("<4sIII", b"00dc", 0x10, offset, len(jpeg)))
+        movi.append(data)
+        offset += len(data)
+    body = hdrl + riff_list(b"movi", b"".join(movi)) + chunk(b"idx1", b"".join(index))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", len(body) + 4) + b"AVI " + body)
+    os.replace(tmp_path, path)
+
+
+class ClipRecorder:
+    """Per-camera JPEG rings and background clip writing"""
+
+    def __init__(self,
+                 clip_dir,
+                 pre_seconds: float = 5.0,
+                 post_seconds: float = 5.0,
+                 fps: float = 10.0,
+                 quality: int = 70,
+                 max_buffer_bytes: int = 8 * 1024 * 1024,
+                 max_pending: int = 8):
+        self.clip_dir = str(clip_dir)
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = fps
+        self.quality = quality
+        self.max_buffer_bytes = max_buffer_bytes
+        self.max_pending = max_pending
+
+        self.buffers: Dict[int, ClipBuffer] = {}
+        self.next_sample: Dict[int, float] = {}   # Capture time of the next frame to keep
+        self.pending: List[ClipTicket] = []   # Clips still collecting post-event packets
+        self.ready = queue.Queue()            # Clips waiting to be written
+        self._started = False
+        self.lock = threading.Lock()
+
+        self.written = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def start(self):
+        with self.lock:
+            if self._started:
+                return
+            self._started = True
+        os.makedirs(self.clip_dir, exist_ok=True)
+        threading.Thread(target=self._writer, name="clip-writer", daemon=True).start()
+
+    def add_frame(self, camera_id: int, frame: np.ndarray, timestamp: Optional[float] = None) -> bool:
+        """
+        Offer a camera frame (capture time `timestamp`, monotonic). Frames are
+        sampled at `fps`; a sampled frame is JPEG-encoded once and shared by
+        the ring and any clip collecting post-event packets.
+        Returns True if the frame was sampled.
+        """
+        timestamp = timestamp if timestamp is not None else time.monotonic()
+        interval = 1.0 / self.fps
+        due = self.next_sample.get(camera_id)
+        if due is not None and timestamp < due - 1e-3:
+            return False
+        # Keep to the sampling grid; restart it after a gap
+        self.next_sample[camera_id] = due + interval if due is not None and timestamp - due < interval else timestamp + interval
+
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return False
+        jpeg = encoded.tobytes()
+        size = (frame.shape[1], frame.shape[0])
+
+        with self.lock:
+            buffer = self.buffers.get(camera_id)
+            if buffer is None:
+                buffer = self.buffers[camera_id] = ClipBuffer(self.pre_seconds, self.max_buffer_bytes)
+            buffer.push(timestamp, jpeg, size)
+
+            finished = []
+            for clip in self.pending:
+                if clip.camera_id != camera_id:
+                    continue
+                if clip.size == size and timestamp <= clip.end_time:
+                    clip.packets.append((timestamp, jpeg))
+                if timestamp >= clip.end_time or clip.size != size:
+                    finished.append(clip)
+            for clip in finished:
+                self.pending.remove(clip)
+                self.ready.put(clip)
+        return True
+
+    def record(self, camera_id: int, event_time: Optional[float] = None, incident_type: str = "INCIDENT") -> Optional[ClipTicket]:
+        """
+        Start a clip around `event_time` (capture time, monotonic). Returns at
+        once; the ticket's path is final and its future completes when written.
+        An event inside a clip that is still collecting frames shares that clip.
+        None if the camera has no buffered frames or too many clips are pending.
+        """
+        event_time = event_time if event_time is not None else time.monotonic()
+        with self.lock:
+            for clip in self.pending:
+                if clip.camera_id == camera_id and clip.event_time <= event_time <= clip.end_time:
+                    return clip
+            buffer = self.buffers.get(camera_id)
+            if buffer is None or not buffer.packets or len(self.pending) >= self.max_pending:
+                self.skipped += 1
+                return None
+
+            created = datetime.utcnow()
+            clip_id = f"{incident_type}_cam{camera_id}_{created.strftime('%Y%m%d_%H%M%S_%f')}"
+            clip = ClipTicket(
+                clip_id, os.path.join(shard_dir(self.clip_dir, camera_id, created), f"{clip_id}.avi"),
+                camera_id, event_time, event_time + self.post_seconds
+            )
+            clip.size = buffer.size
+            clip.packets = buffer.since(event_time - self.pre_seconds)
+            self.pending.append(clip)
+        self.start()
+        return clip
+
+    def _writer(self):
+        while True:
+            try:
+                clip = self.ready.get(timeout=0.5)
+            except queue.Empty:
+                clip = None
+            if clip is None:
+                self._expire_pending()
+                continue
+
+            path = None
+            try:
+                if clip.packets:
+                    write_mjpeg_avi(clip.path, clip.packets, clip.size)
+                    path = clip.path
+                    logger.info(f"Incident clip saved: {clip.path} ({len(clip.packets)} frames)")
+            except Exception as e:
+                logger.error(f"Failed to write clip {clip.clip_id}: {e}")
+            with self.lock:
+                if path:
+                    self.written += 1
+                else:
+                    self.failed += 1
+            clip.packets = []
+            clip.future.set_result(path)
+
+    def _expire_pending(self, now: Optional[float] = None):
+        """Close clips whose camera stopped delivering frames"""
+        now = now if now is not None else time.monotonic()
+        with self.lock:
+            stale = [clip for clip in self.pending if now > clip.end_time + self.post_seconds]
+            for clip in stale:
+                self.pending.remove(clip)
+                self.ready.put(clip)
+
+    def metrics(self) -> Dict:
+        with self.lock:
+            return {
+                "buffered_bytes": {camera_id: buffer.bytes for camera_id, buffer in self.buffers.items()},
+                "buffered_frames": {camera_id: len(buffer.packets) for camera_id, buffer in self.buffers.items()},
+                "pending": len(self.pending),
+                "writing": self.ready.qsize(),
+                "written": self.written,
+                "failed": self.failed,
+                "skipped": self.skipped
+            }
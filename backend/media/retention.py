@@ -0,0 +1,193 @@
+"""
+INCIDENT MEDIA RETENTION
+Snapshots and clips are stored in date/camera shards:
+
+    <root>/<YYYY-MM-DD>/cam<camera_id>/<file>
+
+so no directory grows without bound. MediaRetention.compact() enforces an age
+limit and a disk budget over the whole tree (including legacy flat files):
+
+  1. files older than `max_age_days` are deleted,
+  2. if the tree is still over `max_bytes`, the oldest files are deleted until
+     it fits,
+  3. empty shard directories of past days are removed.
+
+Protected paths (referenced by an IncidentLog row or a pending verification)
+and files younger than `grace_seconds` (still being referenced by an alert in
+flight) are never deleted. Each pass returns a report with the reclaimed space.
+`on_delete` is told about every deleted media file (e.g. to update an index).
+"""
+
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+from typing import Optional, Callable, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+MEDIA_EXTENSIONS = (".jpg", ".jpeg", ".avi", ".mp4")
+
+
+def shard_dir(root, camera_id: Optional[int] = None, when: Optional[datetime] = None) -> str:
+    """Directory for media captured `when` (UTC, default now) on `camera_id`"""
+    when = when or datetime.utcnow()
+    camera = f"cam{camera_id}" if camera_id is not None else "cam_unknown"
+    return os.path.join(str(root), when.strftime("%Y-%m-%d"), camera)
+
+
+class MediaRetention:
+    """Age- and size-based eviction over a sharded media directory"""
+
+    def __init__(self,
+                 root,
+                 max_bytes: int,
+                 max_age_days: Optional[float] = 30,
+                 grace_seconds: float = 300,
+                 on_delete: Optional[Callable[[str], None]] = None):
+        self.root = os.path.abspath(str(root))
+        self.on_delete = on_delete
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.grace_seconds = grace_seconds
+        self._pass_lock = threading.Lock()   # One pass at a time
+        self.lock = threading.Lock()         # Counters and last report
+
+        self.runs = 0
+        self.total_deleted = 0
+        self.total_reclaimed = 0
+        self.last_report = None
+
+    def _scan(self) -> Tuple[List[Tuple[float, int, str]], List[Tuple[float, int, str]]]:
+        """(media files, leftover .tmp files) as (mtime, size, path)"""
+        media, partial = [], []
+        stack = [self.root]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    name = entry.name.lower()
+                    if name.endswith(".tmp"):
+                        target = partial
+                    elif name.endswith(MEDIA_EXTENSIONS):
+                        target = media
+                    else:
+                        continue
+                    info = entry.stat(follow_symlinks=False)
+                    target.append((info.st_mtime, info.st_size, entry.path))
+                except FileNotFoundError:
+                    continue  # Deleted or replaced while scanning
+        return media, partial
+
+    def _delete(self, path: str) -> bool:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"Could not delete {path}: {e}")
+            return False
+        if self.on_delete is not None and not path.endswith(".tmp"):
+            try:
+                self.on_delete(path)
+            except Exception as e:
+                logger.warning(f"Delete hook failed for {path}: {e}")
+        return True
+
+    def _remove_empty_dirs(self, today: str) -> int:
+        """Remove empty shards; today's shards stay (writers may be creating them)"""
+        removed = 0
+        for dirpath, dirnames, filenames in os.walk(self.root, topdown=False):
+            if dirpath == self.root or today in os.path.relpath(dirpath, self.root).split(os.sep):
+                continue
+            try:
+                if not os.listdir(dirpath):
+                    os.rmdir(dirpath)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def compact(self, protected: Iterable[str] = (), now: Optional[float] = None) -> Dict:
+        """Run one retention pass and return its report"""
+        now = now if now is not None else time.time()
+        protected = {os.path.abspath(p) for p in protected if p}
+        started = time.monotonic()
+
+        with self._pass_lock:
+            media, partial = self._scan()
+            scanned_bytes = sum(size for _, size, _ in media)
+            deleted = reclaimed = protected_files = 0
+
+            # Interrupted writes
+            for mtime, size, path in partial:
+                if now - mtime > self.grace_seconds and self._delete(path):
+                    deleted += 1
+                    reclaimed += size
+
+            media.sort()  # Oldest first
+            keep = []
+            age_cutoff = now - self.max_age_days * 86400 if self.max_age_days else None
+            for mtime, size, path in media:
+                if path in protected:
+                    protected_files += 1
+                    keep.append((mtime, size, path, False))
+                elif now - mtime <= self.grace_seconds:
+                    keep.append((mtime, size, path, False))
+                elif age_cutoff is not None and mtime < age_cutoff:
+                    if self._delete(path):
+                        deleted += 1
+                        reclaimed += size
+                else:
+                    keep.append((mtime, size, path, True))
+
+            remaining = sum(size for _, size, _, _ in keep)
+            for mtime, size, path, evictable in keep:
+                if remaining <= self.max_bytes:
+                    break
+                if evictable and self._delete(path):
+                    deleted += 1
+                    reclaimed += size
+                    remaining -= size
+
+            removed_dirs = self._remove_empty_dirs(datetime.utcnow().strftime("%Y-%m-%d"))
+
+            report = {
+                "finished_at": datetime.utcnow().isoformat(),
+                "scanned_files": len(media),
+                "scanned_bytes": scanned_bytes,
+                "deleted_files": deleted,
+                "reclaimed_bytes": reclaimed,
+                "protected_files": protected_files,
+                "remaining_bytes": remaining,
+                "budget_bytes": self.max_bytes,
+                "over_budget": remaining > self.max_bytes,
+                "removed_dirs": removed_dirs,
+                "duration_ms": round((time.monotonic() - started) * 1000, 1)
+            }
+
+        with self.lock:
+            self.runs += 1
+            self.total_deleted += deleted
+            self.total_reclaimed += reclaimed
+            self.last_report = report
+        return dict(report)
+
+    def metrics(self) -> Dict:
+        with self.lock:
+            return {
+                "root": self.root,
+                "budget_bytes": self.max_bytes,
+                "max_age_days": self.max_age_days,
+                "runs": self.runs,
+                "total_deleted_files": self.total_deleted,
+                "total_reclaimed_bytes": self.total_reclaimed,
+                "last_report": self.last_report
+            }
@@ -0,0 +1,308 @@
+"""
+CONTINUOUS SEGMENT RECORDING
+A recorder stage in the camera pipeline: frames the camera loop has already
+read are sampled at a fixed rate and written to rolling fixed-length segments
+with cv2.VideoWriter. No camera stream is opened a second time.
+
+Encoding happens on one writer thread per camera, fed through a small bounded
+queue; when the writer falls behind, frames are dropped (and counted) instead
+of stalling the camera loop.
+
+Video time follows capture time: a short gap between sampled frames is filled
+by repeating the last frame, and a long gap (camera stall, reconnect) or a
+resolution change starts a new segment. So a timestamp's offset into its
+segment is simply `timestamp - segment start`.
+
+Closed segments are recorded in a small SQLite index of (camera, start, end,
+path), so a seek is one indexed query rather than a scan of the files.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, List
+
+import cv2
+import numpy as np
+
+from AI_ML.frame_clock import FrameStamp
+from media.retention import shard_dir
+
+logger = logging.getLogger(__name__)
+
+
+def to_epoch(when: datetime) -> float:
+    """UTC epoch seconds; naive datetimes are UTC (as everywhere in the backend)"""
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when.timestamp()
+
+
+def from_epoch(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(tzinfo=None)
+
+
+def to_naive_utc(when: datetime) -> datetime:
+    """Naive UTC datetime (as stored in the index) from a naive-UTC or aware datetime"""
+    if when.tzinfo is None:
+        return when
+    return when.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class SegmentIndex:
+    """SQLite index of closed segments"""
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                " id INTEGER PRIMARY KEY,"
+                " camera_id INTEGER NOT NULL,"
+                " start_ts REAL NOT NULL,"   # UTC epoch seconds
+                " end_ts REAL NOT NULL,"
+                " path TEXT NOT NULL UNIQUE,"
+                " frames INTEGER NOT NULL,"
+                " fps REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS segments_camera_start ON segments (camera_id, start_ts)")
+
+    @staticmethod
+    def _row(row) -> Dict:
+        return {
+            "segment_id": row[0],
+            "camera_id": row[1],
+            "start": from_epoch(row[2]),
+            "end": from_epoch(row[3]),
+            "path": row[4],
+            "frames": row[5],
+            "fps": row[6]
+        }
+
+    def add(self, camera_id: int, start: datetime, end: datetime, path: str, frames: int, fps: float) -> int:
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR REPLACE INTO segments (camera_id, start_ts, end_ts, path, frames, fps) VALUES (?, ?, ?, ?, ?, ?)",
+                (camera_id, to_epoch(start), to_epoch(end), path, frames, fps)
+            )
+            return cursor.lastrowid
+
+    def find(self, camera_id: int, when: datetime) -> Optional[Dict]:
+        """Segment of `camera_id` covering `when`, or None"""
+        ts = to_epoch(when)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, camera_id, start_ts, end_ts, path, frames, fps FROM segments"
+                " WHERE camera_id = ? AND start_ts <= ? ORDER BY start_ts DESC LIMIT 1",
+                (camera_id, ts)
+            ).fetchone()
+        if row is None or ts >= row[3]:
+            return None
+        return self._row(row)
+
+    def segments(self, camera_id: int, start: datetime, end: datetime, limit: int = 1000) -> List[Dict]:
+        """Segments of `camera_id` overlapping [start, end), oldest first"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, camera_id, start_ts, end_ts, path, frames, fps FROM segments"
+                " WHERE camera_id = ? AND start_ts < ? AND end_ts > ? ORDER BY start_ts LIMIT ?",
+                (camera_id, to_epoch(end), to_epoch(start), limit)
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def remove_path(self, path: str):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM segments WHERE path = ?", (os.path.abspath(path),))
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+
+
+class _OpenSegment:
+    __slots__ = ("path", "writer", "start", "size", "frames", "last_frame", "last_monotonic")
+
+    def __init__(self, path: str, writer, start: datetime, size):
+        self.path = path
+        self.writer = writer
+        self.start = start                # Wall time of the first frame
+        self.size = size
+        self.frames = 0
+        self.last_frame = None
+        self.last_monotonic = None
+
+
+class SegmentRecorder:
+    """Per-camera rolling segments written from the camera pipeline"""
+
+    def __init__(self,
+                 root,
+                 index: SegmentIndex,
+                 segment_seconds: float = 60.0,
+                 fps: float = 10.0,
+                 fourcc: str = "mp4v",
+                 extension: str = ".mp4",
+                 max_gap_seconds: float = 2.0,
+                 queue_seconds: float = 2.0):
+        self.root = os.path.abspath(str(root))
+        self.index = index
+        self.segment_seconds = segment_seconds
+        self.fps = fps
+        self.fourcc = fourcc
+        self.extension = extension
+        self.max_gap_seconds = max_gap_seconds
+        self.queue_size = max(1, int(queue_seconds * fps))
+
+        self.queues: Dict[int, queue.Queue] = {}
+        self.threads: Dict[int, threading.Thread] = {}
+        self.open_segments: Dict[int, _OpenSegment] = {}
+        self.next_sample: Dict[int, float] = {}
+        self.lock = threading.Lock()
+
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.segments_closed = 0
+        self.failed = 0
+
+    def add_frame(self, camera_id: int, frame: np.ndarray, stamp: FrameStamp) -> bool:
+        """
+        Offer a camera frame; sampled frames are queued for the camera's writer.
+        The caller must not modify `frame` afterwards. Never blocks.
+        """
+        interval = 1.0 / self.fps
+        due = self.next_sample.get(camera_id)
+        if due is not None and stamp.monotonic < due - 1e-3:
+            return False
+        self.next_sample[camera_id] = due + interval if due is not None and stamp.monotonic - due < interval else stamp.monotonic + interval
+
+        frames = self.queues.get(camera_id)
+        if frames is None:
+            with self.lock:
+                frames = self.queues.get(camera_id)
+                if frames is None:
+                    frames = self.queues[camera_id] = queue.Queue(maxsize=self.queue_size)
+                    thread = threading.Thread(target=self._writer, args=(camera_id, frames), name=f"segment-writer-{camera_id}", daemon=True)
+                    self.threads[camera_id] = thread
+                    thread.start()
+        try:
+            frames.put_nowait((frame, stamp))
+            return True
+        except queue.Full:
+            with self.lock:
+                self.frames_dropped += 1
+            return False
+
+    def _writer(self, camera_id: int, frames: queue.Queue):
+        while True:
+            item = frames.get()
+            try:
+                if item is None:
+                    self._close(camera_id)
+                    continue
+                self._write(camera_id, *item)
+            except Exception as e:
+                with self.lock:
+                    self.failed += 1
+                logger.error(f"Segment recording failed for Camera {camera_id}: {e}")
+                self._close(camera_id)
+            finally:
+                frames.task_done()
+
+    def _write(self, camera_id: int, frame: np.ndarray, stamp: FrameStamp):
+        size = (frame.shape[1], frame.shape[0])
+        segment = self.open_segments.get(camera_id)
+        if segment is not None:
+            gap = stamp.monotonic - segment.last_monotonic
+            duration = segment.frames / self.fps
+            if gap > self.max_gap_seconds or segment.size != size or duration >= self.segment_seconds:
+                self._close(camera_id)
+                segment = None
+            elif gap > 1.5 / self.fps:
+                # Hold the last picture over the gap so video time stays capture time
+                for _ in range(int(round(gap * self.fps)) - 1):
+                    segment.writer.write(segment.last_frame)
+                    segment.frames += 1
+
+        if segment is None:
+            segment = self._open(camera_id, stamp, size)
+        segment.writer.write(frame)
+        segment.frames += 1
+        segment.last_frame = frame
+        segment.last_monotonic = stamp.monotonic
+        with self.lock:
+            self.frames_written += 1
+
+    def _open(self, camera_id: int, stamp: FrameStamp, size) -> _OpenSegment:
+        directory = shard_dir(self.root, camera_id, stamp.wall)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"cam{camera_id}_{stamp.wall.strftime('%Y%m%d_%H%M%S_%f')}{self.extension}")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, size)
+        if not writer.isOpened():
+            raise RuntimeError(f"cannot open VideoWriter ({self.fourcc}) for {path}")
+        segment = _OpenSegment(path, writer, stamp.wall, size)
+        self.open_segments[camera_id] = segment
+        return segment
+
+    def _close(self, camera_id: int):
+        segment = self.open_segments.pop(camera_id, None)
+        if segment is None:
+            return
+        segment.writer.release()
+        if segment.frames == 0:
+            return
+        end = segment.start + timedelta(seconds=segment.frames / self.fps)
+        self.index.add(camera_id, segment.start, end, segment.path, segment.frames, self.fps)
+        with self.lock:
+            self.segments_closed += 1
+
+    def close_all(self, timeout: float = 5.0) -> bool:
+        """Finish every open segment (shutdown); queued frames are written first"""
+        deadline = time.monotonic() + timeout
+        for frames in list(self.queues.values()):
+            try:
+                frames.put(None, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                continue
+        while any(frames.unfinished_tasks for frames in list(self.queues.values())):
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def seek(self, camera_id: int, when: datetime) -> Optional[Dict]:
+        """Segment covering `when` and the offset into it (seconds, frame index)"""
+        when = to_naive_utc(when)
+        segment = self.index.find(camera_id, when)
+        if segment is None:
+            return None
+        offset = (when - segment["start"]).total_seconds()
+        return {
+            **segment,
+            "offset_seconds": round(offset, 3),
+            "frame_index": min(int(offset * segment["fps"]), segment["frames"] - 1)
+        }
+
+    def recording_since(self, camera_id: int) -> Optional[datetime]:
+        """Start of the segment still being written (not yet seekable)"""
+        segment = self.open_segments.get(camera_id)
+        return segment.start if segment else None
+
+    def metrics(self) -> Dict:
+        with self.lock:
+            return {
+                "cameras": sorted(self.queues),
+                "queue_depth": {camera_id: frames.qsize() for camera_id, frames in self.queues.items()},
+                "frames_written": self.frames_written,
+                "frames_dropped": self.frames_dropped,
+                "segments_closed": self.segments_closed,
+                "failed": self.failed,
+                "indexed_segments": self.index.count()
+            }
@@ -0,0 +1,172 @@
+"""
+INCIDENT MEDIA SERVING
+Snapshots and clips are served from the incident media directory:
+
+    GET /api/media/<relative path>[?width=<thumbnail width>]
+
+Responses carry an ETag (file mtime + size) and Last-Modified, so the
+dashboard revalidates with a 304 instead of downloading again. Range requests
+(video seeking, resumed downloads) and zero-copy sending are handled by
+Starlette's FileResponse.
+
+Thumbnails come in a few fixed widths. The first request for any width of a
+snapshot decodes it once and writes every width to the thumbnail cache; later
+requests are plain file responses. Cache entries are keyed by the source's
+path, mtime and size, so a replaced source never serves a stale thumbnail.
+"""
+
+import os
+import hashlib
+import threading
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Iterable
+
+import cv2
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def resolve_media_path(root, relative_path: str) -> Optional[str]:
+    """Absolute path of a file inside `root`, or None (missing, or outside `root`)"""
+    root = os.path.realpath(str(root))
+    path = os.path.realpath(os.path.join(root, relative_path))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None
+    return path
+
+
+def media_url(root, path: Optional[str], width: Optional[int] = None, prefix: str = "/api/media/") -> Optional[str]:
+    """URL of a stored file for the dashboard, None if it is not under `root`"""
+    if not path:
+        return None
+    root = os.path.realpath(str(root))
+    path = os.path.realpath(path)
+    if os.path.commonpath([root, path]) != root:
+        return None
+    url = prefix + os.path.relpath(path, root).replace(os.sep, "/")
+    return f"{url}?width={width}" if width else url
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def is_not_modified(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    """Conditional GET: If-None-Match wins over If-Modified-Since (RFC 9110)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        modified = datetime.fromtimestamp(int(stat_result.st_mtime), tz=timezone.utc)
+        return modified <= since
+    return False
+
+
+def media_response(request: Request, path: str, max_age: int = 86400) -> Response:
+    """
+    Serve a stored file with validators. Media files are never modified in
+    place (new incidents get new names), so clients may cache them.
+    """
+    stat_result = os.stat(path)
+    etag = file_etag(stat_result)
+    headers = {
+        "etag": etag,
+        "cache-control": f"private, max-age={max_age}"
+    }
+    if is_not_modified(request, etag, stat_result):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers, stat_result=stat_result)
+
+
+class ThumbnailCache:
+    """Fixed-width JPEG thumbnails generated once per source file"""
+
+    def __init__(self, cache_dir, widths: Iterable[int] = (160, 320, 640), quality: int = 75):
+        self.cache_dir = str(cache_dir)
+        self.widths = tuple(sorted(set(widths), reverse=True))
+        self.quality = quality
+        self.lock = threading.Lock()
+        self._inflight: Dict[str, threading.Lock] = {}   # One generation per source at a time
+
+        self.hits = 0
+        self.generated = 0
+        self.failed = 0
+
+    def _key(self, source: str, stat_result: os.stat_result) -> str:
+        return hashlib.sha1(f"{source}:{stat_result.st_mtime_ns}:{stat_result.st_size}".encode()).hexdigest()
+
+    def _path(self, key: str, width: int) -> str:
+        return os.path.join(self.cache_dir, str(width), key[:2], f"{key}.jpg")
+
+    def get(self, source: str, width: int) -> Optional[str]:
+        """Thumbnail path for `source` at `width`; generates all widths on a miss"""
+        if width not in self.widths:
+            raise ValueError(f"Unsupported thumbnail width {width}; choose from {sorted(self.widths)}")
+        stat_result = os.stat(source)
+        key = self._key(source, stat_result)
+        path = self._path(key, width)
+        if os.path.exists(path):
+            with self.lock:
+                self.hits += 1
+            return path
+
+        with self.lock:
+            source_lock = self._inflight.setdefault(key, threading.Lock())
+        with source_lock:
+            try:
+                if not os.path.exists(path):  # Another request may have generated it meanwhile
+                    self._generate(source, key)
+            finally:
+                with self.lock:
+                    self._inflight.pop(key, None)
+        return path if os.path.exists(path) else None
+
+    def _generate(self, source: str, key: str):
+        image = cv2.imread(source, cv2.IMREAD_COLOR)
+        if image is None:
+            with self.lock:
+                self.failed += 1
+            logger.warning(f"Cannot create thumbnails, unreadable image: {source}")
+            return
+
+        # Largest first, each resized from the previous one (cheaper than from the original)
+        for width in self.widths:
+            h, w = image.shape[:2]
+            if w > width:
+                image = cv2.resize(image, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+            ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if not ok:
+                continue
+            path = self._path(key, width)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(encoded.tobytes())
+            os.replace(tmp_path, path)
+        with self.lock:
+            self.generated += 1
+
+    def metrics(self) -> Dict:
+        with self.lock:
+            return {
+                "widths": sorted(self.widths),
+                "hits": self.hits,
+                "generated": self.generated,
+                "failed": self.failed
+            }
@@ -0,0 +1,190 @@
+"""
+SNAPSHOT WRITER
+Incident snapshots are encoded and written by a small pool of worker threads,
+so neither the camera threads nor the event loop wait for JPEG encoding or
+disk I/O.
+
+submit() returns a SnapshotTicket straight away: the snapshot ID and its final
+path are known before the file exists, and `ticket.future` completes with the
+path once it is on disk (or None if the write failed). Consumers that need the
+file itself (WhatsApp, the agent) wait on the future; everything else (DB rows,
+dashboard payloads) just records the path.
+
+The queue is bounded. When it is full the snapshot is dropped and counted
+rather than stalling the caller.
+
+Files are stored in date/camera shards (see media.retention).
+"""
+
+import os
+import queue
+import itertools
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Optional, Callable, Dict
+
+import cv2
+import numpy as np
+
+from media.retention import shard_dir
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotTicket:
+    """Handle for a queued snapshot"""
+    __slots__ = ("snapshot_id", "path", "future", "submitted_at")
+
+    def __init__(self, snapshot_id: str, path: str):
+        self.snapshot_id = snapshot_id
+        self.path = path
+        self.future = Future()
+        self.submitted_at = time.monotonic()
+
+    def result(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Block until written. Returns the path, or None if the write failed"""
+        return self.future.result(timeout)
+
+
+class SnapshotWriter:
+    """Bounded queue + worker threads writing incident JPEGs"""
+
+    def __init__(self,
+                 snapshot_dir,
+                 workers: int = 2,
+                 queue_size: int = 64,
+                 quality: int = 80,
+                 latency_samples: int = 256):
+        self.snapshot_dir = str(snapshot_dir)
+        self.workers = workers
+        self.quality = quality
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._started = False
+        self._sequence = itertools.count()  # Keeps IDs unique within the same microsecond
+        self.lock = threading.Lock()
+
+        # Metrics
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self._latencies = deque(maxlen=latency_samples)     # Submit -> on disk, seconds
+        self._write_times = deque(maxlen=latency_samples)   # Encode + write, seconds
+
+    def start(self):
+        with self.lock:
+            if self._started:
+                return
+            self._started = True
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"snapshot-writer-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def new_ticket(self, incident_type: str, camera_id: Optional[int] = None) -> SnapshotTicket:
+        now = datetime.utcnow()
+        snapshot_id = f"{incident_type}_{now.strftime('%Y%m%d_%H%M%S_%f')}_{next(self._sequence) % 10000:04d}"
+        directory = shard_dir(self.snapshot_dir, camera_id, now)
+        return SnapshotTicket(snapshot_id, os.path.join(directory, f"{snapshot_id}.jpg"))
+
+    def submit(self,
+               incident_type: str,
+               frame: Optional[np.ndarray] = None,
+               jpeg: Optional[bytes] = None,
+               render: Optional[Callable[[], Optional[bytes]]] = None,
+               camera_id: Optional[int] = None) -> Optional[SnapshotTicket]:
+        """
+        Queue a snapshot: a raw BGR `frame`, ready `jpeg` bytes, or a `render`
+        callable producing JPEG bytes on the worker (lazy annotation).
+        The caller must not modify `frame` afterwards.
+        Returns None when the queue is full.
+        """
+        self.start()
+        ticket = self.new_ticket(incident_type, camera_id)
+        try:
+            self.queue.put_nowait((ticket, frame, jpeg, render))
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            logger.warning(f"Snapshot queue full ({self.queue.maxsize}), dropping {ticket.snapshot_id}")
+            return None
+        with self.lock:
+            self.submitted += 1
+        return ticket
+
+    def _worker(self):
+        while True:
+            ticket, frame, jpeg, render = self.queue.get()
+            started = time.monotonic()
+            path = None
+            try:
+                if jpeg is None and render is not None:
+                    jpeg = render()
+                if jpeg is None and frame is not None:
+                    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                    jpeg = encoded.tobytes() if ok else None
+                if jpeg is None:
+                    raise ValueError("nothing to write")
+                self._atomic_write(ticket.path, jpeg)
+                path = ticket.path
+            except Exception as e:
+                logger.error(f"Failed to write snapshot {ticket.snapshot_id}: {e}")
+            finally:
+                finished = time.monotonic()
+                with self.lock:
+                    if path:
+                        self.written += 1
+                        self._latencies.append(finished - ticket.submitted_at)
+                        self._write_times.append(finished - started)
+                    else:
+                        self.failed += 1
+                ticket.future.set_result(path)
+                self.queue.task_done()
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far is written (tests, shutdown)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    @staticmethod
+    def _summary(samples) -> Dict:
+        if not samples:
+            return {"avg": None, "p95": None, "max": None}
+        values = np.array(samples) * 1000.0
+        return {
+            "avg": round(float(values.mean()), 2),
+            "p95": round(float(np.percentile(values, 95)), 2),
+            "max": round(float(values.max()), 2)
+        }
+
+    def metrics(self) -> Dict:
+        with self.lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "queue_capacity": self.queue.maxsize,
+                "workers": self.workers,
+                "submitted": self.submitted,
+                "written": self.written,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "latency_ms": self._summary(self._latencies),
+                "write_ms": self._summary(self._write_times)
+            }
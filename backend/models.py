@@ -11,11 +11,25 @@ class Resident(Base):
     flat_number = Column(String)
     height_cm = Column(Float)
     phone_number = Column(String)
-    face_embedding = Column(LargeBinary) # Pickled numpy array
-    embedding_version = Column(String, default="1.0")
+    face_embedding = Column(LargeBinary) # Little-endian float32 (K, D) templates ("1.0" rows are legacy pickles)
+    embedding_dim = Column(Integer, nullable=True)
+    template_count = Column(Integer, default=1)
+    embedding_model = Column(String, nullable=True) # e.g. "Facenet"
+    embedding_version = Column(String, default="2.0")
     is_active = Column(Boolean, default=True)
     enrollment_date = Column(DateTime, default=datetime.utcnow)
-    last_updated = Column(DateTime, default=datetime.utcnow)
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    expires_at = Column(DateTime, nullable=True, index=True) # Guests only
+    last_seen = Column(DateTime, nullable=True) # Guests only: last recognition by any worker (capacity eviction)
+    access_scopes = Column(String, nullable=True) # Comma-separated, e.g. "building:B,zone:parking"; empty = all cameras
+
+class GalleryChange(Base):
+    __tablename__ = "gallery_changes"
+
+    id = Column(Integer, primary_key=True, index=True) # Monotonic feed version
+    resident_id = Column(Integer, index=True)
+    operation = Column(String) # UPSERT, DEACTIVATE, DELETE
+    timestamp = Column(DateTime, default=datetime.utcnow)
 
 class Visitor(Base):
     __tablename__ = "visitors"
@@ -46,6 +60,7 @@ class IncidentLog(Base):
     additional_details = Column(String, nullable=True)
     resolved = Column(Boolean, default=False)
     snapshot_path = Column(String, nullable=True)
+    video_path = Column(String, nullable=True)
 
 class AccessLog(Base):
     __tablename__ = "access_logs"
@@ -67,3 +82,4 @@ class CameraConfig(Base):
     name = Column(String)
     url = Column(String) # RTSP URL or "0"
     enabled = Column(Boolean, default=True)
+    tripwires = Column(String, nullable=True) # JSON list of tripwire configs; overrides CAMERA_CONFIG
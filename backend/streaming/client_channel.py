@@ -0,0 +1,163 @@
+"""
+WEBSOCKET CLIENT CHANNELS
+Every dashboard connection gets its own outgoing queue and sender task, so a
+slow client (a guard on mobile data) only delays itself.
+
+Two queues per client:
+
+    messages   ALERT / control messages. Never dropped, sent first, in order.
+               A client whose backlog passes `max_messages` is disconnected
+               (it reconnects and reloads) rather than silently losing alerts.
+    frames     Previews (binary FramePackets, or JSON FRAME messages), at most
+               one pending per camera (a newer frame replaces the queued one)
+               and at most `max_frames` cameras; the oldest pending frame is
+               dropped first.
+
+What a client receives at all is decided by its `subscriptions` (see
+streaming/subscriptions.py) before anything is queued.
+
+enqueue() never blocks and must be called on the event loop thread.
+"""
+
+import asyncio
+import time
+import logging
+from collections import deque, OrderedDict
+from typing import Dict, Optional, Union
+
+from streaming.frame_protocol import FramePacket
+from streaming.subscriptions import FRAME, Subscriptions
+
+logger = logging.getLogger(__name__)
+
+Message = Union[Dict, FramePacket]
+
+
+def is_frame(message: Message) -> bool:
+    return isinstance(message, FramePacket) or message.get("type") == FRAME
+
+
+class ClientChannel:
+    """Bounded outgoing queues and a sender task for one WebSocket"""
+
+    def __init__(self,
+                 websocket,
+                 client_id: int,
+                 max_frames: int = 16,
+                 max_messages: int = 1000,
+                 send_timeout: float = 10.0):
+        self.websocket = websocket
+        self.client_id = client_id
+        self.max_frames = max_frames
+        self.max_messages = max_messages
+        self.send_timeout = send_timeout
+        self.subscriptions = Subscriptions()
+
+        self.messages = deque()
+        self.frames = OrderedDict()     # {camera_id: message}, oldest first
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.closed = False
+        self.connected_at = time.time()
+
+        self.sent_messages = 0
+        self.sent_frames = 0
+        self.sent_frame_bytes = 0
+        self.dropped_frames = 0
+        self.max_send_ms = 0.0
+
+    def start(self) -> asyncio.Task:
+        self._task = asyncio.create_task(self._sender(), name=f"ws-sender-{self.client_id}")
+        return self._task
+
+    def enqueue(self, message: Message) -> bool:
+        """Queue a message for this client. False if it was not queued (closed)"""
+        if self.closed:
+            return False
+        if is_frame(message):
+            camera_id = message.camera_id if isinstance(message, FramePacket) else message.get("camera_id")
+            if camera_id in self.frames:
+                del self.frames[camera_id]      # Superseded by the newer frame
+                self.dropped_frames += 1
+            elif len(self.frames) >= self.max_frames:
+                self.frames.popitem(last=False)
+                self.dropped_frames += 1
+            self.frames[camera_id] = message
+        else:
+            if len(self.messages) >= self.max_messages:
+                logger.warning(f"WebSocket client {self.client_id} is {len(self.messages)} messages behind, disconnecting")
+                self.close()
+                return False
+            self.messages.append(message)
+        self._wakeup.set()
+        return True
+
+    def _next(self) -> Optional[Message]:
+        if self.messages:
+            return self.messages.popleft()
+        if self.frames:
+            return self.frames.popitem(last=False)[1]
+        return None
+
+    async def _send(self, message: Message):
+        if isinstance(message, FramePacket):
+            await self.websocket.send_bytes(message.data)   # Shared bytes, no per-client copy
+        else:
+            await self.websocket.send_json(message)
+
+    async def _sender(self):
+        try:
+            while not self.closed:
+                message = self._next()
+                if message is None:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                started = time.monotonic()
+                await asyncio.wait_for(self._send(message), timeout=self.send_timeout)
+                self.max_send_ms = max(self.max_send_ms, (time.monotonic() - started) * 1000)
+                if isinstance(message, FramePacket):
+                    self.sent_frames += 1
+                    self.sent_frame_bytes += len(message.data)
+                elif message.get("type") == FRAME:
+                    self.sent_frames += 1
+                else:
+                    self.sent_messages += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # Timeout or broken connection; the receive loop sees the disconnect
+            logger.warning(f"WebSocket client {self.client_id} send failed: {e!r}")
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.messages.clear()
+        self.frames.clear()
+        self._wakeup.set()
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        asyncio.ensure_future(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
+
+    def metrics(self) -> Dict:
+        return {
+            "client_id": self.client_id,
+            "connected_seconds": round(time.time() - self.connected_at, 1),
+            "queued_messages": len(self.messages),
+            "queued_frames": len(self.frames),
+            "sent_messages": self.sent_messages,
+            "sent_frames": self.sent_frames,
+            "sent_frame_bytes": self.sent_frame_bytes,
+            "dropped_frames": self.dropped_frames,
+            "max_send_ms": round(self.max_send_ms, 1),
+            "closed": self.closed,
+            "subscriptions": self.subscriptions.to_dict()
+        }
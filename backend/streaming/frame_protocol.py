@@ -0,0 +1,73 @@
+"""
+BINARY FRAME PROTOCOL
+Live previews travel as binary WebSocket messages instead of base64 inside
+JSON (which costs ~33% more bytes and a JSON dump of a large string per
+client). ALERT and control messages stay JSON text messages.
+
+Layout (little-endian):
+
+    offset  size  field
+    0       1     version            (FRAME_VERSION)
+    1       1     flags              (reserved, 0)
+    2       2     camera_id          uint16
+    4       4     sequence           uint32, per camera, wraps
+    8       8     timestamp          float64, capture time, UTC epoch seconds
+    16      4     detections_length  uint32, bytes of UTF-8 JSON that follow
+    20      n     detections         JSON list, e.g. [{"bbox": [x1, y1, x2, y2], "label": "..."}]
+    20+n    ...   JPEG bytes
+
+A FramePacket is built once per camera frame and preview tier, and the same
+bytes object is sent to every client watching that tier.
+"""
+
+import json
+import struct
+from typing import Optional, List, Dict, Tuple
+
+FRAME_VERSION = 1
+HEADER = struct.Struct("<BBHIdI")
+
+
+class FramePacket:
+    """One encoded preview frame, shared by every client it is sent to"""
+    __slots__ = ("camera_id", "sequence", "timestamp", "data", "tier", "jpeg_offset")
+
+    def __init__(self, camera_id: int, sequence: int, timestamp: float, data: bytes,
+                 tier: Optional[str] = None, jpeg_offset: int = HEADER.size):
+        self.camera_id = camera_id
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.data = data
+        self.tier = tier              # Preview tier (server side only, not on the wire)
+        self.jpeg_offset = jpeg_offset
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def jpeg(self) -> memoryview:
+        """The JPEG inside `data`, without copying (for MJPEG streaming)"""
+        return memoryview(self.data)[self.jpeg_offset:]
+
+
+def encode_frame(camera_id: int,
+                 sequence: int,
+                 timestamp: float,
+                 jpeg: bytes,
+                 detections: Optional[List[Dict]] = None,
+                 tier: Optional[str] = None) -> FramePacket:
+    blob = json.dumps(detections, separators=(",", ":")).encode() if detections else b""
+    header = HEADER.pack(FRAME_VERSION, 0, camera_id, sequence & 0xFFFFFFFF, timestamp, len(blob))
+    return FramePacket(camera_id, sequence, timestamp, b"".join((header, blob, jpeg)), tier, HEADER.size + len(blob))
+
+
+def decode_frame(data: bytes) -> Tuple[Dict, List[Dict], memoryview]:
+    """(header fields, detections, JPEG view); for tests and Python clients"""
+    version, flags, camera_id, sequence, timestamp, detections_length = HEADER.unpack_from(data)
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported frame version {version}")
+    start = HEADER.size
+    view = memoryview(data)
+    detections = json.loads(bytes(view[start:start + detections_length])) if detections_length else []
+    header = {"camera_id": camera_id, "sequence": sequence, "timestamp": timestamp, "flags": flags}
+    return header, detections, view[start + detections_length:]
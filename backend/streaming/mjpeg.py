@@ -0,0 +1,185 @@
+"""
+MJPEG STREAMING
+Live previews for viewers that cannot speak the /ws/alerts protocol (NVR
+walls, plain <img> tags):
+
+    GET /api/cameras/<camera_id>/stream.mjpeg[?tier=grid&fps=5]
+
+served as multipart/x-mixed-replace. Viewers share the preview packets the
+camera loop already encodes for WebSocket clients: every part is a view of
+the JPEG inside the packet's bytes, so a viewer costs no decode, encode or
+copy. A watched camera/tier makes the camera loop encode that tier, exactly
+like a WebSocket subscription.
+
+Each connection is rate limited to `fps` parts per second. A slow viewer
+always gets the newest frame when it is ready for one; frames in between are
+skipped. When the camera produces nothing for `keepalive_seconds`, the last
+frame is repeated (or, before the first frame, an empty placeholder part is
+sent) so viewers and dead connections are noticed.
+
+A viewer's slot is reserved when its request is answered (open(), atomic on
+the event loop, so concurrent viewers beyond `max_viewers` get a 503 rather
+than an empty 200), and MjpegResponse releases it when the response ends,
+however it ends - also when the client is gone before the body started.
+"""
+
+import asyncio
+import time
+import logging
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+
+from fastapi.responses import StreamingResponse
+
+from streaming.frame_protocol import FramePacket
+
+logger = logging.getLogger(__name__)
+
+BOUNDARY = "frame"
+PLACEHOLDER_PART = f"--{BOUNDARY}\r\nContent-Type: text/plain\r\nContent-Length: 0\r\n\r\n\r\n".encode()
+
+
+class MjpegStreams:
+    """Latest preview packet per (camera, tier) and the viewers waiting on it"""
+
+    def __init__(self, max_viewers: int = 32, keepalive_seconds: float = 5.0):
+        self.max_viewers = max_viewers
+        self.keepalive_seconds = keepalive_seconds
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.viewers: Dict[Tuple[int, str], int] = {}
+        self.latest: Dict[Tuple[int, str], FramePacket] = {}
+        self._updated: Dict[Tuple[int, str], asyncio.Event] = {}
+        # {camera_id: {tier}}; replaced whole on every change, read by camera threads
+        self._watched: Dict[int, Set[str]] = {}
+
+        self.total_viewers = 0
+        self.rejected = 0
+        self.sent_parts = 0
+        self.sent_bytes = 0
+
+    def tiers(self, camera_id: int) -> Set[str]:
+        """Tiers MJPEG viewers are watching `camera_id` at (any thread)"""
+        return self._watched.get(camera_id, set())
+
+    def _index(self):
+        watched = {}
+        for camera_id, tier in self.viewers:
+            watched.setdefault(camera_id, set()).add(tier)
+        self._watched = watched
+
+    def join(self, camera_id: int, tier: str) -> bool:
+        """Register a viewer (event loop thread); False when at capacity"""
+        if sum(self.viewers.values()) >= self.max_viewers:
+            self.rejected += 1
+            return False
+        self.loop = asyncio.get_running_loop()
+        key = (camera_id, tier)
+        self.viewers[key] = self.viewers.get(key, 0) + 1
+        self._updated.setdefault(key, asyncio.Event())
+        self.total_viewers += 1
+        self._index()
+        return True
+
+    def leave(self, camera_id: int, tier: str):
+        key = (camera_id, tier)
+        remaining = self.viewers.get(key, 0) - 1
+        if remaining > 0:
+            self.viewers[key] = remaining
+            return
+        self.viewers.pop(key, None)
+        self.latest.pop(key, None)       # Stale once nobody keeps it fresh
+        self._updated.pop(key, None)
+        self._index()
+
+    def publish(self, packet: FramePacket):
+        """Store a camera's newest packet and wake its viewers (event loop thread)"""
+        key = (packet.camera_id, packet.tier)
+        updated = self._updated.get(key)
+        if updated is None:
+            return
+        self.latest[key] = packet
+        updated.set()
+        self._updated[key] = asyncio.Event()   # Viewers wait on a fresh event for the next one
+
+    def publish_threadsafe(self, packet: FramePacket):
+        """publish() from a camera thread; a no-op while nobody watches"""
+        if self.loop is not None and packet.tier in self.tiers(packet.camera_id):
+            self.loop.call_soon_threadsafe(self.publish, packet)
+
+    def open(self, camera_id: int, tier: str, fps: float, **kwargs) -> Optional["MjpegResponse"]:
+        """Join and build the viewer's response (event loop thread); None when at capacity"""
+        if not self.join(camera_id, tier):
+            return None
+        return MjpegResponse(self, camera_id, tier, fps, **kwargs)
+
+    async def stream(self, camera_id: int, tier: str, fps: float) -> AsyncIterator:
+        """multipart/x-mixed-replace body for one joined viewer; leaving is up to the caller"""
+        key = (camera_id, tier)
+        interval = 1.0 / fps
+        sent_sequence = None
+        sent_at = next_due = 0.0
+        while True:
+            packet = self.latest.get(key)
+            now = time.monotonic()
+            keepalive_in = sent_at + self.keepalive_seconds - now
+            if packet is None or (packet.sequence == sent_sequence and keepalive_in > 0):
+                try:
+                    await asyncio.wait_for(self._updated[key].wait(), timeout=keepalive_in if packet else self.keepalive_seconds)
+                except asyncio.TimeoutError:
+                    if packet is None:
+                        sent_at = time.monotonic()
+                        yield PLACEHOLDER_PART   # No frame yet, but a dead viewer must still be noticed
+                continue
+            if now < next_due:
+                await asyncio.sleep(next_due - now)   # Per-connection rate limit
+                continue                              # Take whatever is newest by then
+
+            jpeg = packet.jpeg
+            sent_sequence = packet.sequence
+            sent_at = now
+            next_due = now + interval
+            self.sent_parts += 1
+            self.sent_bytes += len(jpeg)
+            yield (
+                f"--{BOUNDARY}\r\n"
+                f"Content-Type: image/jpeg\r\n"
+                f"Content-Length: {len(jpeg)}\r\n"
+                f"X-Timestamp: {packet.timestamp:.3f}\r\n\r\n"
+            ).encode()
+            yield jpeg
+            yield b"\r\n"
+
+    def metrics(self) -> Dict:
+        return {
+            "viewers": {f"cam{camera_id}/{tier}": count for (camera_id, tier), count in self.viewers.items()},
+            "max_viewers": self.max_viewers,
+            "total_viewers": self.total_viewers,
+            "rejected": self.rejected,
+            "sent_parts": self.sent_parts,
+            "sent_bytes": self.sent_bytes
+        }
+
+
+class MjpegResponse(StreamingResponse):
+    """
+    One joined viewer's multipart response; its slot is released when the
+    response ends. Starlette only stops iterating on a disconnect and never
+    starts a body whose client left early, so the body generator is closed
+    and the viewer left here rather than in the generator.
+    """
+
+    def __init__(self, streams: MjpegStreams, camera_id: int, tier: str, fps: float, **kwargs):
+        super().__init__(
+            streams.stream(camera_id, tier, fps),
+            media_type=f"multipart/x-mixed-replace; boundary={BOUNDARY}",
+            **kwargs
+        )
+        self.streams = streams
+        self.viewer = (camera_id, tier)
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+            self.streams.leave(*self.viewer)
@@ -0,0 +1,100 @@
+"""
+LIVE PREVIEW TIERS
+A camera's preview is encoded once per resolution tier that someone is
+watching, never once per viewer:
+
+    grid    small, low quality JPEG for the camera grid
+    focus   full resolution for the enlarged single-camera view
+
+Tiers are encoded largest first, each resized from the previous one (cheaper
+than from the original). Each result is a FramePacket whose bytes are shared
+by every subscriber of that tier, so encode cost does not grow with viewers.
+Detection boxes in the packet header are scaled to the tier's image.
+"""
+
+import time
+import threading
+import logging
+from typing import Dict, Iterable, List, Optional
+
+import cv2
+import numpy as np
+
+from streaming.frame_protocol import FramePacket, encode_frame
+
+logger = logging.getLogger(__name__)
+
+
+class PreviewEncoder:
+    """Encodes preview frames once per requested tier"""
+
+    def __init__(self, tiers: Dict[str, Dict]):
+        # {name: {"max_width": pixels or None (full resolution), "quality": JPEG quality}}
+        self.tiers = dict(tiers)
+        self.lock = threading.Lock()
+        self.encoded = {name: 0 for name in self.tiers}
+        self.encoded_bytes = {name: 0 for name in self.tiers}
+        self.encode_ms = {name: 0.0 for name in self.tiers}
+        self.failed = 0
+
+    def _order(self, tiers: Iterable[str]) -> List[str]:
+        """Known tiers, largest first"""
+        known = [name for name in set(tiers) if name in self.tiers]
+        return sorted(known, key=lambda name: -(self.tiers[name].get("max_width") or float("inf")))
+
+    def encode(self,
+               camera_id: int,
+               frame: np.ndarray,
+               tiers: Iterable[str],
+               sequence: int,
+               timestamp: float,
+               detections: Optional[List[Dict]] = None) -> Dict[str, FramePacket]:
+        """{tier: FramePacket} for each tier in `tiers`; `frame` is not modified"""
+        packets = {}
+        image = frame
+        source_width = frame.shape[1]
+        for name in self._order(tiers):
+            settings = self.tiers[name]
+            started = time.monotonic()
+            max_width = settings.get("max_width")
+            h, w = image.shape[:2]
+            if max_width and w > max_width:
+                image = cv2.resize(image, (max_width, max(1, round(h * max_width / w))), interpolation=cv2.INTER_AREA)
+
+            ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, settings.get("quality", 80)])
+            if not ok:
+                with self.lock:
+                    self.failed += 1
+                logger.warning(f"Preview encode failed for Camera {camera_id} ({name})")
+                continue
+
+            scale = image.shape[1] / source_width
+            tier_detections = detections
+            if detections and scale != 1:
+                tier_detections = [
+                    {**d, "bbox": [int(round(v * scale)) for v in d["bbox"]]} if "bbox" in d else d
+                    for d in detections
+                ]
+            packet = encode_frame(camera_id, sequence, timestamp, buffer.tobytes(), tier_detections, tier=name)
+            packets[name] = packet
+
+            with self.lock:
+                self.encoded[name] += 1
+                self.encoded_bytes[name] += len(packet)
+                self.encode_ms[name] += (time.monotonic() - started) * 1000
+        return packets
+
+    def metrics(self) -> Dict:
+        with self.lock:
+            return {
+                "tiers": {
+                    name: {
+                        **settings,
+                        "encoded": self.encoded[name],
+                        "avg_bytes": round(self.encoded_bytes[name] / self.encoded[name]) if self.encoded[name] else 0,
+                        "avg_encode_ms": round(self.encode_ms[name] / self.encoded[name], 2) if self.encoded[name] else 0.0
+                    }
+                    for name, settings in self.tiers.items()
+                },
+                "failed": self.failed
+            }
@@ -0,0 +1,111 @@
+"""
+WEBSOCKET SUBSCRIPTIONS
+What a /ws/alerts client receives, per message type and camera.
+
+Client → server (JSON text messages):
+
+    {"type": "subscribe",   "messages": ["FRAME"], "cameras": [1, 2] | "*", "tier": "grid"}
+    {"type": "unsubscribe", "messages": ["FRAME"], "cameras": [1] | "*"}
+
+`messages` defaults to ["FRAME"], `cameras` to "*", `tier` to the default
+preview tier. The server answers {"type": "subscribed", ...} with the
+resulting state, or {"type": "error", "detail": ...}.
+
+A new client receives every JSON message type (ALERT, AUTHORIZED_ENTRY, ...)
+for all cameras and no FRAME previews; previews are opt-in per camera. A
+type's first subscribe/unsubscribe narrows it from that default. Unsubscribing
+single cameras does not narrow a "*" subscription; unsubscribe "*" first.
+Control replies (pong, subscribed, error) are always delivered.
+"""
+
+from typing import Dict, Iterable, Optional, Set, Tuple, Union
+
+ALL = "*"
+FRAME = "FRAME"
+CONTROL_TYPES = {"pong", "subscribed", "error"}
+
+CameraKey = Union[int, str]
+
+
+class Subscriptions:
+    """One client's {message type: {camera_id or "*": tier}}"""
+
+    def __init__(self):
+        self.types: Dict[str, Dict[CameraKey, Optional[str]]] = {ALL: {ALL: None}}
+
+    def _entry(self, message_type: str) -> Dict[CameraKey, Optional[str]]:
+        if message_type not in self.types:
+            default = {} if message_type == FRAME else dict(self.types.get(ALL, {}))
+            self.types[message_type] = default
+        return self.types[message_type]
+
+    def subscribe(self, message_types: Iterable[str], cameras, tier: Optional[str] = None):
+        for message_type in message_types:
+            entry = self._entry(message_type)
+            for camera in cameras:
+                entry[camera] = tier if message_type == FRAME else None
+
+    def unsubscribe(self, message_types: Iterable[str], cameras):
+        for message_type in message_types:
+            entry = self._entry(message_type)
+            if ALL in cameras:
+                entry.clear()
+            for camera in cameras:
+                entry.pop(camera, None)
+
+    def _cameras(self, message_type: str) -> Dict[CameraKey, Optional[str]]:
+        if message_type in self.types:
+            return self.types[message_type]
+        return {} if message_type == FRAME else self.types.get(ALL, {})
+
+    def wants(self, message_type: str, camera_id: Optional[int] = None) -> bool:
+        if message_type in CONTROL_TYPES:
+            return True
+        cameras = self._cameras(message_type)
+        if camera_id is None:
+            return bool(cameras)
+        return ALL in cameras or camera_id in cameras
+
+    def frame_tier(self, camera_id: int) -> Optional[str]:
+        """Preview tier this client watches `camera_id` at, or None"""
+        frames = self._cameras(FRAME)
+        if camera_id in frames:
+            return frames[camera_id]
+        return frames.get(ALL)
+
+    def frame_subscriptions(self) -> Dict[CameraKey, Optional[str]]:
+        return dict(self._cameras(FRAME))
+
+    def to_dict(self) -> Dict:
+        return {
+            message_type: {str(camera): tier for camera, tier in cameras.items()} if message_type == FRAME else sorted(map(str, cameras))
+            for message_type, cameras in self.types.items()
+        }
+
+
+def parse_request(message: Dict, tiers: Iterable[str], default_tier: str) -> Tuple[str, Set[str], Set[CameraKey], Optional[str]]:
+    """Validate a subscribe/unsubscribe message: (action, message types, cameras, tier)"""
+    action = message.get("type")
+    if action not in ("subscribe", "unsubscribe"):
+        raise ValueError(f"Unknown action {action!r}")
+
+    message_types = message.get("messages", [FRAME])
+    if isinstance(message_types, str):
+        message_types = [message_types]
+    if not message_types or not all(isinstance(t, str) and t for t in message_types):
+        raise ValueError("'messages' must be a list of message types")
+
+    cameras = message.get("cameras", ALL)
+    if cameras == ALL:
+        cameras = [ALL]
+    elif isinstance(cameras, int):
+        cameras = [cameras]
+    if not isinstance(cameras, list) or not all(c == ALL or (isinstance(c, int) and not isinstance(c, bool)) for c in cameras):
+        raise ValueError("'cameras' must be \"*\" or a list of camera IDs")
+
+    tier = None
+    if action == "subscribe" and FRAME in message_types:
+        tier = message.get("tier", default_tier)
+        if tier not in tiers:
+            raise ValueError(f"Unknown tier {tier!r}; choose from {sorted(tiers)}")
+    return action, set(message_types), set(cameras), tier
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef, useCallback } from 'react';
 import Layout from './components/Layout';
 import Dashboard from './pages/Dashboard';
 import LiveMonitoring from './pages/LiveMonitoring';
@@ -12,6 +12,24 @@ import { Toaster } from 'react-hot-toast';
 // WebSocket URL
 const WS_URL = 'ws://localhost:8000/ws/alerts';
 
+// Binary preview frame (see backend/streaming/frame_protocol.py):
+// version u8, flags u8, camera_id u16, sequence u32, timestamp f64, detections_length u32,
+// then detections JSON, then JPEG bytes. All little-endian.
+const FRAME_HEADER_SIZE = 20;
+
+const decodeFrame = (buffer) => {
+  const view = new DataView(buffer);
+  const cameraId = view.getUint16(2, true);
+  const sequence = view.getUint32(4, true);
+  const timestamp = view.getFloat64(8, true);
+  const detectionsLength = view.getUint32(16, true);
+  const detections = detectionsLength
+    ? JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, FRAME_HEADER_SIZE, detectionsLength)))
+    : [];
+  const jpeg = new Uint8Array(buffer, FRAME_HEADER_SIZE + detectionsLength);
+  return { cameraId, sequence, timestamp, detections, jpeg };
+};
+
 function App() {
   const [activePage, setActivePage] = useState('landing');
   const [wsConnected, setWsConnected] = useState(false);
@@ -19,7 +37,11 @@ function App() {
 
   // centralized system state
   const [alertNotifications, setAlertNotifications] = useState([]);
-  const [cameraFrames, setCameraFrames] = useState({});
+  const [cameraFrames, setCameraFrames] = useState({}); // {camera_id: object URL of the latest JPEG}
+  const frameUrls = useRef({});
+  const activePageRef = useRef(activePage);
+  activePageRef.current = activePage;
+  const focusCamera = useRef(null); // Camera shown enlarged on the live page (full-resolution tier)
   const [stats, setStats] = useState(null);
 
   // Calculate active alerts per camera for LiveMonitoring
@@ -37,10 +59,18 @@ function App() {
 
     const connectWs = () => {
       const ws = new WebSocket(WS_URL);
+      ws.binaryType = 'arraybuffer';
 
       ws.onopen = () => {
         setWsConnected(true);
         console.log('Use Security System Connected');
+        // Preview frames are opt-in; the server skips encoding cameras nobody watches
+        if (activePageRef.current === 'live') {
+          ws.send(JSON.stringify({ type: 'subscribe', messages: ['FRAME'], cameras: '*', tier: 'grid' }));
+          if (focusCamera.current !== null) {
+            ws.send(JSON.stringify({ type: 'subscribe', messages: ['FRAME'], cameras: [focusCamera.current], tier: 'focus' }));
+          }
+        }
       };
 
       ws.onclose = () => {
@@ -51,15 +81,23 @@ function App() {
 
       ws.onmessage = (event) => {
         try {
+          // Binary messages are preview frames
+          if (event.data instanceof ArrayBuffer) {
+            const { cameraId, jpeg } = decodeFrame(event.data);
+            const url = URL.createObjectURL(new Blob([jpeg], { type: 'image/jpeg' }));
+            if (frameUrls.current[cameraId]) URL.revokeObjectURL(frameUrls.current[cameraId]);
+            frameUrls.current[cameraId] = url;
+            setCameraFrames(prev => ({
+              ...prev,
+              [cameraId]: url
+            }));
+            return;
+          }
+
           const data = JSON.parse(event.data);
 
           if (data.type === 'ALERT') {
             addAlert(data);
-          } else if (data.type === 'FRAME') {
-            setCameraFrames(prev => ({
-              ...prev,
-              [data.camera_id]: data.frame
-            }));
           } else if (data.type === 'STATS') {
             setStats(data);
           }
@@ -86,6 +124,20 @@ function App() {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [activePage]);
 
+  // Switch one camera between the grid and focus preview tiers
+  const setFocusCamera = useCallback((cameraId) => {
+    const previous = focusCamera.current;
+    if (previous === cameraId) return;
+    focusCamera.current = cameraId;
+    if (!socket || socket.readyState !== WebSocket.OPEN) return;
+    if (previous !== null) {
+      socket.send(JSON.stringify({ type: 'unsubscribe', messages: ['FRAME'], cameras: [previous] }));
+    }
+    if (cameraId !== null) {
+      socket.send(JSON.stringify({ type: 'subscribe', messages: ['FRAME'], cameras: [cameraId], tier: 'focus' }));
+    }
+  }, [socket]);
+
   const addAlert = (alert) => {
     setAlertNotifications(prev => [alert, ...prev].slice(0, 5));
   };
@@ -114,7 +166,7 @@ function App() {
     >
       {activePage === 'dashboard' && <Dashboard stats={stats} />}
       {activePage === 'analytics' && <Analytics />}
-      {activePage === 'live' && <LiveMonitoring cameraFrames={cameraFrames} alertingCameras={alertingCameras} />}
+      {activePage === 'live' && <LiveMonitoring cameraFrames={cameraFrames} alertingCameras={alertingCameras} onFocusCamera={setFocusCamera} />}
       {activePage === 'incidents' && <IncidentLog />}
       {activePage === 'settings' && <Settings />}
 
@@ -1,13 +1,18 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import { Maximize2, AlertTriangle, VideoOff, Volume2, VolumeX, Shield, CheckCircle } from 'lucide-react';
 import Modal from '../components/Modal';
 import clsx from 'clsx';
 import TestControlPanel from '../components/TestControlPanel';
 
-export default function LiveMonitoring({ cameraFrames = {}, alertingCameras = {} }) {
+export default function LiveMonitoring({ cameraFrames = {}, alertingCameras = {}, onFocusCamera }) {
   const [selectedCamera, setSelectedCamera] = useState(null);
   const [soundEnabled, setSoundEnabled] = useState(true);
 
+  // The enlarged camera is streamed at full resolution, the grid at thumbnail size
+  useEffect(() => {
+    if (onFocusCamera) onFocusCamera(selectedCamera ? selectedCamera.id : null);
+  }, [selectedCamera, onFocusCamera]);
+
   const cameras = [
     { id: 1, name: 'Entry Gate', location: 'Main Entrance' },
     { id: 2, name: 'Lobby', location: 'Ground Floor' },
@@ -75,7 +80,7 @@ export default function LiveMonitoring({ cameraFrames = {}, alertingCameras = {}
                 {/* Video Feed */}
                 {frame ? (
                   <img
-                    src={`data:image/jpeg;base64,${frame}`}
+                    src={frame}
                     alt={camera.name}
                     className="w-full h-full object-cover transition-transform duration-700 group-hover:scale-105"
                   />
@@ -155,7 +160,7 @@ export default function LiveMonitoring({ cameraFrames = {}, alertingCameras = {}
         <div className="aspect-video bg-black rounded-2xl overflow-hidden relative border border-gray-200 shadow-2xl">
           {selectedCamera && cameraFrames[selectedCamera.id] ? (
             <img
-              src={`data:image/jpeg;base64,${cameraFrames[selectedCamera.id]}`}
+              src={cameraFrames[selectedCamera.id]}
               alt="Fullscreen Feed"
               className="w-full h-full object-contain"
             />